@@ -1,15 +1,40 @@
+import base64
+import json
 import os
 import re
+import urllib.parse
 import urllib.request
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, g
 from flask_cors import CORS
-from gpt4all import GPT4All
+from werkzeug.middleware.proxy_fix import ProxyFix
 from pathlib import Path
-import threading
+from inference_config import generate_kwargs
+from model_backend import MODEL_BACKEND, load_model
+from coalesce import RESTART, SingleFlight
+from scheduler import PriorityScheduler, message_priority
+from ratelimit import ConcurrencyLimit, RateLimiter, retry_after
+from deadlines import Cancelled, Deadline, GenerationCost, disconnect_probe, request_timeout
+import triage_classifier
+from triage import DANGER_TERMS, SYMPTOM_TERMS, RECOVERY_PHRASES, EMERGENCY_REPLY, triage_batch
+from temporal import extract_duration
+import metrics
+import profiling
+import spelling
+import temporal
+import voice_service
 import time
+import wave
 
 app = Flask(__name__)
 CORS(app)
+# Behind TRUSTED_PROXIES reverse proxies (1 on Render), take the client
+# address from X-Forwarded-For, counting that many hops from the right so a
+# client can't choose its own address by sending the header itself
+TRUSTED_PROXIES = int(os.environ.get("TRUSTED_PROXIES", 0))
+if TRUSTED_PROXIES > 0:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES)
+# Opt-in request profiling, enabled by PROFILE_TOKEN (see profiling.py)
+profiling.init_app(app)
 
 # =========================
 # Model Management with Auto-Download
@@ -53,13 +78,20 @@ def download_model():
         return False
 
 # Try to load model, download if needed
+# MODEL_BACKEND=fake serves deterministic replies without the GGUF file
+# (see model_backend.py); MODEL_BACKEND=none starts without an LLM.
 model = None
 
+if MODEL_BACKEND == "none":
+    print("⚠️  MODEL_BACKEND=none, starting without a model")
+elif MODEL_BACKEND != "gpt4all":
+    model = load_model(MODEL_PATH)
+    print(f"✅ Using the {MODEL_BACKEND} model backend")
 # First check if model exists
-if os.path.exists(MODEL_PATH):
+elif os.path.exists(MODEL_PATH):
     print(f"✅ Found model at {MODEL_PATH}")
     try:
-        model = GPT4All(MODEL_PATH, allow_download=False)
+        model = load_model(MODEL_PATH, allow_download=False)
         print("✅ Model loaded successfully!")
     except Exception as e:
         print(f"❌ Error loading model: {e}")
@@ -68,12 +100,100 @@ else:
     print("⚠️  Model not found, attempting to download...")
     if download_model():
         try:
-            model = GPT4All(MODEL_PATH, allow_download=False)
+            model = load_model(MODEL_PATH, allow_download=False)
             print("✅ Model loaded successfully after download!")
         except Exception as e:
             print(f"❌ Error loading downloaded model: {e}")
             model = None
 
+# =========================
+# Metrics
+# =========================
+# Served in Prometheus text format on /metrics. Each update is a lock and a
+# dict lookup, so these stay on in production.
+
+MODEL_LOADED = metrics.Gauge("model_loaded", "1 if the LLM is loaded")
+MODEL_LOADED.set(1 if model is not None else 0)
+
+HTTP_REQUESTS = metrics.Counter("http_requests_total", "HTTP requests by endpoint and status")
+HTTP_SECONDS = metrics.Histogram("http_request_seconds", "HTTP request latency by endpoint")
+CHAT_ROUTES = metrics.Counter("chat_routes_total", "/chat replies by route")
+CHAT_STAGE_SECONDS = metrics.Histogram("chat_stage_seconds", "Time spent in each step of /chat")
+QUEUE_WAIT_SECONDS = metrics.Histogram("model_queue_wait_seconds", "Time waiting for the model lock")
+GENERATED_TOKENS = metrics.Counter("generated_tokens_total", "Tokens generated by the LLM")
+TOKENS_PER_SECOND = metrics.Histogram("generation_tokens_per_second", "Decode speed per reply",
+                                      buckets=metrics.RATE_BUCKETS)
+metrics.lru_cache_metrics({"temporal": temporal._parse, "spelling": spelling.correct_word})
+
+# Generations stopped because the client timed out or went away (see
+# deadlines.py). Savings are estimated from the average finished generation.
+CANCELLED = metrics.Counter("generation_cancelled_total",
+                            "Generations abandoned, by reason and whether they were queued or generating")
+SAVED_TOKENS = metrics.Counter("generation_cancelled_saved_tokens_total",
+                               "Estimated tokens not generated because their request was cancelled")
+SAVED_SECONDS = metrics.Counter("generation_cancelled_saved_seconds_total",
+                                "Estimated model seconds not spent because their request was cancelled")
+generation_cost = GenerationCost()
+
+# Identical prompts in flight at the same time share one generation (see
+# coalesce.py). Generation settings are fixed, so the prompt is the key.
+# CHAT_COALESCE=0 turns it off.
+CHAT_COALESCE = os.environ.get("CHAT_COALESCE", "1") == "1"
+flights = SingleFlight()
+
+metrics.Callback("chat_coalesce_requests_total", "Generations requested, by leader/follower and mode",
+                 flights.stats, type="counter")
+metrics.Callback("chat_coalesce_in_flight", "Distinct prompts being generated",
+                 lambda: [({}, flights.in_flight())])
+metrics.Callback("chat_coalesce_saved_seconds_total", "Generation time followers did not have to spend",
+                 lambda: [({}, flights.saved_seconds)], type="counter")
+
+# The one generation slot (GPT4All is not thread-safe) is granted by priority
+# (scheduler.py). PRIORITY_SCHEDULING=0 serves everything in arrival order.
+PRIORITY_SCHEDULING = os.environ.get("PRIORITY_SCHEDULING", "1") == "1"
+generation_slots = PriorityScheduler(slots=1)
+
+PRIORITY_WAIT_SECONDS = metrics.Histogram("chat_priority_wait_seconds", "Wait for a generation slot by priority")
+PRIORITY_SECONDS = metrics.Histogram("chat_priority_seconds", "Message handling latency by priority")
+metrics.Callback("chat_priority_waiting", "Requests waiting for a generation slot by priority",
+                 lambda: [({"priority": p}, n) for p, n in generation_slots.waiting_by_priority().items()])
+metrics.Callback("chat_priority_aged_total", "Slots granted early because the request had waited too long",
+                 lambda: [({}, generation_slots.aged)], type="counter")
+PREEMPTED = metrics.Counter("chat_priority_preempted_total",
+                            "Generations stopped and restarted for a high priority request, by priority")
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    start = g.get("request_start")
+    if start is not None:
+        # The rule, not the path, so user ids don't become label values
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        HTTP_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+        HTTP_REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+    return response
+
+# =========================
+# Triage Classifier
+# =========================
+# Routes each message to the emergency reply, a canned template or the LLM.
+# Set TRIAGE_CLASSIFIER=0 to always use the LLM.
+
+TRIAGE_EMERGENCY_PROB = float(os.environ.get("TRIAGE_EMERGENCY_PROB", 0.9))
+TRIAGE_TEMPLATE_PROB = float(os.environ.get("TRIAGE_TEMPLATE_PROB", 0.8))
+
+triage_model = None
+if os.environ.get("TRIAGE_CLASSIFIER", "1") == "1":
+    try:
+        triage_model = triage_classifier.load_or_train()
+        print("✅ Triage classifier loaded!")
+    except Exception as e:
+        print(f"❌ Error loading triage classifier: {e}")
+        triage_model = None
+
 # =========================
 # Simple In-Memory Storage
 # =========================
@@ -115,19 +235,15 @@ def clean_output(text):
     return text.strip()
 
 def emergency_check(text):
-    danger = ["bleeding", "pregnant", "chest pain", "faint", 
-              "unconscious", "breathing", "seizure", "heart attack"]
     text_lower = text.lower()
-    for d in danger:
+    for d in DANGER_TERMS:
         if d in text_lower:
             return True
     return False
 
 def is_recovered(text):
-    good_phrases = ["i am fine", "i'm fine", "i am okay", "i'm okay", 
-                    "i feel better", "i am well", "i'm well"]
     text_lower = text.lower()
-    return any(p in text_lower for p in good_phrases)
+    return any(p in text_lower for p in RECOVERY_PHRASES)
 
 def update_memory_simple(text, memory):
     text_lower = text.lower()
@@ -138,20 +254,29 @@ def update_memory_simple(text, memory):
         memory["severity"] = None
         return
     
-    symptoms_list = ["fever", "headache", "pain", "cough", "cold",
-                     "tired", "fatigue", "vomiting", "diarrhea",
-                     "bleeding", "swelling", "nausea", "pregnant"]
-    
-    for s in symptoms_list:
+    for s in SYMPTOM_TERMS:
         if s in text_lower and s not in memory["symptoms"]:
             memory["symptoms"].append(s)
     
-    if "yesterday" in text_lower:
-        memory["duration"] = "since yesterday"
-    elif "today" in text_lower:
-        memory["duration"] = "today"
-    elif "week" in text_lower:
-        memory["duration"] = "for a week"
+    # Compiled patterns only: dateparser is too slow for the chat hot path
+    duration = extract_duration(text_lower, fallback=False)
+    if duration:
+        memory["duration"] = duration["phrase"]
+
+def choose_route(text):
+    """Return ("emergency" | "template" | "llm", classifier prediction or None)."""
+    if emergency_check(text):
+        return "emergency", None
+    if triage_model is None:
+        return "llm", None
+
+    triage = triage_model.predict(text)
+    if triage["intent"] == "emergency" and triage["intent_prob"] >= TRIAGE_EMERGENCY_PROB:
+        return "emergency", triage
+    if (triage["intent"] == "appointment" and triage["intent_prob"] >= TRIAGE_TEMPLATE_PROB
+            and triage["category"] in triage_model.templates):
+        return "template", triage
+    return "llm", triage
 
 def build_prompt_simple(user_input, memory):
     context = ""
@@ -171,6 +296,238 @@ Reply naturally in one short paragraph.
 """
     return prompt
 
+def run_model(prompt, on_piece=None, priority="medium", stop=None, on_restart=None):
+    """
+    Run the model in the generation slot, recording queue wait, prompt eval (up to the first token), token
+    generation and decode speed. on_piece(text) is called with each piece.
+    Raises Cancelled, in the queue or mid-generation, once stop() returns
+    a reason.
+
+    If a high priority request preempts it, the generation gives up the
+    slot, calls on_restart() and starts over (only once; the second run
+    can't be preempted).
+    """
+    queued = time.perf_counter()
+    preemptible = True
+    while True:
+        with generation_slots.slot(priority, stop, preemptible) as holder:
+            if holder is None:
+                record_cancelled(stop(), "queued", 0, 0.0)
+                raise Cancelled(stop())
+            PRIORITY_WAIT_SECONDS.observe(time.perf_counter() - queued, priority=priority)
+
+            def stop_or_preempt():
+                if holder.preempted:
+                    return "preempted"
+                return stop() if stop is not None else None
+            try:
+                return run_serial(prompt, on_piece, queued, stop_or_preempt)
+            except Cancelled as e:
+                if e.reason != "preempted":
+                    raise
+        PREEMPTED.inc(priority=priority)
+        if on_restart is not None:
+            on_restart()
+        preemptible = False
+        queued = time.perf_counter()
+
+def run_serial(prompt, on_piece, queued, stop=None):
+    first_token = None
+    tokens = 0
+    stopped = None
+
+    def on_token(token_id, piece):
+        nonlocal first_token, tokens, stopped
+        # Returning False makes the model stop generating
+        stopped = stop() if stop is not None else None
+        if stopped is not None:
+            return False
+        if first_token is None:
+            first_token = time.perf_counter()
+        tokens += 1
+        if on_piece is not None:
+            on_piece(piece)
+        return True
+
+    start = time.perf_counter()
+    QUEUE_WAIT_SECONDS.observe(start - queued)
+    with model.chat_session():
+        response = model.generate(
+            prompt,
+            max_tokens=150,
+            temp=0.4,
+            callback=on_token,
+            **generate_kwargs()
+        )
+    end = time.perf_counter()
+    if stopped is not None:
+        # A preempted generation runs again, so it saved nothing
+        if stopped != "preempted":
+            record_cancelled(stopped, "generating", tokens, end - start)
+        raise Cancelled(stopped)
+    record_generation(start, first_token, end, tokens)
+    return response
+
+def record_cancelled(reason, stage, tokens, seconds):
+    CANCELLED.inc(reason=reason, stage=stage)
+    saved_tokens, saved_seconds = generation_cost.saved(tokens, seconds)
+    SAVED_TOKENS.inc(saved_tokens)
+    SAVED_SECONDS.inc(saved_seconds)
+
+def record_generation(start, first_token, end, tokens):
+    generation_cost.observe(tokens, end - start)
+    first_token = first_token or end
+    CHAT_STAGE_SECONDS.observe(first_token - start, stage="prompt_eval")
+    CHAT_STAGE_SECONDS.observe(end - first_token, stage="token_generation")
+    GENERATED_TOKENS.inc(tokens)
+    if tokens > 1 and end > first_token:
+        TOKENS_PER_SECOND.observe((tokens - 1) / (end - first_token))
+
+def generate_reply(prompt, priority="medium", deadline=None):
+    if not CHAT_COALESCE:
+        stop = deadline.check if deadline is not None else None
+        return run_model(prompt, priority=priority, stop=stop)
+    # A shared generation stops only when all its requests have given up.
+    # It runs on a flight thread; carry() keeps it in the leader's profile
+    return flights.do(prompt, profiling.carry(
+        lambda flight: run_model(prompt, flight.push, priority, flight.stop_reason, flight.restart)), deadline)
+
+def stream_reply(prompt, priority="medium", deadline=None):
+    """
+    Iterate over the generated pieces (coalesced like generate_reply).
+    RESTART means the generation was preempted and starts over.
+    """
+    key = prompt if CHAT_COALESCE else object()
+    return flights.stream(key, profiling.carry(
+        lambda flight: run_model(prompt, flight.push, priority, flight.stop_reason, flight.restart)), deadline)
+
+def begin_message(user_id, user_message):
+    """
+    Triage the message and update memory. Returns (route, reply, prompt,
+    priority): the reply for emergency/template routes, the prompt for the
+    LLM route.
+    """
+    # Triage: emergency reply, canned template or LLM
+    with CHAT_STAGE_SECONDS.time(stage="triage"):
+        route, triage = choose_route(user_message)
+    priority = message_priority(triage) if PRIORITY_SCHEDULING else "medium"
+    
+    if route == "emergency":
+        return route, EMERGENCY_REPLY, None, "high"
+    
+    # Get user memory and update it
+    with CHAT_STAGE_SECONDS.time(stage="memory_update"):
+        memory = get_user_memory_simple(user_id)
+        update_memory_simple(user_message, memory)
+        user_memory[user_id] = memory
+        
+        # Save chat
+        save_chat_simple(user_id, "user", user_message)
+    
+    if route == "template":
+        return route, triage_model.templates[triage["category"]], None, priority
+    
+    with CHAT_STAGE_SECONDS.time(stage="prompt_build"):
+        prompt = build_prompt_simple(user_message, memory)
+    return route, None, prompt, priority
+
+TIMEOUT_REPLY = "Sorry, this is taking longer than expected. Please try again."
+
+def request_deadline(data=None):
+    """
+    Deadline for this request: the client's timeout in seconds (JSON
+    "timeout", ?timeout= or X-Request-Timeout) or CHAT_TIMEOUT, plus a
+    check for the client hanging up.
+    """
+    value = (data or {}).get("timeout") or request.args.get("timeout") or request.headers.get("X-Request-Timeout")
+    return Deadline(request_timeout(value), disconnect_probe(request.environ))
+
+def handle_message(user_id, user_message, deadline=None):
+    """
+    Triage, update memory and reply to one message (used by /chat and
+    /voice). The route is "timeout" or "cancelled" if `deadline` stopped it.
+    """
+    start = time.perf_counter()
+    priority = "medium"
+    try:
+        route, reply, prompt, priority = begin_message(user_id, user_message)
+        if prompt is not None:
+            # Generate response
+            response = generate_reply(prompt, priority, deadline)
+            
+            with CHAT_STAGE_SECONDS.time(stage="clean_output"):
+                reply = clean_output(response)
+        
+        if route != "emergency":
+            save_chat_simple(user_id, "assistant", reply)
+        
+    except Cancelled as e:
+        route = "timeout" if e.reason == "deadline" else "cancelled"
+        reply = TIMEOUT_REPLY
+    except Exception as e:
+        print(f"Error: {e}")
+        route = "error"
+        reply = "I encountered an error. Please try again."
+    
+    CHAT_ROUTES.inc(route=route)
+    PRIORITY_SECONDS.observe(time.perf_counter() - start, priority=priority)
+    return {"reply": reply, "route": route}
+
+# =========================
+# Rate Limiting
+# =========================
+# Per-user and per-IP token buckets, and a cap on chat requests in flight:
+# the generation slots plus CHAT_QUEUE_PER_SLOT waiting for each (see
+# ratelimit.py). Shed requests get 429 with Retry-After and the estimated
+# wait. Emergency messages are never limited. RATE_LIMIT=0 turns it off.
+# The IP bucket keys on request.remote_addr: behind a proxy set
+# TRUSTED_PROXIES (see the top of this file), or every patient shares the
+# proxy's bucket. RATE_LIMIT_IP=0 turns just the IP bucket off.
+
+RATE_LIMIT = os.environ.get("RATE_LIMIT", "1") == "1"
+RATE_LIMIT_IP = os.environ.get("RATE_LIMIT_IP", "1") == "1"
+CHAT_QUEUE_PER_SLOT = int(os.environ.get("CHAT_QUEUE_PER_SLOT", 4))
+CHAT_MAX_IN_FLIGHT = int(os.environ.get("CHAT_MAX_IN_FLIGHT")
+                         or generation_slots.slots * (1 + CHAT_QUEUE_PER_SLOT))
+
+rate_limiter = RateLimiter()
+chat_admission = ConcurrencyLimit(CHAT_MAX_IN_FLIGHT)
+
+RATE_LIMITED = metrics.Counter("chat_rate_limited_total", "Chat requests shed with 429, by reason")
+metrics.Callback("chat_in_flight", "Chat requests admitted and not yet answered",
+                 lambda: [({}, chat_admission.active)])
+
+def shed_response(reason, wait):
+    RATE_LIMITED.inc(reason=reason)
+    response = jsonify({
+        "error": "Server busy" if reason == "overload" else "Too many requests",
+        "reason": reason,
+        "retry_after": round(wait, 1),
+        "reply": "I'm helping many patients right now. Please try again shortly."
+    })
+    response.status_code = 429
+    response.headers["Retry-After"] = retry_after(wait)
+    return response
+
+def admit(user_id, message):
+    """
+    Apply the rate limits and the in-flight cap to one chat message. Returns
+    (response, release): a 429 to send back, or None and a function to call
+    once the reply is done.
+    """
+    if not RATE_LIMIT or emergency_check(message):
+        return None, lambda: None
+    
+    # "anonymous" is shared by every client without an id; the IP bucket covers it
+    limited = rate_limiter.check(user=None if user_id == "anonymous" else user_id, ip=request.remote_addr if RATE_LIMIT_IP else None)
+    if limited is not None:
+        return shed_response(*limited), None
+    if not chat_admission.enter():
+        return shed_response("overload", chat_admission.estimated_wait()), None
+    
+    start = time.perf_counter()
+    return None, lambda: chat_admission.leave(time.perf_counter() - start)
+
 # =========================
 # API Endpoints
 # =========================
@@ -209,43 +566,211 @@ def chat():
             "reply": "I'm currently starting up. Please try again in a few minutes."
         }), 503
     
-    # Check emergency
-    if emergency_check(user_message):
-        reply = "⚠️ This may be serious. Please visit the hospital immediately."
-    else:
+    shed, release = admit(user_id, user_message)
+    if shed is not None:
+        return shed
+    try:
+        result = handle_message(user_id, user_message, request_deadline(data))
+    finally:
+        release()
+    status = 504 if result["route"] in ("timeout", "cancelled") else 200
+    return jsonify({**result, "user_id": user_id}), status
+
+@app.route("/chat/stream", methods=["POST"])
+def chat_stream():
+    """
+    Like /chat, but the reply streams as newline-delimited JSON: one
+    {"token": ...} line per generated piece, then a final line with the
+    cleaned reply, route and "done": true. A {"restart": true} line means
+    the generation was preempted by an urgent message and starts over:
+    drop the tokens received so far.
+    """
+    data = request.get_json()
+    
+    if not data or "message" not in data:
+        return jsonify({"error": "No message provided"}), 400
+    
+    user_id = data.get("user_id", "anonymous")
+    user_message = data["message"]
+    
+    if model is None:
+        return jsonify({
+            "error": "Model not loaded",
+            "reply": "I'm currently starting up. Please try again in a few minutes."
+        }), 503
+    
+    shed, release = admit(user_id, user_message)
+    if shed is not None:
+        return shed
+    deadline = request_deadline(data)
+    
+    def events():
+        start = time.perf_counter()
+        priority = "medium"
         try:
-            # Get user memory
-            memory = get_user_memory_simple(user_id)
-            
-            # Update memory
-            update_memory_simple(user_message, memory)
-            user_memory[user_id] = memory
-            
-            # Save chat
-            save_chat_simple(user_id, "user", user_message)
-            
-            # Generate response
-            prompt = build_prompt_simple(user_message, memory)
-            
-            with model.chat_session():
-                response = model.generate(
-                    prompt,
-                    max_tokens=150,
-                    temp=0.4
-                )
-            
-            reply = clean_output(response)
-            save_chat_simple(user_id, "assistant", reply)
-            
+            route, reply, prompt, priority = begin_message(user_id, user_message)
+            if prompt is not None:
+                pieces = []
+                for piece in stream_reply(prompt, priority, deadline):
+                    if piece is RESTART:
+                        pieces = []
+                        yield json.dumps({"restart": True}) + "\n"
+                        continue
+                    pieces.append(piece)
+                    yield json.dumps({"token": piece}) + "\n"
+                with CHAT_STAGE_SECONDS.time(stage="clean_output"):
+                    reply = clean_output("".join(pieces))
+            if route != "emergency":
+                save_chat_simple(user_id, "assistant", reply)
+        except Cancelled as e:
+            route = "timeout" if e.reason == "deadline" else "cancelled"
+            reply = TIMEOUT_REPLY
         except Exception as e:
             print(f"Error: {e}")
+            route = "error"
             reply = "I encountered an error. Please try again."
+        
+        CHAT_ROUTES.inc(route=route)
+        PRIORITY_SECONDS.observe(time.perf_counter() - start, priority=priority)
+        yield json.dumps({"reply": reply, "route": route, "user_id": user_id, "done": True}) + "\n"
+    
+    def released():
+        # finally also runs when the client disconnects and the stream is
+        # closed; the shared generation then stops if nobody else is reading
+        try:
+            yield from events()
+        finally:
+            deadline.cancel("disconnect")
+            release()
+    
+    return Response(released(), mimetype="application/x-ndjson")
+
+# =========================
+# Voice Endpoints
+# =========================
+# Audio in (WAV upload or raw 16 kHz mono PCM), recognized on the Vosk
+# worker pool, answered by the same model and memory as /chat.
+#
+#   POST /voice                          one whole utterance
+#   POST /voice/stream/<session_id>      one chunk; returns the partial transcript
+#   POST /voice/stream/<session_id>/end  finish the utterance and reply
+#
+# Replies are JSON with base64 WAV audio, or raw audio/wav with ?format=wav
+# (transcript and reply then come URL-encoded in X-Transcript / X-Reply).
+
+# Fixed replies (emergency, templates, greetings) are rendered to the TTS
+# cache at startup; TTS_PRERENDER=0 skips it
+if os.environ.get("TTS_PRERENDER", "1") == "1":
+    voice_service.prerender_fixed()
+
+def request_audio():
+    upload = request.files.get("audio")
+    if upload is not None:
+        return voice_service.decode_audio(upload.read(), upload.mimetype or "")
+    return voice_service.decode_audio(request.get_data(), request.content_type or "")
+
+def voice_user_id(default="anonymous"):
+    return request.args.get("user_id") or request.form.get("user_id") or default
+
+def voice_reply(user_id, transcript):
+    if not transcript:
+        return jsonify({"error": "No speech recognized", "transcript": ""}), 422
+    
+    print(f"Heard from {user_id}: {transcript}")
+    shed, release = admit(user_id, transcript)
+    if shed is not None:
+        return shed
+    try:
+        result = handle_message(user_id, transcript, request_deadline())
+    finally:
+        release()
+    if result["route"] in ("timeout", "cancelled"):
+        return jsonify({**result, "transcript": transcript}), 504
+    
+    with CHAT_STAGE_SECONDS.time(stage="tts"):
+        audio = voice_service.synthesize(result["reply"])
+    
+    if request.args.get("format") == "wav":
+        if audio is None:
+            return jsonify({"error": "Speech synthesis unavailable", **result}), 501
+        response = Response(audio, mimetype="audio/wav")
+        response.headers["X-Transcript"] = urllib.parse.quote(transcript)
+        response.headers["X-Reply"] = urllib.parse.quote(result["reply"])
+        response.headers["X-Route"] = result["route"]
+        return response
     
     return jsonify({
-        "reply": reply,
-        "user_id": user_id
+        **result,
+        "user_id": user_id,
+        "transcript": transcript,
+        "audio": base64.b64encode(audio).decode("ascii") if audio else None
     })
 
+def voice_error(e):
+    if isinstance(e, voice_service.VoiceUnavailable):
+        return jsonify({"error": str(e)}), 503
+    return jsonify({"error": str(e)}), 400
+
+@app.route("/voice", methods=["POST"])
+def voice():
+    if model is None:
+        return jsonify({"error": "Model not loaded"}), 503
+    user_id = voice_user_id()
+    try:
+        pcm = request_audio()
+        with CHAT_STAGE_SECONDS.time(stage="stt"):
+            transcript = voice_service.recognize(pcm)
+    except (voice_service.VoiceUnavailable, ValueError, wave.Error) as e:
+        return voice_error(e)
+    return voice_reply(user_id, transcript)
+
+@app.route("/voice/stream/<session_id>", methods=["POST"])
+def voice_stream_chunk(session_id):
+    try:
+        partial = voice_service.stream_chunk(session_id, request_audio())
+    except (voice_service.VoiceUnavailable, ValueError, wave.Error) as e:
+        return voice_error(e)
+    return jsonify({"session_id": session_id, "partial": partial})
+
+@app.route("/voice/stream/<session_id>/end", methods=["POST"])
+def voice_stream_end(session_id):
+    if model is None:
+        return jsonify({"error": "Model not loaded"}), 503
+    with CHAT_STAGE_SECONDS.time(stage="stt"):
+        transcript = voice_service.stream_end(session_id)
+    if transcript is None:
+        return jsonify({"error": "Unknown voice session"}), 404
+    return voice_reply(voice_user_id(session_id), transcript)
+
+TRIAGE_BATCH_LIMIT = int(os.environ.get("TRIAGE_BATCH_LIMIT", 10000))
+
+@app.route("/triage/batch", methods=["POST"])
+def triage_messages():
+    """Pre-screen many messages at once: no LLM, no session memory."""
+    data = request.get_json()
+    
+    if not data or not isinstance(data.get("messages"), list):
+        return jsonify({"error": "messages must be a list"}), 400
+    
+    messages = [str(m) for m in data["messages"]]
+    if len(messages) > TRIAGE_BATCH_LIMIT:
+        return jsonify({"error": f"At most {TRIAGE_BATCH_LIMIT} messages per batch"}), 413
+    
+    start = time.perf_counter()
+    results = triage_batch(messages, classifier=triage_model)
+    elapsed = time.perf_counter() - start
+    
+    return jsonify({
+        "results": results,
+        "count": len(results),
+        "elapsed_ms": round(elapsed * 1000, 3),
+        "messages_per_second": round(len(results) / elapsed) if elapsed > 0 else None
+    })
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
 @app.route("/memory/<user_id>", methods=["GET"])
 def get_memory(user_id):
     memory = get_user_memory_simple(user_id)
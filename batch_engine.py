@@ -0,0 +1,243 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+from deadlines import Cancelled
+
+# =========================
+# Continuous Batching
+# =========================
+#
+# At batch size 1 every decode step streams all the model weights through
+# the CPU to produce a single token. The engine thread instead keeps up to
+# BATCH_MAX requests active and advances all of them with one decode step,
+# so each pass over the weights yields a token for every patient.
+#
+# Batching is continuous: requests join at the next step boundary (after a
+# prefill of their prompts) and leave as soon as their reply is complete,
+# instead of waiting for the whole batch to drain. A request whose stop()
+# returns a reason (deadline, disconnect) is dropped before it is prefilled
+# or before the next step, and fails with Cancelled.
+#
+# The model must have the batched interface FakeModel provides:
+#   start_sequence(prompt, max_tokens, ...)  per-request decoding state
+#   prefill(sequences)                       evaluate new prompts
+#   decode(sequences)                        one step -> next piece of each
+#   sequence.finished
+# Only FakeModel implements it.
+#
+# NOT USED BY THE SERVICE. The GPT4All bindings decode one sequence per model
+# instance and expose no multi-sequence decode, so api.py doesn't import this
+# module and /chat always generates one reply at a time. This is a scaffold
+# for a backend that can batch (e.g. llama.cpp with several sequences in one
+# context): wire it into api.run_model once such a backend exists, and
+# measure it there; the benchmark below only exercises the scheduling.
+
+BATCH_MAX = int(os.environ.get("BATCH_MAX", 1))
+
+
+def supports_batching(model):
+    return all(hasattr(model, name) for name in ("start_sequence", "prefill", "decode"))
+
+
+class BatchRequest:
+    """One prompt submitted to the engine; wait() returns the generated text."""
+
+    def __init__(self, prompt, on_piece=None, stop=None, **generate_args):
+        self.prompt = prompt
+        self.on_piece = on_piece
+        self.stop = stop
+        self.generate_args = generate_args
+        self.sequence = None
+        self.pieces = []
+        self.error = None
+        self.submitted = time.perf_counter()
+        self.admitted = None
+        self.first_token = None
+        self.finished = None
+        self.done = threading.Event()
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return "".join(self.pieces)
+
+
+class BatchEngine(threading.Thread):
+
+    def __init__(self, model, max_batch=BATCH_MAX):
+        if not supports_batching(model):
+            raise ValueError(f"{type(model).__name__} has no batched decode interface")
+        super().__init__(name="batch-engine", daemon=True)
+        self.model = model
+        self.max_batch = max(1, max_batch)
+        self.waiting = deque()
+        self.active = []
+        self.cond = threading.Condition()
+        self.steps = 0
+        self.step_sequences = 0
+        self.start()
+
+    def submit(self, prompt, on_piece=None, stop=None, **generate_args):
+        request = BatchRequest(prompt, on_piece, stop, **generate_args)
+        with self.cond:
+            self.waiting.append(request)
+            self.cond.notify()
+        return request
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.waiting and not self.active:
+                    self.cond.wait()
+                admitted = []
+                while self.waiting and len(self.active) + len(admitted) < self.max_batch:
+                    request = self.waiting.popleft()
+                    # Don't spend a prefill on a request nobody is waiting for
+                    reason = request.stop() if request.stop is not None else None
+                    if reason is not None:
+                        self._finish(request, Cancelled(reason))
+                    else:
+                        admitted.append(request)
+            try:
+                self._step(admitted)
+            except Exception as e:
+                for request in self.active + admitted:
+                    if not request.done.is_set():
+                        self._finish(request, e)
+                self.active = []
+
+    def _step(self, admitted):
+        if admitted:
+            now = time.perf_counter()
+            for request in admitted:
+                request.admitted = now
+                request.sequence = self.model.start_sequence(request.prompt, **request.generate_args)
+            self.model.prefill([r.sequence for r in admitted])
+            self.active += admitted
+
+        running = []
+        for request in self.active:
+            reason = request.stop() if request.stop is not None else None
+            if reason is not None:
+                self._finish(request, Cancelled(reason))
+            elif request.sequence.finished:
+                self._finish(request)
+            else:
+                running.append(request)
+        self.active = running
+        if not running:
+            return
+
+        pieces = self.model.decode([r.sequence for r in running])
+        now = time.perf_counter()
+        self.steps += 1
+        self.step_sequences += len(running)
+        for request, piece in zip(running, pieces):
+            if request.first_token is None:
+                request.first_token = now
+            request.pieces.append(piece)
+            if request.on_piece is not None:
+                request.on_piece(piece)
+
+        self.active = [r for r in running if not r.sequence.finished]
+        for request in running:
+            if request.sequence.finished:
+                self._finish(request)
+
+    def _finish(self, request, error=None):
+        request.error = error
+        request.finished = time.perf_counter()
+        request.done.set()
+
+    def mean_batch_size(self):
+        return self.step_sequences / self.steps if self.steps else 0.0
+
+    def stats(self):
+        return {"max_batch": self.max_batch, "active": len(self.active), "waiting": len(self.waiting),
+                "steps": self.steps, "mean_batch_size": round(self.mean_batch_size(), 2)}
+
+
+# =========================
+# Throughput vs Latency Benchmark
+# =========================
+# `clients` closed-loop clients each send `requests / clients` prompts
+# back to back through an engine of each batch size. Reported: generated
+# tokens/s, requests/s, end-to-end and time-to-first-token percentiles.
+#
+# The numbers are SIMULATED: FakeModel sleeps per its cost model (FAKE_*
+# env vars or the flags below; a batched step costs 1 + batch_cost * (n - 1)
+# single steps), so they show the scheduling behaviour of the engine, not
+# the matmul efficiency of batching on a real CPU model.
+
+def _bench(model, max_batch, prompts, clients, max_tokens):
+    from bench_chat import percentile
+
+    engine = BatchEngine(model, max_batch)
+    done = []
+    lock = threading.Lock()
+
+    def client(i):
+        for prompt in prompts[i::clients]:
+            request = engine.submit(prompt, max_tokens=max_tokens)
+            request.wait()
+            with lock:
+                done.append(request)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    latency = sorted((r.finished - r.submitted) * 1000 for r in done)
+    ttft = sorted((r.first_token - r.submitted) * 1000 for r in done if r.first_token)
+    tokens = sum(len(r.pieces) for r in done)
+    return {
+        "simulated": True,
+        "max_batch": max_batch,
+        "mean_batch_size": round(engine.mean_batch_size(), 2),
+        "tokens_per_second": round(tokens / elapsed, 1),
+        "requests_per_second": round(len(done) / elapsed, 2),
+        "latency_ms": {"p50": percentile(latency, 50), "p95": percentile(latency, 95)},
+        "first_token_ms": {"p50": percentile(ttft, 50), "p95": percentile(ttft, 95)},
+    }
+
+
+if __name__ == "__main__":
+    from model_backend import FakeModel
+
+    parser = argparse.ArgumentParser(
+        description="Throughput vs latency of continuous batching, simulated with FakeModel's cost model")
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--max-tokens", type=int, default=40)
+    parser.add_argument("--prompt-ms", type=float, default=None)
+    parser.add_argument("--token-ms", type=float, default=None)
+    parser.add_argument("--batch-cost", type=float, default=None)
+    args = parser.parse_args()
+
+    model = FakeModel.from_env()
+    if args.prompt_ms is not None:
+        model.prompt_ms = args.prompt_ms
+    if args.token_ms is not None:
+        model.token_ms = args.token_ms
+    if args.batch_cost is not None:
+        model.batch_cost = args.batch_cost
+    if not model.token_ms:
+        model.prompt_ms = model.prompt_ms or 50
+        model.token_ms = 10
+
+    print(f"⚠️  Simulated: FakeModel with token_ms={model.token_ms:g}, batch_cost={model.batch_cost:g}; "
+          "not a measurement of a real CPU model", file=sys.stderr)
+    prompts = [f"Patient {i}: I have had a headache and fever since yesterday." for i in range(args.requests)]
+    for max_batch in args.batch:
+        print(json.dumps(_bench(model, max_batch, prompts, args.clients, args.max_tokens)))
@@ -0,0 +1,189 @@
+import argparse
+import contextlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+# Replays the prompts in hospital_full_merged.jsonl against /chat and reports
+# latency percentiles, throughput and errors as JSON.
+#
+#   python bench_chat.py                          in-process API, fake model
+#   python bench_chat.py --url http://host:5000   a running server (real GGUF)
+#
+# --rate R sends an open-loop Poisson stream of R requests/s, and latency is
+# measured from each request's scheduled arrival, so a saturated server shows
+# up as queueing delay instead of a slower sender. Without --rate every
+# worker sends its next request as soon as the previous one returns.
+#
+# Requests come from a pool of --users returning patients (multi-turn
+# sessions with memory) mixed with --new-user-ratio one-off visitors.
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "hospital_full_merged.jsonl")
+
+
+# =========================
+# Senders
+# =========================
+
+def http_sender(url, timeout):
+    endpoint = url.rstrip("/") + "/chat"
+
+    def send(payload):
+        req = urllib.request.Request(endpoint, data=json.dumps(payload).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(req, timeout=timeout) as resp:
+                return resp.status, json.loads(resp.read())
+        except urllib.error.HTTPError as e:
+            return e.code, None
+    return send
+
+
+def in_process_sender(prompt_ms, token_ms):
+    os.environ["MODEL_BACKEND"] = "fake"
+    os.environ["FAKE_PROMPT_MS"] = str(prompt_ms)
+    os.environ["FAKE_TOKEN_MS"] = str(token_ms)
+    # Measure the serving path, not the per-user limits (RATE_LIMIT=1 to include them)
+    os.environ.setdefault("RATE_LIMIT", "0")
+    import api
+
+    local = threading.local()
+
+    def send(payload):
+        # Flask test clients are not shared between threads
+        if not hasattr(local, "client"):
+            local.client = api.app.test_client()
+        resp = local.client.post("/chat", json=payload)
+        return resp.status_code, resp.get_json()
+    return send
+
+
+# =========================
+# Workload
+# =========================
+
+def load_prompts(path):
+    from dataset_store import load_rows
+    return [row["prompt"] for row in load_rows(path)]
+
+
+def build_requests(prompts, count, users, new_user_ratio, seed):
+    rng = random.Random(seed)
+    requests = []
+    for i in range(count):
+        if rng.random() < new_user_ratio:
+            user_id = f"bench-visitor-{seed}-{i}"
+        else:
+            user_id = f"bench-user-{seed}-{rng.randrange(users)}"
+        requests.append({"user_id": user_id, "message": rng.choice(prompts)})
+    return requests
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return round(sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo), 3)
+
+
+def run(send, requests, concurrency, rate, seed):
+    """Return a list of (latency seconds, status, route) per request."""
+    results = [None] * len(requests)
+
+    def one(i, scheduled):
+        try:
+            status, body = send(requests[i])
+        except Exception as e:
+            status, body = type(e).__name__, None
+        route = body.get("route") if isinstance(body, dict) else None
+        results[i] = (time.perf_counter() - scheduled, status, route)
+
+    rng = random.Random(seed + 1)
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        scheduled = start
+        for i in range(len(requests)):
+            if rate:
+                scheduled += rng.expovariate(rate)
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(one, i, scheduled)
+            else:
+                pool.submit(lambda i=i: one(i, time.perf_counter()))
+    return results, time.perf_counter() - start
+
+
+def summarize(results, elapsed):
+    latencies = sorted(r[0] * 1000 for r in results if r[1] == 200)
+    statuses = Counter(str(r[1]) for r in results)
+    errors = len(results) - len(latencies)
+    return {
+        "requests": len(results),
+        "errors": errors,
+        "error_rate": errors / len(results) if results else 0.0,
+        "status_counts": dict(statuses),
+        "routes": dict(Counter(r[2] for r in results if r[2])),
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 3) if latencies else None,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": round(latencies[-1], 3) if latencies else None,
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay dataset prompts against /chat")
+    parser.add_argument("--url", help="Base URL of a running API (default: in-process with the fake model)")
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=0, help="Open-loop arrivals per second (0 = closed loop)")
+    parser.add_argument("--users", type=int, default=50, help="Returning users sharing sessions")
+    parser.add_argument("--new-user-ratio", type=float, default=0.2)
+    parser.add_argument("--warmup", type=int, default=10, help="Requests sent before measuring")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--fake-prompt-ms", type=float, default=0)
+    parser.add_argument("--fake-token-ms", type=float, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    if args.url:
+        send = http_sender(args.url, args.timeout)
+    else:
+        with contextlib.redirect_stdout(sys.stderr):
+            send = in_process_sender(args.fake_prompt_ms, args.fake_token_ms)
+
+    prompts = load_prompts(args.data)
+    # Keep the API's per-request logging out of the JSON report
+    with contextlib.redirect_stdout(sys.stderr):
+        for payload in build_requests(prompts, args.warmup, 1, 0, args.seed + 1000):
+            send(payload)
+
+        requests = build_requests(prompts, args.requests, args.users, args.new_user_ratio, args.seed)
+        results, elapsed = run(send, requests, args.concurrency, args.rate, args.seed)
+
+    report = {
+        "target": args.url or "in-process",
+        "config": {k: v for k, v in vars(args).items() if k not in ("url", "output")},
+        **summarize(results, elapsed),
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
@@ -0,0 +1,184 @@
+import threading
+import time
+
+from deadlines import Cancelled
+
+# =========================
+# Request Coalescing (single-flight)
+# =========================
+#
+# During a spike many patients send the same message at once, and with
+# matching memory build_prompt_simple() gives byte-identical prompts. The
+# first request for a key becomes the leader and runs the generation; any
+# identical request arriving while it is in flight joins it and gets the
+# same result instead of queueing for the model again.
+#
+# A flight also records the pieces it produces, so streaming followers
+# replay what was generated before they joined and then follow live.
+# Once the leader finishes the key is released: later requests start a
+# new generation (this is not a response cache).
+#
+# Each participant brings its Deadline. The generation runs on its own
+# thread, so any participant, the one that started it included, stops
+# waiting when its deadline passes; the generation itself stops
+# (stop_reason()) only once every participant has given up.
+#
+# A generation preempted by a higher priority request starts over
+# (scheduler.py); restart() drops its pieces and streams yield RESTART so
+# readers can discard what they already got.
+
+WAIT_POLL_SECONDS = 0.1
+
+# Yielded by Flight.stream() when the generation starts over
+RESTART = object()
+
+
+class Flight:
+    """One in-flight generation, shared by everyone who asked for its key."""
+
+    def __init__(self, key):
+        self.key = key
+        self.pieces = []
+        self.restarts = 0
+        self.followers = 0
+        self.deadlines = []
+        self.done = False
+        self.result = None
+        self.error = None
+        self.started = time.perf_counter()
+        self.cond = threading.Condition()
+
+    def push(self, piece):
+        with self.cond:
+            self.pieces.append(piece)
+            self.cond.notify_all()
+
+    def restart(self):
+        """Drop the pieces pushed so far: the generation is starting over."""
+        with self.cond:
+            self.pieces = []
+            self.restarts += 1
+            self.cond.notify_all()
+
+    def finish(self, result=None, error=None):
+        with self.cond:
+            self.result = result
+            self.error = error
+            self.done = True
+            self.cond.notify_all()
+
+    def stop_reason(self):
+        """Why to stop generating: set once every participant has given up."""
+        reasons = [d.check() if d is not None else None for d in list(self.deadlines)]
+        if reasons and all(reasons):
+            return reasons[0]
+        return None
+
+    def _wait(self, deadline, ready):
+        while not ready():
+            if deadline is None:
+                self.cond.wait()
+                continue
+            reason = deadline.check()
+            if reason is not None:
+                raise Cancelled(reason)
+            self.cond.wait(WAIT_POLL_SECONDS)
+
+    def wait(self, deadline=None):
+        with self.cond:
+            self._wait(deadline, lambda: self.done)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def stream(self, deadline=None):
+        """
+        Yield every piece pushed so far, then new ones until the flight ends.
+        RESTART means the pieces yielded so far are void.
+        """
+        i = 0
+        restarts = None
+        while True:
+            with self.cond:
+                if restarts is None:
+                    restarts = self.restarts
+                self._wait(deadline, lambda: i < len(self.pieces) or self.done or self.restarts != restarts)
+                restarted = self.restarts != restarts
+                if restarted:
+                    restarts = self.restarts
+                    i = 0
+                pieces = self.pieces[i:]
+                done = self.done
+            if restarted:
+                yield RESTART
+            i += len(pieces)
+            yield from pieces
+            if done and i == len(self.pieces):
+                break
+        if self.error is not None:
+            raise self.error
+
+
+class SingleFlight:
+
+    def __init__(self):
+        self.flights = {}
+        self.lock = threading.Lock()
+        self.counts = {}
+        self.saved_seconds = 0.0
+
+    def _join(self, key, mode, deadline):
+        with self.lock:
+            flight = self.flights.get(key)
+            # A flight everyone has abandoned is about to stop; don't join it
+            leader = flight is None or flight.stop_reason() is not None
+            if leader:
+                flight = self.flights[key] = Flight(key)
+            else:
+                flight.followers += 1
+            flight.deadlines.append(deadline)
+            role = "leader" if leader else "follower"
+            self.counts[(role, mode)] = self.counts.get((role, mode), 0) + 1
+        return flight, leader
+
+    def _run(self, flight, fn):
+        try:
+            result, error = fn(flight), None
+        except Exception as e:
+            result, error = None, e
+        with self.lock:
+            if self.flights.get(flight.key) is flight:
+                del self.flights[flight.key]
+            # Each follower would otherwise have run the whole generation itself
+            self.saved_seconds += flight.followers * (time.perf_counter() - flight.started)
+        flight.finish(result, error)
+
+    def _start(self, flight, fn):
+        # fn runs on its own thread so no client owns the generation: the
+        # one who started it can time out or disconnect like anyone else
+        threading.Thread(target=self._run, args=(flight, fn), name="flight", daemon=True).start()
+
+    def do(self, key, fn, deadline=None):
+        """
+        Return fn(flight) for `key`, sharing the call with any identical one
+        in flight. fn may flight.push() pieces for streaming followers.
+        Raises Cancelled if `deadline` passes first.
+        """
+        flight, leader = self._join(key, "blocking", deadline)
+        if leader:
+            self._start(flight, fn)
+        return flight.wait(deadline)
+
+    def stream(self, key, fn, deadline=None):
+        """Like do(), but return an iterator over the pushed pieces."""
+        flight, leader = self._join(key, "stream", deadline)
+        if leader:
+            self._start(flight, fn)
+        return flight.stream(deadline)
+
+    def in_flight(self):
+        return len(self.flights)
+
+    def stats(self):
+        with self.lock:
+            return [({"role": role, "mode": mode}, n) for (role, mode), n in self.counts.items()]
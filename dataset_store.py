@@ -0,0 +1,261 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+# Compact on-disk format for the hospital dataset (.hds)
+#
+#   magic "HDS1" | u32 version | u64 meta length | meta JSON | column data
+#
+# The meta JSON holds the dictionaries for the categorical columns and the
+# (offset, dtype, count) of every column. Columns are 8-byte aligned arrays:
+#   category / severity / intent   u8 codes into the dictionaries
+#   response                       u32 id into the interned response table
+#   weight                         u32 duplicate count (1 unless deduplicated)
+#   prompt_offsets                 u64[n + 1] into the string heap
+#   response_offsets               u64[r + 1] into the string heap
+#   heap                           UTF-8 bytes of every prompt and response
+# The reader mmaps the file and wraps the columns with np.frombuffer, so
+# opening is O(1) and rows are only decoded when they are accessed.
+
+MAGIC = b"HDS1"
+VERSION = 1
+HEADER = struct.Struct("<4sIQ")
+CATEGORICAL = ("category", "severity", "intent")
+
+
+def _align(n):
+    return (n + 7) & ~7
+
+
+def convert(jsonl_path, out_path):
+    """Convert a JSONL dataset into the .hds format; returns the row count."""
+    dictionaries = {name: {} for name in CATEGORICAL}
+    codes = {name: [] for name in CATEGORICAL}
+    responses = {}
+    response_ids = []
+    weights = []
+    prompts = []
+
+    with open(jsonl_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            for name in CATEGORICAL:
+                values = dictionaries[name]
+                codes[name].append(values.setdefault(row.get(name), len(values)))
+            response_ids.append(responses.setdefault(row.get("response", ""), len(responses)))
+            weights.append(row.get("weight", 1))
+            prompts.append(row.get("prompt", "").encode("utf-8"))
+
+    response_bytes = [r.encode("utf-8") for r in responses]
+    heap = b"".join(prompts) + b"".join(response_bytes)
+    prompt_offsets = np.zeros(len(prompts) + 1, dtype=np.uint64)
+    np.cumsum([len(p) for p in prompts], out=prompt_offsets[1:])
+    response_offsets = np.zeros(len(response_bytes) + 1, dtype=np.uint64)
+    np.cumsum([len(r) for r in response_bytes], out=response_offsets[1:])
+    response_offsets += prompt_offsets[-1]
+
+    arrays = {name: np.asarray(codes[name], dtype=np.uint8) for name in CATEGORICAL}
+    arrays["response"] = np.asarray(response_ids, dtype=np.uint32)
+    arrays["weight"] = np.asarray(weights, dtype=np.uint32)
+    arrays["prompt_offsets"] = prompt_offsets
+    arrays["response_offsets"] = response_offsets
+    arrays["heap"] = np.frombuffer(heap, dtype=np.uint8)
+
+    # Lay the columns out after the header, padding the meta block so the
+    # first column starts on an 8-byte boundary
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = [offset, array.dtype.str, int(array.size)]
+        offset = _align(offset + array.nbytes)
+
+    meta = {
+        "rows": len(prompts),
+        "dictionaries": {name: list(values) for name, values in dictionaries.items()},
+        "layout": layout,
+    }
+    meta_bytes = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+    data_start = _align(HEADER.size + len(meta_bytes))
+    meta_bytes += b" " * (data_start - HEADER.size - len(meta_bytes))
+
+    with open(out_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(meta_bytes)))
+        f.write(meta_bytes)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name][0])
+            f.write(array.tobytes())
+        f.truncate(data_start + offset)
+
+    return len(prompts)
+
+
+class HospitalDataset:
+    """Read-only, memory-mapped view of a .hds file."""
+
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, meta_len = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a hospital dataset file")
+
+        meta = json.loads(bytes(self._mm[HEADER.size:HEADER.size + meta_len]))
+        self.dictionaries = meta["dictionaries"]
+        self._rows = meta["rows"]
+
+        data_start = HEADER.size + meta_len
+        self.columns = {}
+        for name, (offset, dtype, count) in meta["layout"].items():
+            self.columns[name] = np.frombuffer(self._mm, dtype=np.dtype(dtype),
+                                               count=count, offset=data_start + offset)
+        self._heap = self.columns["heap"]
+
+    def __len__(self):
+        return self._rows
+
+    def _string(self, offsets, i):
+        return self._heap[int(offsets[i]):int(offsets[i + 1])].tobytes().decode("utf-8")
+
+    def prompt(self, i):
+        return self._string(self.columns["prompt_offsets"], i)
+
+    def response(self, i):
+        return self._string(self.columns["response_offsets"], int(self.columns["response"][i]))
+
+    def label(self, name, i):
+        return self.dictionaries[name][self.columns[name][i]]
+
+    def labels(self, name):
+        """Decoded labels of a categorical column as a list."""
+        values = np.asarray(self.dictionaries[name], dtype=object)
+        return values[self.columns[name]].tolist()
+
+    def prompts(self):
+        return [self.prompt(i) for i in range(self._rows)]
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self._rows
+        if not 0 <= i < self._rows:
+            raise IndexError(i)
+        row = {
+            "prompt": self.prompt(i),
+            "category": self.label("category", i),
+            "response": self.response(i),
+            "severity": self.label("severity", i),
+            "intent": self.label("intent", i),
+        }
+        weight = int(self.columns["weight"][i])
+        if weight != 1:
+            row["weight"] = weight
+        return row
+
+    def __iter__(self):
+        for i in range(self._rows):
+            yield self[i]
+
+    def close(self):
+        """
+        Release the mapping. Arrays taken from `columns` are views into it;
+        if a caller still holds one the mapping stays open until the last
+        view is freed, instead of close() failing with BufferError.
+        """
+        self.columns = {}
+        self._heap = None
+        try:
+            self._mm.close()
+        except BufferError:
+            pass
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_rows(path):
+    """Load a dataset as an iterable of row dicts from either format."""
+    if path.endswith(".hds"):
+        return HospitalDataset(path)
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# =========================
+# Benchmark
+# =========================
+
+def _rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def _measure(fmt, path):
+    """Runs in a fresh interpreter so each format starts from the same RSS."""
+    before = _rss_mb()
+    start = time.perf_counter()
+    if fmt == "jsonl":
+        rows = load_rows(path)
+        categories = [r["category"] for r in rows]
+    else:
+        rows = HospitalDataset(path)
+        categories = rows.columns["category"]
+    load = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for row in rows:
+        pass
+    scan = time.perf_counter() - start
+
+    print(json.dumps({"rows": len(rows), "categories": len(categories), "load_s": load,
+                      "scan_s": scan, "rss_mb": _rss_mb() - before}))
+    # Drop the column view before closing the mapping under it
+    del categories
+    if fmt == "hds":
+        rows.close()
+
+
+def benchmark(jsonl_path, hds_path):
+    if not os.path.exists(hds_path):
+        convert(jsonl_path, hds_path)
+
+    print(f"{'format':<8}{'size MB':>10}{'load ms':>10}{'scan ms':>10}{'RSS MB':>10}")
+    for fmt, path in (("jsonl", jsonl_path), ("hds", hds_path)):
+        out = subprocess.run([sys.executable, __file__, "_measure", fmt, path],
+                             capture_output=True, text=True, check=True).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        size = os.path.getsize(path) / (1024 * 1024)
+        print(f"{fmt:<8}{size:>10.2f}{result['load_s'] * 1000:>10.2f}"
+              f"{result['scan_s'] * 1000:>10.2f}{result['rss_mb']:>10.2f}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "_measure":
+        _measure(sys.argv[2], sys.argv[3])
+        sys.exit()
+
+    parser = argparse.ArgumentParser(description="Convert the dataset to the compact .hds format")
+    parser.add_argument("input", nargs="?", default="hospital_full_merged.jsonl")
+    parser.add_argument("-o", "--output", help="output .hds file (default: input name with .hds)")
+    parser.add_argument("--benchmark", action="store_true", help="compare load time and RSS against the JSONL")
+    args = parser.parse_args()
+
+    output = args.output or os.path.splitext(args.input)[0] + ".hds"
+    if args.benchmark:
+        benchmark(args.input, output)
+    else:
+        rows = convert(args.input, output)
+        print(f"✅ Saved {rows} rows to {output} "
+              f"({os.path.getsize(output) / 1024:.0f} KB, was {os.path.getsize(args.input) / 1024:.0f} KB)")
@@ -0,0 +1,108 @@
+import os
+import select
+import socket
+import time
+
+# =========================
+# Request Deadlines & Cancellation
+# =========================
+#
+# Every chat request gets a Deadline: the client's timeout (JSON "timeout",
+# ?timeout= or X-Request-Timeout, in seconds) or CHAT_TIMEOUT, capped at
+# CHAT_MAX_TIMEOUT. check() also notices a client that has hung up, by
+# peeking at the request socket every DISCONNECT_POLL_MS.
+#
+# Generation polls check() from the token callback and stops as soon as
+# nobody is waiting for the reply any more, so an abandoned request stops
+# costing CPU mid-sequence instead of running to max_tokens.
+
+CHAT_TIMEOUT = float(os.environ.get("CHAT_TIMEOUT", 60))
+CHAT_MAX_TIMEOUT = float(os.environ.get("CHAT_MAX_TIMEOUT", 300))
+DISCONNECT_POLL_MS = float(os.environ.get("DISCONNECT_POLL_MS", 250))
+
+
+class Cancelled(Exception):
+    """Work stopped because its request timed out ("deadline") or went away ("disconnect")."""
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def request_timeout(value=None):
+    """Seconds allowed for a request, from the client's value or the default."""
+    try:
+        seconds = float(value) if value not in (None, "") else CHAT_TIMEOUT
+    except (TypeError, ValueError):
+        seconds = CHAT_TIMEOUT
+    if seconds <= 0:
+        seconds = CHAT_TIMEOUT
+    return min(seconds, CHAT_MAX_TIMEOUT)
+
+
+def disconnect_probe(environ):
+    """
+    Function telling whether the client behind a WSGI environ has closed
+    the connection, or None if the server doesn't expose its socket
+    (gunicorn and the Werkzeug dev server do).
+    """
+    sock = environ.get("gunicorn.socket") or environ.get("werkzeug.socket")
+    if sock is None:
+        return None
+
+    def closed():
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+            # Readable with nothing to read means the peer sent FIN
+            return bool(readable) and sock.recv(1, socket.MSG_PEEK) == b""
+        except (OSError, ValueError):
+            return True
+    return closed
+
+
+class Deadline:
+
+    def __init__(self, seconds=CHAT_TIMEOUT, disconnected=None):
+        self.expires = time.monotonic() + seconds
+        self.disconnected = disconnected
+        self.reason = None
+        self._next_poll = 0.0
+
+    def remaining(self):
+        return max(0.0, self.expires - time.monotonic())
+
+    def cancel(self, reason="disconnect"):
+        self.reason = self.reason or reason
+
+    def check(self):
+        """None while the request is still wanted, else why it isn't."""
+        if self.reason is None:
+            now = time.monotonic()
+            if now >= self.expires:
+                self.reason = "deadline"
+            elif self.disconnected is not None and now >= self._next_poll:
+                self._next_poll = now + DISCONNECT_POLL_MS / 1000
+                if self.disconnected():
+                    self.reason = "disconnect"
+        return self.reason
+
+
+class GenerationCost:
+    """Running averages of finished generations, used to price cancelled ones."""
+
+    def __init__(self):
+        self.tokens = None
+        self.seconds = None
+
+    def observe(self, tokens, seconds):
+        if self.tokens is None:
+            self.tokens, self.seconds = tokens, seconds
+        else:
+            self.tokens = 0.9 * self.tokens + 0.1 * tokens
+            self.seconds = 0.9 * self.seconds + 0.1 * seconds
+
+    def saved(self, tokens, seconds):
+        """(tokens, seconds) a generation stopped after `tokens` / `seconds` didn't spend."""
+        if self.tokens is None:
+            return 0.0, 0.0
+        return max(0.0, self.tokens - tokens), max(0.0, self.seconds - seconds)
@@ -0,0 +1,147 @@
+import argparse
+import glob
+import hashlib
+import json
+import re
+from collections import Counter, defaultdict
+
+import numpy as np
+
+# Collapses repeated rows across the batch files in two stages:
+#   1. exact duplicates: same category + same normalized prompt
+#   2. near duplicates: MinHash signatures over character shingles, with LSH
+#      banding to find candidates, confirmed by estimated Jaccard similarity
+# Every kept row gets a "weight" holding how many input rows it stands for,
+# so training can still see the original frequencies.
+# Rows are only ever merged inside the same category, never across labels.
+
+NUM_PERM = 64
+BANDS = 16              # 16 bands x 4 rows: ~0.8 similarity gets caught reliably
+SHINGLE = 5
+THRESHOLD = 0.8
+MERSENNE = (1 << 61) - 1
+
+_rng = np.random.RandomState(42)
+_PERM_A = _rng.randint(1, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+
+
+def normalize(text):
+    text = text.lower().replace("’", "'").replace("‘", "'")
+    text = re.sub(r"[^\w\s']", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def exact_key(row, text):
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+    return row.get("category"), digest
+
+
+def shingles(text):
+    if len(text) <= SHINGLE:
+        return {text}
+    return {text[i:i + SHINGLE] for i in range(len(text) - SHINGLE + 1)}
+
+
+def minhash(text):
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little")
+         for s in shingles(text)),
+        dtype=np.uint64
+    )
+    # (a * x + b) mod p stays inside uint64 because a, b and x are all 32-bit
+    values = (_PERM_A[:, None] * hashes[None, :] + _PERM_B[:, None]) % MERSENNE
+    return values.min(axis=1)
+
+
+def band_keys(signature):
+    rows = NUM_PERM // BANDS
+    return [signature[i * rows:(i + 1) * rows].tobytes() for i in range(BANDS)]
+
+
+def dedup(rows, threshold=THRESHOLD):
+    """Return (kept_rows, stats) where stats counts drops per category."""
+    kept = []
+    exact_index = {}
+    signatures = []
+    lsh = defaultdict(list)
+    stats = defaultdict(Counter)
+
+    for row in rows:
+        category = row.get("category")
+        weight = row.get("weight", 1)
+        text = normalize(row.get("prompt", ""))
+        stats[category]["input"] += 1
+
+        key = exact_key(row, text)
+        if key in exact_index:
+            kept[exact_index[key]]["weight"] += weight
+            stats[category]["exact"] += 1
+            continue
+
+        signature = minhash(text)
+        bands = band_keys(signature)
+
+        match = None
+        candidates = set()
+        for band, band_key in enumerate(bands):
+            candidates.update(lsh[(category, band, band_key)])
+        for idx in sorted(candidates):
+            if np.mean(signatures[idx] == signature) >= threshold:
+                match = idx
+                break
+
+        if match is not None:
+            kept[match]["weight"] += weight
+            exact_index[key] = match
+            stats[category]["near"] += 1
+            continue
+
+        idx = len(kept)
+        kept.append(dict(row, weight=weight))
+        exact_index[key] = idx
+        signatures.append(signature)
+        for band, band_key in enumerate(bands):
+            lsh[(category, band, band_key)].append(idx)
+        stats[category]["kept"] += 1
+
+    return kept, stats
+
+
+def read_rows(files):
+    for file in files:
+        with open(file, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def print_report(stats):
+    print(f"{'category':<22}{'input':>8}{'exact':>8}{'near':>8}{'kept':>8}")
+    totals = Counter()
+    for category in sorted(stats, key=str):
+        s = stats[category]
+        totals.update(s)
+        print(f"{str(category):<22}{s['input']:>8}{s['exact']:>8}{s['near']:>8}{s['kept']:>8}")
+    print(f"{'TOTAL':<22}{totals['input']:>8}{totals['exact']:>8}{totals['near']:>8}{totals['kept']:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deduplicate dataset batch files")
+    parser.add_argument("files", nargs="*",
+                        help="input JSONL files (default: every hospital_batch*/hospital_data_batch* file)")
+    parser.add_argument("-o", "--output", default="hospital_dedup.jsonl")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="estimated Jaccard similarity for near duplicates")
+    args = parser.parse_args()
+
+    files = args.files or sorted(glob.glob("hospital_batch*.jsonl") + glob.glob("hospital_data_batch*.jsonl"))
+    kept, stats = dedup(read_rows(files), threshold=args.threshold)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        for row in kept:
+            json.dump(row, f, ensure_ascii=False)
+            f.write("\n")
+
+    print_report(stats)
+    print(f"✅ Saved {len(kept)} rows from {len(files)} files to {args.output}")
@@ -0,0 +1,27 @@
+import os
+
+# =========================
+# Gunicorn Settings (used by procfile and render.yaml)
+# =========================
+#
+# One worker process holds the model, and threads serve its requests
+# (gthread). Sync workers serve one request at a time, so coalescing,
+# priority scheduling and the in-flight cap in api.py would never see two
+# requests at once.
+#
+# Threads cover every chat request a worker admits (the generation slot
+# plus CHAT_QUEUE_PER_SLOT waiting for it, or CHAT_MAX_IN_FLIGHT) plus
+# GUNICORN_SPARE_THREADS for what bypasses the cap: emergency replies,
+# 429 responses, /metrics and health checks. GUNICORN_THREADS overrides it.
+#
+# More workers means another copy of the model in memory each; share the
+# rate limits between them with RATE_LIMIT_REDIS_URL (see ratelimit.py).
+
+chat_in_flight = int(os.environ.get("CHAT_MAX_IN_FLIGHT")
+                     or 1 + int(os.environ.get("CHAT_QUEUE_PER_SLOT", 4)))
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get("GUNICORN_WORKERS", 1))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS")
+              or chat_in_flight + int(os.environ.get("GUNICORN_SPARE_THREADS", 4)))
@@ -1,6 +1,7 @@
 import os
 import re
-from gpt4all import GPT4All
+from inference_config import generate_kwargs
+from model_backend import load_model
 
 from database import (
     SessionLocal,
@@ -19,7 +20,7 @@ MODEL_PATH = os.path.join(
     "mistral-7b-openorca.gguf2.Q4_0.gguf"
 )
 
-model = GPT4All(MODEL_PATH, allow_download=False)
+model = load_model(MODEL_PATH, allow_download=False)
 
 
 # =========================
@@ -200,7 +201,8 @@ def chat():
                 response = model.generate(
                     prompt,
                     max_tokens=150,
-                    temp=0.4
+                    temp=0.4,
+                    **generate_kwargs()
                 )
 
             reply = clean_output(response)
@@ -1,10 +1,13 @@
 # hospital_data_generator.py
 
-from gpt4all import GPT4All
+from inference_config import load_config, generate_kwargs
+from model_backend import load_model
+from merge_and_shuffle import shuffle_merge
 import json
-import random
 import re
 import os
+import time
+import multiprocessing
 
 # -------------------------------
 # 1️⃣ Base Categories & Prompts
@@ -116,12 +119,24 @@ medium_risk = ["malaria_fever", "typhoid_infection", "respiratory", "swelling_in
 low_risk = ["digestive", "appointment"]
 
 # -------------------------------
-# 4️⃣ Load Model
+# 4️⃣ Model Workers
 # -------------------------------
-model = GPT4All(
-    "mistral-7b-openorca.gguf2.Q4_0.gguf",
-    model_path="./models"
-)
+# Each worker process loads its own model. The GGUF weights are mmap'd, so
+# the page cache shares them between workers; only the KV cache is per worker.
+# GENERATOR_WORKERS picks the pool size, and the cores are split between the
+# workers through the inference config (INFERENCE_PIN_CPUS pins each one).
+MODEL_NAME = "mistral-7b-openorca.gguf2.Q4_0.gguf"
+WORKERS = int(os.environ.get("GENERATOR_WORKERS", 1))
+
+model = None
+
+def init_worker(worker, workers):
+    global model
+    config = load_config(replicas=workers, replica=worker)
+    model = load_model(MODEL_NAME, config=config, model_path="./models")
+
+def init_pool_worker(worker_ids, workers):
+    init_worker(worker_ids.get(), workers)
 
 # -------------------------------
 # 5️⃣ Helper: Clean Lines
@@ -139,15 +154,20 @@ def clean_lines(text):
 # -------------------------------
 ROUNDS = 5
 VARIATIONS = 10        # more variations to increase dataset
-BATCH_SAVE = 1000
 
-synthetic_data = []
+def build_jobs():
+    jobs = []
+    for round_num in range(1, ROUNDS + 1):
+        for category, prompts in base_prompts.items():
+            for base_text in prompts:
+                jobs.append((round_num, category, base_text))
+    return jobs
 
-for round_num in range(1, ROUNDS + 1):
-    print(f"\n=== Round {round_num}/{ROUNDS} ===")
-    for category, prompts in base_prompts.items():
-        for base_text in prompts:
-            gen_prompt = f"""
+def run_job(job):
+    round_num, category, base_text = job
+    start = time.perf_counter()
+
+    gen_prompt = f"""
 Generate {VARIATIONS} natural, empathetic ways a Nigerian patient might say:
 "{base_text}"
 
@@ -155,65 +175,211 @@ Include emotions, sympathy, and short suggestions for relief or coping before vi
 Each on a new line.
 """
 
+    try:
+        response = model.generate(gen_prompt, max_tokens=800, **generate_kwargs())
+    except Exception as e:
+        # No rows: the job stays out of the manifest and is retried on resume
+        print("Generation error:", e)
+        return job, None, time.perf_counter() - start
+    variations = clean_lines(response)
+    if not variations:
+        variations = [base_text]
+
+    severity = "high" if category in high_risk else "medium" if category in medium_risk else "low"
+    intent = "emergency" if severity == "high" else ("appointment" if category=="appointment" else "complaint")
+
+    rows = []
+    for text in variations:
+        rows.append({
+            "prompt": text,
+            "category": category,
+            "response": safe_responses[category],
+            "severity": severity,
+            "intent": intent
+        })
+
+    return job, rows, time.perf_counter() - start
+
+def batch_filename(round_num):
+    return f"hospital_batch_round{round_num}.jsonl"
+
+# -------------------------------
+# Run Manifest (resumable runs)
+# -------------------------------
+# Every finished job is appended to the manifest together with the byte
+# offset its batch file reached. On restart, finished jobs are skipped and
+# each batch file is truncated back to its last recorded offset, which drops
+# rows from a job that was cut off half-way. If a batch file is missing or
+# shorter than an offset (deleted or restored from an older copy), the jobs
+# whose rows it lost are dropped from the manifest and run again. A job whose
+# generation failed is not recorded, so the next run retries it. Set
+# GENERATOR_FRESH=1 to start over.
+MANIFEST_FILE = "hospital_generation_manifest.jsonl"
+FRESH = os.environ.get("GENERATOR_FRESH", "0") == "1"
+
+def load_manifest(path=MANIFEST_FILE):
+    entries = []
+    if not os.path.exists(path):
+        return entries
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
             try:
-                response = model.generate(gen_prompt, max_tokens=800)
-                variations = clean_lines(response)
-                if not variations:
-                    variations = [base_text]
-            except Exception as e:
-                print("Generation error:", e)
-                variations = [base_text]
-
-            for text in variations:
-                severity = "high" if category in high_risk else "medium" if category in medium_risk else "low"
-                intent = "emergency" if severity == "high" else ("appointment" if category=="appointment" else "complaint")
-
-                synthetic_data.append({
-                    "prompt": text,
-                    "category": category,
-                    "response": safe_responses[category],
-                    "severity": severity,
-                    "intent": intent
-                })
-
-            # Batch save to avoid freezing
-            if len(synthetic_data) >= BATCH_SAVE:
-                filename = f"hospital_batch_round{round_num}.jsonl"
-                with open(filename, "a", encoding="utf-8") as f:
-                    for row in synthetic_data:
-                        json.dump(row, f, ensure_ascii=False)
-                        f.write("\n")
-                print(f"Saved batch {len(synthetic_data)} to {filename}")
-                synthetic_data = []
-
-# Save remaining
-if synthetic_data:
-    filename = "hospital_batch_final.jsonl"
-    with open(filename, "a", encoding="utf-8") as f:
-        for row in synthetic_data:
-            json.dump(row, f, ensure_ascii=False)
+                entries.append(json.loads(line))
+            except ValueError:
+                # Torn final line from a crash mid-write
+                break
+    return entries
+
+def write_manifest(entries, path=MANIFEST_FILE):
+    """Replace the manifest atomically, so a crash leaves the old or the new one."""
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        for entry in entries:
+            json.dump(entry, f, ensure_ascii=False)
             f.write("\n")
-    print(f"Saved remaining {len(synthetic_data)} to {filename}")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def prepare_run(jobs, fresh=FRESH):
+    """Return the jobs still to do and truncate batch files to the manifest."""
+    rounds = sorted({job[0] for job in jobs})
+
+    if fresh or not os.path.exists(MANIFEST_FILE):
+        # Empty the manifest first: it must never list rows a batch file lost
+        write_manifest([])
+        for round_num in rounds:
+            open(batch_filename(round_num), "w", encoding="utf-8").close()
+        return jobs
+
+    entries = load_manifest()
+    # Keep only the jobs whose rows are still in their batch file
+    sizes = {}
+    kept = []
+    for entry in entries:
+        filename = entry["file"]
+        if filename not in sizes:
+            sizes[filename] = os.path.getsize(filename) if os.path.exists(filename) else 0
+        if entry["end"] <= sizes[filename]:
+            kept.append(entry)
+    if len(kept) < len(entries):
+        print(f"Re-queueing {len(entries) - len(kept)} jobs whose rows are missing from their batch file")
+    entries = kept
+
+    completed = set()
+    offsets = {}
+    for entry in entries:
+        completed.add((entry["round"], entry["category"], entry["base_text"]))
+        offsets[entry["file"]] = max(offsets.get(entry["file"], 0), entry["end"])
+
+    for round_num in rounds:
+        filename = batch_filename(round_num)
+        end = offsets.get(filename, 0)
+        if os.path.exists(filename) and os.path.getsize(filename) != end:
+            print(f"Truncating {filename} to {end} bytes (dropping unfinished job rows)")
+        with open(filename, "a", encoding="utf-8") as f:
+            f.truncate(end)
+
+    # Rewrite the manifest without any torn trailing line
+    write_manifest(entries)
+
+    remaining = [job for job in jobs if job not in completed]
+    print(f"Resuming: {len(jobs) - len(remaining)} jobs already done, {len(remaining)} to go")
+    return remaining
+
+def record_job(manifest, job, filename, end, rows):
+    round_num, category, base_text = job
+    json.dump({
+        "round": round_num,
+        "category": category,
+        "base_text": base_text,
+        "file": filename,
+        "end": end,
+        "rows": rows
+    }, manifest, ensure_ascii=False)
+    manifest.write("\n")
+    manifest.flush()
+    os.fsync(manifest.fileno())
+
+def generate_dataset(workers=WORKERS, fresh=FRESH):
+    jobs = prepare_run(build_jobs(), fresh=fresh)
+    total = len(jobs)
+    print(f"\n=== Generating {total} jobs ({ROUNDS} rounds) on {workers} worker(s) ===")
+    if not jobs:
+        return
+
+    if workers > 1:
+        worker_ids = multiprocessing.Queue()
+        for i in range(workers):
+            worker_ids.put(i)
+        pool = multiprocessing.Pool(workers, initializer=init_pool_worker,
+                                    initargs=(worker_ids, workers))
+        results = pool.imap_unordered(run_job, jobs)
+    else:
+        init_worker(0, 1)
+        pool = None
+        results = map(run_job, jobs)
+
+    # Stream results to the batch files as each job finishes
+    files = {}
+    manifest = open(MANIFEST_FILE, "a", encoding="utf-8")
+    done = 0
+    failed = 0
+    rows_written = 0
+    start = time.perf_counter()
+
+    try:
+        for job, rows, elapsed in results:
+            round_num, category, base_text = job
+            if rows is None:
+                failed += 1
+                print(f"[failed] round {round_num} {category}: left pending for the next run")
+                continue
+            filename = batch_filename(round_num)
+            if round_num not in files:
+                files[round_num] = open(filename, "a", encoding="utf-8")
+            f = files[round_num]
+            for row in rows:
+                json.dump(row, f, ensure_ascii=False)
+                f.write("\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+            # Only mark the job done once its rows are safely on disk
+            record_job(manifest, job, filename, f.tell(), len(rows))
+
+            done += 1
+            rows_written += len(rows)
+            wall = time.perf_counter() - start
+            eta = wall / done * (total - done)
+            print(f"[{done}/{total}] round {round_num} {category}: {len(rows)} rows in {elapsed:.1f}s "
+                  f"| {done / wall * 60:.1f} jobs/min, {rows_written / wall:.1f} rows/s, ETA {eta / 60:.1f} min")
+    finally:
+        for f in files.values():
+            f.close()
+        manifest.close()
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    print(f"\n Generated {rows_written} rows in {(time.perf_counter() - start) / 60:.1f} min")
+    if failed:
+        print(f"⚠️  {failed} jobs failed; run again to retry them")
 
 # -------------------------------
 # 7️⃣ Merge & Shuffle All Batch Files
 # -------------------------------
-all_files = [f for f in os.listdir(".") if f.startswith("hospital_batch") and f.endswith(".jsonl")]
-merged_data = []
-
-for file in all_files:
-    with open(file, "r", encoding="utf-8") as f:
-        for line in f:
-            merged_data.append(json.loads(line))
-
-random.shuffle(merged_data)
+def merge_batches():
+    # Streams rows through temporary bucket files, so memory stays flat
+    # however many rounds were generated
+    all_files = sorted(f for f in os.listdir(".") if f.startswith("hospital_batch") and f.endswith(".jsonl"))
+    rows = shuffle_merge(all_files, "hospital_full_merged.jsonl")
 
-with open("hospital_full_merged.jsonl", "w", encoding="utf-8") as f:
-    for row in merged_data:
-        json.dump(row, f, ensure_ascii=False)
-        f.write("\n")
+    print(f"\n Merged {rows} questions into hospital_full_merged.jsonl")
 
-print(f"\n Merged {len(merged_data)} questions into hospital_full_merged.jsonl")
+if __name__ == "__main__":
+    generate_dataset()
+    merge_batches()
 
 
 
@@ -1,13 +1,12 @@
 # hospital_voice_chat.py
 
-from gpt4all import GPT4All
-import pyttsx3
+from inference_config import generate_kwargs
+from model_backend import load_model
+from speech_stream import StreamingRecognizer, load_vosk_model, microphone_frames, wav_frames
+from voice_pipeline import Speaker, speak_streaming
+from tts_cache import TTSCache, fixed_responses
 import random
-import json
 import os
-import queue
-import sounddevice as sd
-from vosk import Model, KaldiRecognizer
 import re
 
 # -------------------------------
@@ -35,7 +34,7 @@ medium_risk = ["malaria_fever", "typhoid_infection"]
 # 2️⃣ Load GPT4All model
 # -------------------------------
 
-model = GPT4All("mistral-7b-openorca.gguf2.Q4_0.gguf", model_path="./models")
+model = load_model("mistral-7b-openorca.gguf2.Q4_0.gguf", model_path="./models")
 
 # -------------------------------
 # 3️⃣ Helper functions
@@ -53,44 +52,43 @@ def clean_lines(text):
 # 4️⃣ Setup TTS
 # -------------------------------
 
-engine = pyttsx3.init()
-engine.setProperty('rate', 150)  # speech rate
+# The TTS engine lives on its own thread (voice_pipeline.Speaker). With
+# VOICE_PIPELINE=1 (default) replies are spoken sentence by sentence while the
+# model is still generating; VOICE_PIPELINE=0 speaks the finished reply.
+# Spoken audio goes through the TTS cache (TTS_CACHE=0 to disable), and the
+# fixed responses are rendered into it whenever the speaker is idle.
+VOICE_PIPELINE = os.environ.get("VOICE_PIPELINE", "1") == "1"
+
+speaker = Speaker(cache=TTSCache() if os.environ.get("TTS_CACHE", "1") == "1" else None)
+speaker.prerender(fixed_responses() + list(safe_responses.values()))
 
 def speak(text):
-    engine.say(text)
-    engine.runAndWait()
+    speaker.say(text)
+    speaker.wait()
 
 # -------------------------------
-# 5️⃣ Setup Vosk (offline STT)
+# 5️⃣ Setup Vosk (offline, streaming STT)
 # -------------------------------
+# Recognition runs while the patient is talking and stops on silence (see
+# speech_stream.py), so a turn takes about as long as the speech itself.
 
 model_path = "models/vosk/vosk-model-small-en-us-0.15"
 if not os.path.exists(model_path):
     print("Download Vosk model first!")
     exit(1)
 
-vosk_model = Model(model_path)
-q = queue.Queue()
-
-def callback(indata, frames, time, status):
-    if status:
-        print(status)
-    q.put(bytes(indata))
-
-def listen_vosk(duration=5):
-    rec = KaldiRecognizer(vosk_model, 16000)
-    result_text = ""
-    with sd.RawInputStream(samplerate=16000, blocksize=8000, dtype='int16',
-                           channels=1, callback=callback):
-        print("🎤 Listening...")
-        for _ in range(int(duration * 1000 / 30)):
-            data = q.get()
-            if rec.AcceptWaveform(data):
-                res = json.loads(rec.Result())
-                result_text += res.get("text", "") + " "
-        res = json.loads(rec.FinalResult())
-        result_text += res.get("text", "")
-    return result_text.strip()
+stt = StreamingRecognizer(load_vosk_model(model_path))
+
+def show_partial(text):
+    print(f"\r🎤 {text}", end="", flush=True)
+
+def listen_vosk(wav_path=None):
+    # A WAV file (16 kHz mono) can stand in for the microphone
+    frames = wav_frames(wav_path, realtime=True) if wav_path else microphone_frames()
+    print("🎤 Listening...")
+    result = stt.listen(frames, on_partial=show_partial)
+    print()
+    return result["text"]
 
 # -------------------------------
 # 6️⃣ Chat loop
@@ -99,14 +97,15 @@ def listen_vosk(duration=5):
 print("🤖 Hospital AI Nurse is ready. Say something or type 'exit' to quit.")
 
 while True:
-    choice = input("Type 'speak' to talk or enter text: ").strip().lower()
+    raw = input("Type 'speak' (or 'speak <file.wav>') to talk or enter text: ").strip()
+    choice = raw.lower()
 
     if choice == "exit":
         print("Goodbye!")
         break
 
-    if choice == "speak":
-        user_input = listen_vosk()
+    if choice == "speak" or choice.startswith("speak "):
+        user_input = listen_vosk(raw[6:].strip() or None)
         print("You said:", user_input)
     else:
         user_input = choice
@@ -120,8 +119,23 @@ You are a sympathetic Nigerian nurse. Respond to the patient:
 "{user_input}"
 Include emotional support and suggest ways to relieve pain or manage the situation before visiting the hospital.
 """
+    if VOICE_PIPELINE:
+        try:
+            print()
+            response, timings = speak_streaming(
+                model, gen_prompt, speaker,
+                on_token=lambda token: print(token, end="", flush=True),
+                max_tokens=300, **generate_kwargs()
+            )
+            print(f"\n⏱️  first audio after {timings['first_audio_ms']} ms, "
+                  f"reply done after {timings['total_ms']} ms")
+        except Exception as e:
+            print("Error:", e)
+            speak("Sorry, I could not process that. Please try again.")
+        continue
+
     try:
-        response = model.generate(gen_prompt, max_tokens=300)
+        response = model.generate(gen_prompt, max_tokens=300, **generate_kwargs())
     except Exception as e:
         response = "Sorry, I could not process that. Please try again."
         print("Error:", e)
@@ -0,0 +1,225 @@
+# inference_config.py
+
+import os
+import json
+import time
+
+# =========================
+# Runtime Config (env driven)
+# =========================
+#
+# INFERENCE_THREADS    llama.cpp threads per model (default: CPUs / replicas)
+# INFERENCE_BATCH      prompt-eval batch size passed to generate() (n_batch)
+# INFERENCE_CTX        context window (n_ctx)
+# INFERENCE_DEVICE     "cpu", "gpu", "kompute", ... (default: cpu)
+# INFERENCE_REPLICAS   number of model replicas sharing this host
+# INFERENCE_REPLICA    index of this replica (0-based)
+# INFERENCE_PIN_CPUS   "1" to pin this replica to its own CPU block
+# INFERENCE_AUTOTUNE   "1" to benchmark thread counts at startup
+
+TUNING_FILE = os.path.join(os.path.dirname(__file__), "models", "inference_tuning.json")
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    if value is None or value == "":
+        return default
+    return int(value)
+
+
+def _env_flag(name, default=False):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def load_config(**overrides):
+    config = {
+        "n_threads": _env_int("INFERENCE_THREADS", None),
+        "n_batch": _env_int("INFERENCE_BATCH", 8),
+        "n_ctx": _env_int("INFERENCE_CTX", 2048),
+        "device": os.environ.get("INFERENCE_DEVICE", "cpu"),
+        "replicas": max(1, _env_int("INFERENCE_REPLICAS", 1)),
+        "replica": _env_int("INFERENCE_REPLICA", 0),
+        "pin_cpus": _env_flag("INFERENCE_PIN_CPUS"),
+        "autotune": _env_flag("INFERENCE_AUTOTUNE"),
+    }
+    config.update({k: v for k, v in overrides.items() if v is not None})
+    return config
+
+
+INFERENCE = load_config()
+
+
+def generate_kwargs(config=None):
+    """Extra keyword arguments for model.generate() taken from the config."""
+    config = config or INFERENCE
+    return {"n_batch": config["n_batch"]}
+
+
+# =========================
+# CPU Topology & Affinity
+# =========================
+
+def available_cpus():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _parse_cpulist(text):
+    cpus = []
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-")
+            cpus.extend(range(int(start), int(end) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def numa_nodes():
+    """Return the CPUs of each NUMA node, or one node with every CPU."""
+    allowed = set(available_cpus())
+    nodes = []
+    base = "/sys/devices/system/node"
+    if os.path.isdir(base):
+        for name in sorted(os.listdir(base)):
+            if not (name.startswith("node") and name[4:].isdigit()):
+                continue
+            try:
+                with open(os.path.join(base, name, "cpulist")) as f:
+                    cpus = [c for c in _parse_cpulist(f.read()) if c in allowed]
+            except OSError:
+                continue
+            if cpus:
+                nodes.append(cpus)
+    return nodes or [sorted(allowed)]
+
+
+def replica_cpus(replica, replicas):
+    """
+    Split the host's CPUs into `replicas` contiguous blocks, filling one NUMA
+    node before moving to the next so a replica stays on local memory.
+    """
+    cpus = [c for node in numa_nodes() for c in node]
+    per_replica = max(1, len(cpus) // replicas)
+    start = (replica % replicas) * per_replica
+    block = cpus[start:start + per_replica]
+    return block or cpus
+
+
+def pin_replica(replica, replicas):
+    if not hasattr(os, "sched_setaffinity"):
+        print("⚠️  CPU pinning is not supported on this platform")
+        return available_cpus()
+    cpus = replica_cpus(replica, replicas)
+    os.sched_setaffinity(0, cpus)
+    print(f"📌 Replica {replica}/{replicas} pinned to CPUs {cpus}")
+    return cpus
+
+
+def default_threads(config):
+    # Split the cores between replicas so they don't oversubscribe each other
+    cpus = len(available_cpus())
+    if config["pin_cpus"]:
+        return max(1, cpus)
+    return max(1, cpus // config["replicas"])
+
+
+# =========================
+# Thread Auto-Tuner
+# =========================
+
+def _load_tuning():
+    try:
+        with open(TUNING_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_tuning(tuning):
+    try:
+        os.makedirs(os.path.dirname(TUNING_FILE), exist_ok=True)
+        with open(TUNING_FILE, "w", encoding="utf-8") as f:
+            json.dump(tuning, f, indent=2)
+    except OSError as e:
+        print(f"⚠️  Could not save tuning results: {e}")
+
+
+def thread_candidates(max_threads):
+    candidates = {1, max_threads}
+    n = 2
+    while n < max_threads:
+        candidates.add(n)
+        n *= 2
+    # Physical-core count is usually the sweet spot on SMT machines
+    candidates.add(max(1, max_threads // 2))
+    return sorted(candidates)
+
+
+def autotune_threads(model, model_name, config=None, candidates=None,
+                     prompt="Patient: I have a headache since yesterday.", max_tokens=16):
+    """
+    Time a short generation at several thread counts and keep the fastest.
+    Results are cached per model / CPU set so restarts skip the benchmark.
+    """
+    config = config or INFERENCE
+    cpus = available_cpus()
+    key = f"{os.path.basename(model_name)}|{len(cpus)}|{config['n_batch']}"
+
+    tuning = _load_tuning()
+    if key in tuning:
+        best = tuning[key]["n_threads"]
+        model.model.set_thread_count(best)
+        print(f"⚙️  Using tuned n_threads={best}")
+        return best
+
+    candidates = candidates or thread_candidates(len(cpus))
+    results = {}
+    for n in candidates:
+        model.model.set_thread_count(n)
+        start = time.perf_counter()
+        model.generate(prompt, max_tokens=max_tokens, temp=0.0, n_batch=config["n_batch"])
+        results[n] = time.perf_counter() - start
+        print(f"   n_threads={n}: {results[n]:.2f}s")
+
+    best = min(results, key=results.get)
+    model.model.set_thread_count(best)
+    tuning[key] = {"n_threads": best, "timings": results}
+    _save_tuning(tuning)
+    print(f"⚙️  Auto-tuned n_threads={best}")
+    return best
+
+
+# =========================
+# Model Loader
+# =========================
+
+def load_model(model_name, config=None, **kwargs):
+    """Construct a GPT4All model using the runtime config."""
+    from gpt4all import GPT4All
+
+    config = config or INFERENCE
+
+    if config["pin_cpus"]:
+        pin_replica(config["replica"], config["replicas"])
+
+    n_threads = config["n_threads"] or default_threads(config)
+
+    model = GPT4All(
+        model_name,
+        n_threads=n_threads,
+        device=config["device"],
+        n_ctx=config["n_ctx"],
+        **kwargs
+    )
+
+    if config["autotune"]:
+        autotune_threads(model, model_name, config)
+
+    return model
@@ -1,9 +1,10 @@
-from gpt4all import GPT4All
+from inference_config import generate_kwargs
+from model_backend import load_model
 from transformers import pipeline
 
 
 # GPT4All (Chat)
-chat_model = GPT4All(
+chat_model = load_model(
     "mistral-7b-openorca.gguf",
     model_path="./models"
 )
@@ -23,4 +24,4 @@ def medical_explain(text):
 
 def chat_reply(prompt):
 
-    return chat_model.generate(prompt, max_tokens=200)
+    return chat_model.generate(prompt, max_tokens=200, **generate_kwargs())
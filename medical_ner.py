@@ -1,5 +1,5 @@
-import dateparser
-from textblob import TextBlob
+from spelling import fix_spelling
+from temporal import extract_duration
 
 conversation = {
     "symptom": None,
@@ -9,10 +9,6 @@ conversation = {
 
 print(" HospitalAI Assistant Ready ")
 
-def fix_spelling(text):
-    return str(TextBlob(text).correct())
-
-
 while True:
     user = input("Patient: ").strip()
 
@@ -33,10 +29,10 @@ while True:
 
 
     # Detect time
-    parsed_date = dateparser.parse(corrected)
+    duration = extract_duration(corrected)
 
-    if parsed_date:
-        conversation["symptom_time"] = parsed_date
+    if duration:
+        conversation["symptom_time"] = duration["onset"]
         print("Bot: Thank you. How severe is the pain from 1 to 10?")
         continue
 
@@ -1,26 +1,131 @@
+import argparse
 import glob
-import json
+import os
 import random
+import tempfile
+import time
 
-# 1️⃣ Collect all batch files
-batch_files = sorted(glob.glob("hospital_data_batch*.jsonl"))  # includes final batch
-all_data = []
+# Rows are never parsed: lines are moved around as raw bytes.
+#
+# Shuffling uses two passes so memory stays bounded whatever the input size:
+#   1. scatter every line to one of N temporary bucket files chosen at random
+#   2. load one bucket at a time, shuffle it in memory and append it to the output
+# A uniform bucket choice followed by a uniform in-bucket shuffle gives a uniform
+# shuffle of the whole dataset. N is picked so one bucket fits in the RAM budget,
+# and the N write buffers of pass 1 fit in it too.
 
-# 2️⃣ Load all data from batches
-for file in batch_files:
-    with open(file, "r", encoding="utf-8") as f:
-        for line in f:
-            all_data.append(json.loads(line))
+MEMORY_LIMIT_MB = int(os.environ.get("MERGE_MEMORY_MB", 64))
+WRITE_CHUNK = 1 << 20  # 1 MB output writes
+MIN_BUFFER = 4 * 1024
 
-print(f"Merged {len(all_data)} questions from {len(batch_files)} batch files.")
 
-# 3️⃣ Shuffle to mix categories
-random.shuffle(all_data)
+def bucket_count(total_bytes, memory_limit_mb):
+    """Return (buckets, write buffer bytes per bucket) for the RAM budget."""
+    # Python keeps ~2x the raw bytes per line (object header + list slot),
+    # so aim for buckets of about half the budget; in pass 1 the write
+    # buffers of all the buckets share that same half
+    budget = max(1, memory_limit_mb) * 1024 * 1024 // 2
+    buckets = max(1, -(-total_bytes // budget))
+    buffer_size = min(WRITE_CHUNK, budget // buckets)
+    if buffer_size < MIN_BUFFER:
+        raise ValueError(f"{total_bytes / 2**20:.0f} MB can't be shuffled in {memory_limit_mb} MB: "
+                         f"its {buckets} buckets need {buckets * MIN_BUFFER / 2**20:.0f} MB of write buffers")
+    return buckets, buffer_size
 
-# 4️⃣ Save to a single file
-with open("hospital_full_merged.jsonl", "w", encoding="utf-8") as f:
-    for item in all_data:
-        json.dump(item, f, ensure_ascii=False)
-        f.write("\n")
 
-print("✅ Saved all questions in hospital_full_merged.jsonl")
+def shuffle_merge(input_files, output_file, memory_limit_mb=MEMORY_LIMIT_MB, seed=None):
+    """Merge JSONL files into `output_file` in random order; returns the row count."""
+    rng = random.Random(seed)
+    total_bytes = sum(os.path.getsize(f) for f in input_files)
+    buckets, buffer_size = bucket_count(total_bytes, memory_limit_mb)
+
+    out_dir = os.path.dirname(os.path.abspath(output_file))
+    rows = 0
+
+    with tempfile.TemporaryDirectory(dir=out_dir, prefix=".shuffle-") as tmp:
+        # 1️⃣ Scatter lines to random buckets
+        paths = [os.path.join(tmp, f"bucket{i}.jsonl") for i in range(buckets)]
+        writers = [open(p, "wb", buffering=buffer_size) for p in paths]
+        try:
+            for file in input_files:
+                with open(file, "rb", buffering=WRITE_CHUNK) as f:
+                    for line in f:
+                        if not line.strip():
+                            continue
+                        if not line.endswith(b"\n"):
+                            line += b"\n"
+                        writers[rng.randrange(buckets)].write(line)
+                        rows += 1
+        finally:
+            for w in writers:
+                w.close()
+
+        # 2️⃣ Shuffle each bucket in memory and stream it out
+        with open(output_file, "wb", buffering=WRITE_CHUNK) as out:
+            for path in paths:
+                with open(path, "rb") as f:
+                    lines = f.readlines()
+                rng.shuffle(lines)
+                out.writelines(lines)
+                del lines
+                os.remove(path)
+
+    return rows
+
+
+# =========================
+# Benchmark
+# =========================
+
+def write_synthetic(path, lines):
+    row = ('{"prompt": "I have high fever and chills since yesterday %d", "category": "malaria_fever", '
+           '"response": "I understand this feels awful. Make sure to rest and stay hydrated.", '
+           '"severity": "medium", "intent": "complaint"}\n')
+    with open(path, "w", encoding="utf-8", buffering=WRITE_CHUNK) as f:
+        for i in range(lines):
+            f.write(row % i)
+
+
+def benchmark(lines, memory_limit_mb):
+    import resource  # Unix only, and only needed here
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, "synthetic.jsonl")
+        dst = os.path.join(tmp, "shuffled.jsonl")
+
+        print(f"Writing {lines:,} synthetic rows...")
+        write_synthetic(src, lines)
+        size_mb = os.path.getsize(src) / (1024 * 1024)
+
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        start = time.perf_counter()
+        rows = shuffle_merge([src], dst, memory_limit_mb=memory_limit_mb, seed=0)
+        elapsed = time.perf_counter() - start
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    print(f"Shuffled {rows:,} rows ({size_mb:.0f} MB) in {elapsed:.1f}s")
+    print(f"Throughput: {rows / elapsed:,.0f} rows/s, {size_mb / elapsed:.1f} MB/s")
+    print(f"Memory limit: {memory_limit_mb} MB, peak RSS: {rss_after:.0f} MB (was {rss_before:.0f} MB)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge and shuffle dataset batch files")
+    parser.add_argument("files", nargs="*", help="input JSONL files (default: hospital_data_batch*.jsonl)")
+    parser.add_argument("-o", "--output", default="hospital_full_merged.jsonl")
+    parser.add_argument("--memory-mb", type=int, default=MEMORY_LIMIT_MB, help="RAM budget for shuffling")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--benchmark", type=int, nargs="?", const=10_000_000, metavar="LINES",
+                        help="shuffle a synthetic file instead (default 10M lines)")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.benchmark, args.memory_mb)
+    else:
+        # 1️⃣ Collect all batch files
+        batch_files = args.files or sorted(glob.glob("hospital_data_batch*.jsonl"))  # includes final batch
+
+        # 2️⃣ Merge, shuffle and save to a single file
+        rows = shuffle_merge(batch_files, args.output, memory_limit_mb=args.memory_mb, seed=args.seed)
+
+        print(f"Merged {rows} questions from {len(batch_files)} batch files.")
+        print(f"✅ Saved all questions in {args.output}")
@@ -0,0 +1,174 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Minimal Prometheus-format metrics, cheap enough to leave on in production:
+# every update is one lock plus a dict lookup (and a bisect for histograms).
+# render() produces the text exposition format served on /metrics.
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                   0.5, 1, 2.5, 5, 10, 30, 60)
+RATE_BUCKETS = (1, 2, 5, 10, 15, 20, 30, 50, 75, 100, 200)
+
+_registry = []
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    items = list(key) + list(extra)
+    if not items:
+        return ""
+    body = ",".join(f'{k}="{str(v)}"'.replace("\n", " ") for k, v in items)
+    return "{" + body + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self._lock = threading.Lock()
+        self._values = {}
+        _registry.append(self)
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, value=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def value(self, **labels):
+        return self._values.get(_label_key(labels), 0)
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            for key, value in self._values.items():
+                lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def inc(self, value=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def dec(self, value=1, **labels):
+        self.inc(-value, **labels)
+
+    def value(self, **labels):
+        return self._values.get(_label_key(labels), 0)
+
+    render = Counter.render
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS):
+        super().__init__(name, help)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels):
+        state = self._values.get(_label_key(labels))
+        return state[2] if state else 0
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            items = [(k, list(v[0]), v[1], v[2]) for k, v in self._values.items()]
+        for key, counts, total, n in items:
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                le = (("le", _format_value(bound if bound == float("inf") else float(bound))),)
+                lines.append(f"{self.name}_bucket{_format_labels(key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {n}")
+        return lines
+
+
+class Callback(_Metric):
+    """Metric whose samples are read from a function at scrape time."""
+
+    def __init__(self, name, help, fn, type="gauge"):
+        super().__init__(name, help)
+        self.fn = fn
+        self.type = type
+
+    def render(self):
+        lines = self._header()
+        for labels, value in self.fn():
+            lines.append(f"{self.name}{_format_labels(_label_key(labels))} {_format_value(value)}")
+        return lines
+
+
+def lru_cache_metrics(caches):
+    """
+    Register hit/miss/ratio metrics for functools.lru_cache functions,
+    given as {"name": cached_function}.
+    """
+    def samples(field):
+        def read():
+            for name, fn in caches.items():
+                info = fn.cache_info()
+                if field == "ratio":
+                    total = info.hits + info.misses
+                    yield {"cache": name}, (info.hits / total) if total else 0.0
+                else:
+                    yield {"cache": name}, getattr(info, field)
+        return read
+
+    Callback("cache_hits_total", "LRU cache hits", samples("hits"), type="counter")
+    Callback("cache_misses_total", "LRU cache misses", samples("misses"), type="counter")
+    Callback("cache_hit_ratio", "LRU cache hit ratio since start", samples("ratio"))
+
+
+def render():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,152 @@
+import hashlib
+import os
+import time
+from contextlib import contextmanager
+
+import inference_config
+
+# =========================
+# Model Backends
+# =========================
+#
+# MODEL_BACKEND picks what load_model() returns:
+#   gpt4all  the real GGUF model through inference_config (default)
+#   fake     FakeModel: deterministic replies, no weights, simulated latency
+#
+# FakeModel latency (milliseconds, all default 0):
+#   FAKE_PROMPT_MS        fixed prompt-eval cost per generate() call
+#   FAKE_PROMPT_TOKEN_MS  extra prompt-eval cost per prompt token
+#   FAKE_TOKEN_MS         cost per generated token
+# FAKE_REPLY_TOKENS sets the reply length (default 40, capped by max_tokens).
+#
+# Latency is simulated with time.sleep, which releases the GIL the same way
+# llama.cpp does, so concurrency behaves like the real backend.
+#
+# FakeModel also has the batched interface batch_engine.py drives
+# (start_sequence / prefill / decode). CPU decode is memory-bound: a step
+# reads every weight once whatever the batch size, so each extra sequence
+# in a step adds only FAKE_BATCH_COST (default 0.15) of FAKE_TOKEN_MS.
+
+MODEL_BACKEND = os.environ.get("MODEL_BACKEND", "gpt4all")
+
+FAKE_REPLIES = [
+    "I understand how uncomfortable this is. Please rest, drink plenty of water and "
+    "visit the hospital if it does not improve in two days.",
+    "I'm sorry you're feeling this way. Take paracetamol for the pain, eat light meals "
+    "and see a doctor for proper tests.",
+    "That sounds worrying. Please keep calm, avoid heavy activity and contact your "
+    "healthcare provider as soon as possible.",
+    "Thank you for letting me know. I can help you book an appointment at a time that "
+    "is convenient for you.",
+]
+
+
+def _env_ms(name):
+    return float(os.environ.get(name) or 0)
+
+
+class FakeSequence:
+    """Decoding state of one prompt in a batch."""
+
+    def __init__(self, prompt, tokens):
+        self.prompt_tokens = len(prompt.split())
+        self.tokens = tokens
+        self.pos = 0
+
+    @property
+    def finished(self):
+        return self.pos >= len(self.tokens)
+
+
+class FakeModel:
+    """
+    Drop-in stand-in for GPT4All: the same generate()/chat_session() surface,
+    a reply chosen by hashing the prompt, and configurable latency.
+    """
+
+    def __init__(self, prompt_ms=0.0, prompt_token_ms=0.0, token_ms=0.0, reply_tokens=40, batch_cost=0.15):
+        self.prompt_ms = prompt_ms
+        self.prompt_token_ms = prompt_token_ms
+        self.token_ms = token_ms
+        self.reply_tokens = reply_tokens
+        self.batch_cost = batch_cost
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.generated_tokens = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            prompt_ms=_env_ms("FAKE_PROMPT_MS"),
+            prompt_token_ms=_env_ms("FAKE_PROMPT_TOKEN_MS"),
+            token_ms=_env_ms("FAKE_TOKEN_MS"),
+            reply_tokens=int(os.environ.get("FAKE_REPLY_TOKENS") or 40),
+            batch_cost=float(os.environ.get("FAKE_BATCH_COST") or 0.15),
+        )
+
+    @contextmanager
+    def chat_session(self, system_prompt=None, prompt_template=None):
+        yield self
+
+    def reply_tokens_for(self, prompt, max_tokens):
+        digest = int(hashlib.md5(prompt.encode("utf-8")).hexdigest(), 16)
+        words = FAKE_REPLIES[digest % len(FAKE_REPLIES)].split()
+        count = min(self.reply_tokens, max_tokens)
+        return [(" " if i else "") + words[i % len(words)] for i in range(count)]
+
+    def _tokens(self, prompt, max_tokens, callback):
+        prompt_tokens = len(prompt.split())
+        self.calls += 1
+        self.prompt_tokens += prompt_tokens
+        delay = self.prompt_ms + self.prompt_token_ms * prompt_tokens
+        if delay:
+            time.sleep(delay / 1000)
+
+        for i, token in enumerate(self.reply_tokens_for(prompt, max_tokens)):
+            if self.token_ms:
+                time.sleep(self.token_ms / 1000)
+            self.generated_tokens += 1
+            if callback is not None and callback(i, token) is False:
+                return
+            yield token
+
+    def generate(self, prompt, max_tokens=200, temp=0.7, streaming=False, callback=None, **kwargs):
+        tokens = self._tokens(prompt, max_tokens, callback)
+        if streaming:
+            return tokens
+        return "".join(tokens)
+
+    # ---- batched decoding ----
+
+    def start_sequence(self, prompt, max_tokens=200, temp=0.7, **kwargs):
+        return FakeSequence(prompt, self.reply_tokens_for(prompt, max_tokens))
+
+    def prefill(self, sequences):
+        """Evaluate the prompts of newly admitted sequences in one pass."""
+        prompt_tokens = sum(seq.prompt_tokens for seq in sequences)
+        self.calls += len(sequences)
+        self.prompt_tokens += prompt_tokens
+        delay = self.prompt_ms + self.prompt_token_ms * prompt_tokens
+        if delay:
+            time.sleep(delay / 1000)
+
+    def decode(self, sequences):
+        """One decode step for every sequence; returns the next piece of each."""
+        if self.token_ms:
+            time.sleep(self.token_ms * (1 + self.batch_cost * (len(sequences) - 1)) / 1000)
+        pieces = []
+        for seq in sequences:
+            pieces.append(seq.tokens[seq.pos])
+            seq.pos += 1
+        self.generated_tokens += len(sequences)
+        return pieces
+
+
+def load_model(model_name, config=None, backend=None, **kwargs):
+    """Load `model_name` with the configured backend (see MODEL_BACKEND)."""
+    backend = backend or MODEL_BACKEND
+    if backend == "fake":
+        return FakeModel.from_env()
+    if backend == "gpt4all":
+        return inference_config.load_model(model_name, config=config, **kwargs)
+    raise ValueError(f"Unknown MODEL_BACKEND: {backend}")
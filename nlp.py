@@ -0,0 +1,300 @@
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future
+from queue import Queue, Empty
+
+from spelling import fix_spelling, add_terms
+
+# Symptom extraction for process_message().
+#
+# Stages, each timed:
+#   spelling   cached SymSpell correction of the message
+#   gazetteer  token trie over known symptom phrases (longest match wins)
+#   ner        optional token-classification model, only run on the spans the
+#              gazetteer left unresolved, batched across concurrent callers
+#
+# The NER model is off unless NER_MODEL names a Hugging Face token
+# classification model (e.g. d4data/biomedical-ner-all). NER_BACKEND picks
+# "torch" (transformers pipeline, default) or "onnx" (optimum + onnxruntime).
+# Symptom names are fact-safe identifiers so they can go straight into the
+# rule engine (rules.py): fever, headache, vomiting, chest_pain, bleeding...
+# Phrases are kept specific because matches feed the emergency rules: bare
+# words like "temperature", "weak" or "fits" also turn up in messages that
+# don't describe the symptom.
+
+NER_MODEL = os.environ.get("NER_MODEL")
+NER_BACKEND = os.environ.get("NER_BACKEND", "torch")
+NER_MAX_BATCH = int(os.environ.get("NER_MAX_BATCH", 16))
+NER_MAX_WAIT_MS = float(os.environ.get("NER_MAX_WAIT_MS", 5))
+NER_TIMEOUT = float(os.environ.get("NER_TIMEOUT", 2))
+
+# canonical symptom -> surface phrases (English and Nigerian-English)
+SYMPTOM_LEXICON = {
+    "fever": ["fever", "feverish", "high temperature", "hot body", "body is hot",
+              "body hot", "body dey hot", "temperature is high", "running a temperature"],
+    "headache": ["headache", "head ache", "head is paining", "head dey pain me",
+                 "head dey pain", "migraine", "my head hurts"],
+    "vomiting": ["vomit", "vomits", "vomiting", "vomited", "vomitting", "throw up", "throwing up"],
+    "chest_pain": ["chest pain", "chest is paining", "chest is tight", "chest tightness",
+                   "tight chest", "my chest hurts"],
+    "bleeding": ["bleeding", "bleed", "bleeds", "blood is not stopping", "lost blood",
+                 "lost much blood"],
+    "cough": ["cough", "coughing", "catarrh"],
+    "diarrhea": ["diarrhea", "diarrhoea", "running stomach", "loose stool", "stooling"],
+    "nausea": ["nausea", "nauseous", "feel like vomiting"],
+    "fatigue": ["tired", "fatigue", "weakness", "feel weak", "feeling weak", "body is weak",
+                "body weak", "no strength"],
+    "swelling": ["swelling", "swollen", "swell"],
+    "dizziness": ["dizzy", "dizziness", "lightheaded", "feel faint", "feeling faint"],
+    "chills": ["chills", "shivering", "cold and hot"],
+    "breathlessness": ["short of breath", "shortness of breath", "can't breathe", "cant breathe",
+                       "cannot breathe", "can’t breathe", "difficulty breathing", "wheeze", "wheezing"],
+    "abdominal_pain": ["stomach pain", "stomach hurts", "stomach ache", "belly pain",
+                       "belly dey pain", "abdominal pain"],
+    "fracture": ["fracture", "fractured", "broken bone", "broke my arm", "broke my leg",
+                 "broke my hand", "broke my wrist", "broke my ankle", "broken arm", "broken leg"],
+    "seizure": ["seizure", "seizures", "convulsion", "convulsing", "having fits", "fits dey catch"],
+    "unconscious": ["unconscious", "fainted", "passed out", "collapsed"],
+    "infection": ["infection", "infected", "pus"],
+    "animal_bite": ["bit me", "bitten", "dog bite", "snake bite"],
+    "pain": ["pain", "paining", "painful", "hurts", "hurting", "aching"],
+}
+
+STOPWORDS = {
+    "i", "me", "my", "is", "am", "are", "a", "an", "the", "and", "or", "of", "to",
+    "in", "on", "at", "for", "with", "since", "have", "has", "had", "it", "this",
+    "that", "very", "so", "too", "now", "please", "doctor", "abeg", "abi", "o",
+    "dey", "na", "sef", "oh", "really", "badly", "much", "feel", "feeling", "been",
+}
+
+TOKEN = re.compile(r"[a-z0-9']+")
+
+
+# =========================
+# Stage Timing
+# =========================
+
+_stats_lock = threading.Lock()
+_stage_stats = {}
+
+
+def _record(stage, seconds, timings=None):
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+    with _stats_lock:
+        s = _stage_stats.setdefault(stage, [0, 0.0, 0.0])
+        s[0] += 1
+        s[1] += seconds
+        s[2] = max(s[2], seconds)
+
+
+def latency_report():
+    """Per-stage call count, mean and max latency in milliseconds."""
+    with _stats_lock:
+        return {
+            stage: {"count": n, "mean_ms": total / n * 1000, "max_ms": worst * 1000}
+            for stage, (n, total, worst) in _stage_stats.items()
+        }
+
+
+# =========================
+# Gazetteer Trie
+# =========================
+
+_END = "$"
+
+
+def _build_trie(lexicon):
+    trie = {}
+    for canonical, phrases in lexicon.items():
+        for phrase in phrases:
+            node = trie
+            for token in TOKEN.findall(phrase.lower()):
+                node = node.setdefault(token, {})
+            node[_END] = canonical
+    return trie
+
+
+_TRIE = _build_trie(SYMPTOM_LEXICON)
+
+# Keep the spelling corrector from "fixing" gazetteer words into English ones
+add_terms([p for phrases in SYMPTOM_LEXICON.values() for p in phrases])
+
+
+def gazetteer(tokens):
+    """Return (symptoms, covered) using greedy longest-match over the trie."""
+    found = []
+    covered = [False] * len(tokens)
+    i = 0
+    while i < len(tokens):
+        node = _TRIE
+        match, match_end = None, i
+        j = i
+        while j < len(tokens) and tokens[j] in node:
+            node = node[tokens[j]]
+            j += 1
+            if _END in node:
+                match, match_end = node[_END], j
+        if match:
+            if match not in found:
+                found.append(match)
+            for k in range(i, match_end):
+                covered[k] = True
+            i = match_end
+        else:
+            i += 1
+    return found, covered
+
+
+def unresolved_spans(tokens, covered):
+    """Contiguous runs of uncovered, non-stopword tokens."""
+    spans, current = [], []
+    for token, done in zip(tokens, covered):
+        if done or token in STOPWORDS:
+            if current:
+                spans.append(" ".join(current))
+                current = []
+        else:
+            current.append(token)
+    if current:
+        spans.append(" ".join(current))
+    return spans
+
+
+# =========================
+# NER Model (optional)
+# =========================
+
+def _load_ner():
+    from transformers import AutoTokenizer, pipeline
+
+    tokenizer = AutoTokenizer.from_pretrained(NER_MODEL)
+    if NER_BACKEND == "onnx":
+        from optimum.onnxruntime import ORTModelForTokenClassification
+        model = ORTModelForTokenClassification.from_pretrained(NER_MODEL, export=True)
+    else:
+        from transformers import AutoModelForTokenClassification
+        model = AutoModelForTokenClassification.from_pretrained(NER_MODEL)
+    return pipeline("ner", model=model, tokenizer=tokenizer, aggregation_strategy="simple")
+
+
+class _NerBatcher:
+    """
+    Collects spans from concurrent callers and runs them through the NER
+    pipeline together: a batch closes when it has NER_MAX_BATCH spans or
+    NER_MAX_WAIT_MS has passed since its first span arrived.
+    """
+
+    def __init__(self, ner):
+        self.ner = ner
+        self.queue = Queue()
+        self.thread = threading.Thread(target=self._run, name="ner-batcher", daemon=True)
+        self.thread.start()
+
+    def submit(self, spans):
+        future = Future()
+        self.queue.put((spans, future, time.perf_counter()))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.perf_counter() + NER_MAX_WAIT_MS / 1000
+            size = len(batch[0][0])
+            while size < NER_MAX_BATCH:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=remaining)
+                except Empty:
+                    break
+                batch.append(item)
+                size += len(item[0])
+
+            started = time.perf_counter()
+            spans = [span for item in batch for span in item[0]]
+            try:
+                # The pipeline's own batch_size defaults to 1 span per forward pass
+                outputs = self.ner(spans, batch_size=len(spans)) if spans else []
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            elapsed = time.perf_counter() - started
+
+            pos = 0
+            for item_spans, future, queued in batch:
+                future.set_result((outputs[pos:pos + len(item_spans)], started - queued, elapsed))
+                pos += len(item_spans)
+
+
+_batcher = None
+_batcher_error = None
+_batcher_lock = threading.Lock()
+
+
+def _get_batcher():
+    """The shared batcher, or None if NER is off or its model failed to load."""
+    global _batcher, _batcher_error
+    if _batcher is None and NER_MODEL and _batcher_error is None:
+        with _batcher_lock:
+            if _batcher is None and _batcher_error is None:
+                try:
+                    _batcher = _NerBatcher(_load_ner())
+                except Exception as e:
+                    # Loading is slow and fails the same way each time: don't retry
+                    _batcher_error = e
+                    print(f"⚠️  NER model {NER_MODEL} unavailable ({e}); using the gazetteer only")
+    return _batcher
+
+
+def _entity_symptom(entity):
+    group = entity.get("entity_group", "").lower()
+    if "symptom" not in group and "disease" not in group:
+        return None
+    tokens = TOKEN.findall(entity["word"].lower())
+    found, _ = gazetteer(tokens)
+    if found:
+        return found[0]
+    name = "_".join(tokens)
+    return name if name.isidentifier() else None
+
+
+# =========================
+# Public API
+# =========================
+
+def extract_symptoms(text, timings=None):
+    """
+    Return the canonical symptom names found in `text`, in order of
+    appearance. Pass a dict as `timings` to get this call's per-stage seconds.
+    """
+    start = time.perf_counter()
+    corrected = fix_spelling(text)
+    _record("spelling", time.perf_counter() - start, timings)
+
+    start = time.perf_counter()
+    tokens = TOKEN.findall(corrected.lower())
+    found, covered = gazetteer(tokens)
+    spans = unresolved_spans(tokens, covered)
+    _record("gazetteer", time.perf_counter() - start, timings)
+
+    batcher = _get_batcher() if spans else None
+    if batcher is not None:
+        try:
+            outputs, waited, elapsed = batcher.submit(spans).result(timeout=NER_TIMEOUT)
+        except Exception as e:
+            print(f"NER error: {e}")
+        else:
+            _record("ner_queue", waited, timings)
+            _record("ner", elapsed, timings)
+            for entities in outputs:
+                for entity in entities:
+                    symptom = _entity_symptom(entity)
+                    if symptom and symptom not in found:
+                        found.append(symptom)
+
+    return found
@@ -0,0 +1,323 @@
+import cProfile
+import io
+import itertools
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+
+from flask import abort, g, has_request_context, jsonify, request, send_from_directory
+
+# =========================
+# On-demand Request Profiling
+# =========================
+#
+# Off unless PROFILE_TOKEN is set. A request is profiled when:
+#   - it carries "X-Profile: <token>", or
+#   - sampling was switched on with POST /admin/profiling and the request's
+#     endpoint is selected (random sample at the configured rate)
+# Either way at most PROFILE_MAX_PER_MINUTE profiles are taken.
+#
+# Modes:
+#   cprofile  deterministic cProfile of the request (.prof + .txt)
+#   sampling  stack samples of the request every
+#             PROFILE_SAMPLE_INTERVAL_MS, as collapsed stacks for flame graphs
+# With memory on, tracemalloc snapshots taken before and after the request
+# are diffed into a .mem.txt report.
+#
+# Work the request hands to another thread (the coalesced generation runs
+# on a flight thread) is profiled too when it is wrapped with carry(): its
+# cProfile stats are merged into the request's, and the sampler samples
+# that thread as well. Work still running when the request ends is left out.
+#
+# Admin endpoints (send the token in X-Profile-Token):
+#   GET  /admin/profiling          current settings
+#   POST /admin/profiling          {"sample_rate", "endpoints", "mode", "memory", "duration_s"}
+#   GET  /admin/profiles           list captured files
+#   GET  /admin/profiles/<name>    download one
+
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN")
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(os.path.dirname(__file__), "profiles"))
+PROFILE_MAX_PER_MINUTE = int(os.environ.get("PROFILE_MAX_PER_MINUTE", 6))
+PROFILE_MAX_FILES = int(os.environ.get("PROFILE_MAX_FILES", 200))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.environ.get("PROFILE_SAMPLE_INTERVAL_MS", 5))
+MODES = ("cprofile", "sampling")
+
+settings = {
+    "sample_rate": 0.0,
+    "endpoints": ["/chat"],
+    "mode": "cprofile",
+    "memory": False,
+    "until": None,
+}
+
+_lock = threading.Lock()
+_recent = deque()
+_memory_users = 0
+_sequence = itertools.count(1)
+
+
+def _allow():
+    """Sliding one-minute window over taken profiles."""
+    now = time.monotonic()
+    with _lock:
+        while _recent and now - _recent[0] > 60:
+            _recent.popleft()
+        if len(_recent) >= PROFILE_MAX_PER_MINUTE:
+            return False
+        _recent.append(now)
+        return True
+
+
+def _authorized(value):
+    return bool(PROFILE_TOKEN) and value == PROFILE_TOKEN
+
+
+def _selected():
+    """Return (mode, memory) if this request should be profiled, else None."""
+    header = request.headers.get("X-Profile")
+    if header is not None:
+        if not _authorized(header):
+            return None
+        mode = request.headers.get("X-Profile-Mode", settings["mode"])
+        memory = request.headers.get("X-Profile-Memory", "0") == "1" or settings["memory"]
+        return (mode if mode in MODES else "cprofile", memory)
+
+    if settings["sample_rate"] <= 0:
+        return None
+    if settings["until"] is not None and time.time() > settings["until"]:
+        settings["sample_rate"] = 0.0
+        return None
+    rule = request.url_rule.rule if request.url_rule else None
+    if rule not in settings["endpoints"] or random.random() >= settings["sample_rate"]:
+        return None
+    return (settings["mode"], settings["memory"])
+
+
+# =========================
+# Stack Sampler
+# =========================
+
+class StackSampler(threading.Thread):
+    """Samples some threads' Python stacks on a timer into collapsed stacks."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_ids = {thread_id}
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id in list(self.thread_ids):
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(names))] += 1
+                self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+# =========================
+# Capture
+# =========================
+
+def _start_memory():
+    global _memory_users
+    with _lock:
+        _memory_users += 1
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(25)
+    return tracemalloc.take_snapshot()
+
+
+def _stop_memory(before):
+    global _memory_users
+    after = tracemalloc.take_snapshot()
+    with _lock:
+        _memory_users -= 1
+        if _memory_users == 0:
+            tracemalloc.stop()
+    # Leave out the profiler's own allocations (sampler, snapshots)
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+    stats = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "lineno")
+    lines = [f"{stat}" for stat in stats[:50]]
+    return "Top allocation changes during the request (by line):\n\n" + "\n".join(lines) + "\n"
+
+
+def _base_name():
+    rule = request.url_rule.rule if request.url_rule else "unmatched"
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", rule).strip("-") or "root"
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    return f"{stamp}-{slug}-{os.getpid()}-{next(_sequence)}"
+
+
+def _prune():
+    files = sorted(os.listdir(PROFILE_DIR))
+    for name in files[:max(0, len(files) - PROFILE_MAX_FILES)]:
+        os.remove(os.path.join(PROFILE_DIR, name))
+
+
+def _begin():
+    selected = _selected()
+    if selected is None or not _allow():
+        return
+    mode, memory = selected
+    state = {"mode": mode, "start": time.perf_counter(), "name": _base_name()}
+    if memory:
+        state["memory"] = _start_memory()
+    if mode == "sampling":
+        state["sampler"] = StackSampler(threading.get_ident(), PROFILE_SAMPLE_INTERVAL_MS / 1000)
+        state["sampler"].start()
+    else:
+        state["profiler"] = cProfile.Profile()
+        state["profiler"].enable()
+    g.profile = state
+
+
+def carry(fn):
+    """
+    Wrap fn so that, run on another thread, it is profiled as part of the
+    current request. Returns fn unchanged when the request isn't profiled.
+    """
+    state = g.get("profile") if has_request_context() else None
+    if state is None:
+        return fn
+
+    def run(*args, **kwargs):
+        thread_id = threading.get_ident()
+        sampler = state.get("sampler")
+        if sampler is not None:
+            sampler.thread_ids.add(thread_id)
+        profiler = None
+        if "profiler" in state:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                state.setdefault("threads", []).append(profiler)
+            if sampler is not None:
+                sampler.thread_ids.discard(thread_id)
+    return run
+
+
+def _finish(response=None):
+    state = g.pop("profile", None)
+    if state is None:
+        return
+    elapsed = time.perf_counter() - state["start"]
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, state["name"])
+    written = []
+
+    if "profiler" in state:
+        profiler = state["profiler"]
+        profiler.disable()
+        out = io.StringIO()
+        stats = pstats.Stats(profiler, stream=out)
+        for other in list(state.get("threads", ())):
+            stats.add(other)
+        stats.dump_stats(base + ".prof")
+        out.write(f"{request.method} {request.path}  {elapsed * 1000:.1f} ms\n\n")
+        stats.sort_stats("cumulative").print_stats(40)
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            f.write(out.getvalue())
+        written += [base + ".prof", base + ".txt"]
+
+    if "sampler" in state:
+        sampler = state["sampler"]
+        sampler.stop()
+        with open(base + ".stacks.txt", "w", encoding="utf-8") as f:
+            for stack, count in sampler.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        written.append(base + ".stacks.txt")
+
+    if "memory" in state:
+        with open(base + ".mem.txt", "w", encoding="utf-8") as f:
+            f.write(_stop_memory(state["memory"]))
+        written.append(base + ".mem.txt")
+
+    _prune()
+    if response is not None:
+        response.headers["X-Profile-Id"] = state["name"]
+    print(f"🔬 Profiled {request.path} ({elapsed * 1000:.1f} ms): {', '.join(map(os.path.basename, written))}")
+
+
+# =========================
+# Flask Wiring
+# =========================
+
+def _require_token():
+    if not _authorized(request.headers.get("X-Profile-Token")):
+        abort(403)
+
+
+def init_app(app):
+    """Register the profiling hooks and admin endpoints on a Flask app."""
+    if not PROFILE_TOKEN:
+        return
+
+    @app.before_request
+    def profile_begin():
+        _begin()
+
+    @app.after_request
+    def profile_finish(response):
+        _finish(response)
+        return response
+
+    @app.teardown_request
+    def profile_cleanup(exc):
+        # Requests that raised never reach after_request
+        if "profile" in g:
+            _finish()
+
+    @app.route("/admin/profiling", methods=["GET", "POST"])
+    def profiling_settings():
+        _require_token()
+        if request.method == "POST":
+            data = request.get_json() or {}
+            if data.get("mode", settings["mode"]) not in MODES:
+                return jsonify({"error": f"mode must be one of {MODES}"}), 400
+            settings["sample_rate"] = min(1.0, max(0.0, float(data.get("sample_rate", settings["sample_rate"]))))
+            settings["endpoints"] = list(data.get("endpoints", settings["endpoints"]))
+            settings["mode"] = data.get("mode", settings["mode"])
+            settings["memory"] = bool(data.get("memory", settings["memory"]))
+            duration = data.get("duration_s")
+            settings["until"] = time.time() + float(duration) if duration else None
+        return jsonify({**settings, "max_per_minute": PROFILE_MAX_PER_MINUTE})
+
+    @app.route("/admin/profiles", methods=["GET"])
+    def list_profiles():
+        _require_token()
+        files = []
+        if os.path.isdir(PROFILE_DIR):
+            for name in sorted(os.listdir(PROFILE_DIR), reverse=True):
+                path = os.path.join(PROFILE_DIR, name)
+                files.append({"name": name, "bytes": os.path.getsize(path),
+                              "created": os.path.getmtime(path)})
+        return jsonify({"profiles": files, "count": len(files)})
+
+    @app.route("/admin/profiles/<name>", methods=["GET"])
+    def download_profile(name):
+        _require_token()
+        return send_from_directory(os.path.abspath(PROFILE_DIR), name, as_attachment=True)
@@ -0,0 +1,210 @@
+import math
+import os
+import threading
+import time
+
+# =========================
+# Rate Limiting & Admission Control
+# =========================
+#
+# Two layers keep one noisy client (or a spike) from taking the model:
+#
+#   Token buckets  per user_id and per client IP. A bucket holds up to
+#                  `burst` tokens and refills at `per_min` a minute; each
+#                  request takes one. An empty bucket means 429 with the
+#                  seconds until the next token.
+#   In-flight cap  at most `limit` chat requests in a worker at once (the
+#                  generation slots plus a short queue for each). Past that
+#                  the request is shed with 429 and an estimated wait
+#                  instead of joining a queue whose latency grows without bound.
+#
+# Buckets live in process memory (a lock and a dict). With several gunicorn
+# workers set RATE_LIMIT_REDIS_URL to share them through Redis; the
+# in-flight cap stays per worker because each worker has its own model.
+# If Redis fails the limiter uses memory instead of failing requests, and
+# tries Redis again every RATE_LIMIT_REDIS_RETRY seconds. A request refused
+# by one bucket takes no token from the others.
+
+RATE_USER_PER_MIN = float(os.environ.get("RATE_USER_PER_MIN", 20))
+RATE_USER_BURST = float(os.environ.get("RATE_USER_BURST", 5))
+RATE_IP_PER_MIN = float(os.environ.get("RATE_IP_PER_MIN", 60))
+RATE_IP_BURST = float(os.environ.get("RATE_IP_BURST", 15))
+RATE_LIMIT_REDIS_URL = os.environ.get("RATE_LIMIT_REDIS_URL", "")
+RATE_LIMIT_REDIS_RETRY = float(os.environ.get("RATE_LIMIT_REDIS_RETRY", 5))
+
+MAX_BUCKETS = 100000
+
+
+class MemoryBuckets:
+
+    def __init__(self):
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def take(self, limits):
+        """
+        Take a token from every bucket in `limits` ((key, per_min, burst)
+        tuples) if all of them have one. Returns None if allowed, else
+        (index of the bucket with the longest wait, seconds until it refills);
+        a refused request takes nothing.
+        """
+        now = time.monotonic()
+        with self.lock:
+            levels = []
+            for key, per_min, burst in limits:
+                tokens, updated = self.buckets.get(key, (burst, now))[:2]
+                levels.append(min(burst, tokens + (now - updated) * per_min / 60))
+            waits = [(1 - tokens) / (per_min / 60) if tokens < 1 else 0.0
+                     for tokens, (_, per_min, _) in zip(levels, limits)]
+            if any(waits):
+                return max(enumerate(waits), key=lambda w: w[1])
+            for tokens, (key, per_min, burst) in zip(levels, limits):
+                self.buckets[key] = (tokens - 1, now, per_min / 60, burst)
+            if len(self.buckets) > MAX_BUCKETS:
+                self._prune(now)
+        return None
+
+    def _prune(self, now):
+        # A bucket that has refilled completely is the same as no bucket
+        self.buckets = {k: b for k, b in self.buckets.items()
+                        if b[0] + (now - b[1]) * b[2] < b[3]}
+
+
+# Refill every bucket and take from all of them only if each has a token,
+# in one round trip; Redis' clock is shared by all workers.
+# ARGV holds (rate per second, burst) for each key in turn.
+_REDIS_TAKE = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local levels = {}
+local worst, worst_wait = 0, 0
+for i, key in ipairs(KEYS) do
+  local rate = tonumber(ARGV[2 * i - 1])
+  local burst = tonumber(ARGV[2 * i])
+  local b = redis.call('HMGET', key, 'tokens', 'ts')
+  local tokens = tonumber(b[1]) or burst
+  local ts = tonumber(b[2]) or now
+  tokens = math.min(burst, tokens + (now - ts) * rate)
+  levels[i] = tokens
+  if tokens < 1 and (1 - tokens) / rate > worst_wait then
+    worst, worst_wait = i, (1 - tokens) / rate
+  end
+end
+if worst > 0 then return {worst - 1, tostring(worst_wait)} end
+for i, key in ipairs(KEYS) do
+  local rate = tonumber(ARGV[2 * i - 1])
+  local burst = tonumber(ARGV[2 * i])
+  redis.call('HSET', key, 'tokens', levels[i] - 1, 'ts', now)
+  redis.call('EXPIRE', key, math.ceil(burst / rate) + 1)
+end
+return {-1, '0'}
+"""
+
+
+class RedisBuckets:
+
+    def __init__(self, url):
+        import redis
+
+        self.client = redis.Redis.from_url(url, socket_timeout=0.2)
+        self.script = self.client.register_script(_REDIS_TAKE)
+
+    def take(self, limits):
+        args = []
+        for _, per_min, burst in limits:
+            args += [per_min / 60, burst]
+        index, wait = self.script(keys=[f"ratelimit:{key}" for key, _, _ in limits], args=args)
+        return None if int(index) < 0 else (int(index), float(wait))
+
+
+class RateLimiter:
+    """Per-user and per-IP token buckets."""
+
+    def __init__(self, redis_url=RATE_LIMIT_REDIS_URL):
+        self.rules = {
+            "user": (RATE_USER_PER_MIN, RATE_USER_BURST),
+            "ip": (RATE_IP_PER_MIN, RATE_IP_BURST),
+        }
+        self.memory = MemoryBuckets()
+        self.redis = None
+        self.redis_retry_at = 0.0
+        if redis_url:
+            try:
+                self.redis = RedisBuckets(redis_url)
+                print("✅ Rate limits shared through Redis")
+            except ImportError:
+                print("⚠️  RATE_LIMIT_REDIS_URL set but redis is not installed; using in-memory limits")
+
+    def _take(self, limits):
+        if self.redis is not None and time.monotonic() >= self.redis_retry_at:
+            try:
+                result = self.redis.take(limits)
+                if self.redis_retry_at:
+                    print("✅ Rate limit Redis is back")
+                    self.redis_retry_at = 0.0
+                return result
+            except Exception as e:
+                if not self.redis_retry_at:
+                    print(f"⚠️  Rate limit Redis failed ({e}); using in-memory limits, "
+                          f"retrying every {RATE_LIMIT_REDIS_RETRY:g}s")
+                self.redis_retry_at = time.monotonic() + RATE_LIMIT_REDIS_RETRY
+        return self.memory.take(limits)
+
+    def check(self, **keys):
+        """
+        Take a token from each bucket named in `keys` (e.g. user=..., ip=...),
+        or from none of them if any is empty.
+        Returns None if allowed, else (bucket, seconds to wait).
+        """
+        names, limits = [], []
+        for bucket, value in keys.items():
+            per_min, burst = self.rules[bucket]
+            if value is None or per_min <= 0:
+                continue
+            names.append(bucket)
+            limits.append((f"{bucket}:{value}", per_min, burst))
+        if not limits:
+            return None
+        refused = self._take(limits)
+        if refused is None:
+            return None
+        index, wait = refused
+        return names[index], wait
+
+
+class ConcurrencyLimit:
+    """Caps requests in flight; estimates the wait from recent times in flight."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self.lock = threading.Lock()
+        self.in_flight_seconds = None
+
+    def enter(self):
+        with self.lock:
+            if self.active >= self.limit:
+                return False
+            self.active += 1
+            return True
+
+    def leave(self, seconds):
+        with self.lock:
+            self.active -= 1
+            if self.in_flight_seconds is None:
+                self.in_flight_seconds = seconds
+            else:
+                self.in_flight_seconds = 0.9 * self.in_flight_seconds + 0.1 * seconds
+
+    def estimated_wait(self):
+        """Seconds until a request is likely to leave and free a place."""
+        with self.lock:
+            active = self.active
+        # Little's law: `active` requests that each stay T seconds finish one
+        # every T / active seconds
+        return (self.in_flight_seconds or 1.0) / max(1, active)
+
+
+def retry_after(seconds):
+    """Retry-After header value: whole seconds, at least 1."""
+    return str(max(1, math.ceil(seconds)))
@@ -0,0 +1,270 @@
+import argparse
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from queue import Queue
+
+from speech_stream import SAMPLE_RATE, VOSK_MODEL_PATH
+
+# =========================
+# Recognizer Pool
+# =========================
+#
+# Concurrent voice sessions share one Vosk model. Each session gets its own
+# audio queue and, for the length of an utterance, its own KaldiRecognizer
+# (recognizers hold decoding state, so they can't be interleaved). When an
+# utterance ends the recognizer is Reset() and goes back on a free list for
+# the next session instead of being rebuilt.
+#
+# Decoding runs on `size` worker threads (default: one per CPU). A session
+# with queued audio waits in a ready queue; a worker decodes up to
+# SLICE_MS of its audio and puts it back if more is pending, so one long
+# upload can't starve the live streams.
+
+SLICE_MS = 500
+BYTES_PER_MS = SAMPLE_RATE * 2 // 1000
+
+
+class Session:
+    """One client's utterance: push() audio, then end() for the transcript."""
+
+    def __init__(self, pool, session_id):
+        self.pool = pool
+        self.session_id = session_id
+        self.chunks = deque()
+        self.lock = threading.Lock()
+        self.scheduled = False
+        self.ending = False
+        self.recognizer = None
+        self.texts = []
+        self.partial = ""
+        self.audio_ms = 0
+        self.decode_seconds = 0.0
+        self.result = Future()
+        self.last_seen = time.monotonic()
+
+    def push(self, pcm):
+        with self.lock:
+            if self.ending:
+                raise ValueError(f"voice session {self.session_id} already ended")
+            self.chunks.append(pcm)
+            self.last_seen = time.monotonic()
+            self._schedule()
+
+    def end(self):
+        """Finish the utterance; returns a Future with the final transcript."""
+        with self.lock:
+            self.ending = True
+            self._schedule()
+        return self.result
+
+    def transcript(self):
+        return " ".join(self.texts + ([self.partial] if self.partial else [])).strip()
+
+    def _schedule(self):
+        if not self.scheduled:
+            self.scheduled = True
+            self.pool.ready.put(self)
+
+
+class RecognizerPool:
+
+    def __init__(self, vosk_model, size=None, sample_rate=SAMPLE_RATE):
+        self.vosk_model = vosk_model
+        self.size = size or os.cpu_count() or 1
+        self.sample_rate = sample_rate
+        self.ready = Queue()
+        self.free = []
+        self.free_lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+        self.sessions = {}
+        self.sessions_lock = threading.Lock()
+        self.workers = [threading.Thread(target=self._work, name=f"vosk-{i}", daemon=True)
+                        for i in range(self.size)]
+        for worker in self.workers:
+            worker.start()
+
+    # ---- recognizers ----
+
+    def _acquire(self):
+        with self.free_lock:
+            if self.free:
+                self.reused += 1
+                return self.free.pop()
+            self.created += 1
+        from vosk import KaldiRecognizer
+        return KaldiRecognizer(self.vosk_model, self.sample_rate)
+
+    def _release(self, recognizer):
+        recognizer.Reset()
+        with self.free_lock:
+            # Keep enough idle recognizers for every worker to start a session
+            if len(self.free) < 2 * self.size:
+                self.free.append(recognizer)
+
+    # ---- sessions ----
+
+    def session(self, session_id):
+        """Return the open session with this id, creating it if needed."""
+        with self.sessions_lock:
+            session = self.sessions.get(session_id)
+            if session is None:
+                session = self.sessions[session_id] = Session(self, session_id)
+            return session
+
+    def close(self, session_id):
+        with self.sessions_lock:
+            return self.sessions.pop(session_id, None)
+
+    def expire(self, ttl):
+        """End sessions that have been idle for more than `ttl` seconds."""
+        now = time.monotonic()
+        with self.sessions_lock:
+            stale = [s for s in self.sessions.values() if now - s.last_seen > ttl]
+            for session in stale:
+                del self.sessions[session.session_id]
+        for session in stale:
+            session.end()
+
+    def transcribe(self, pcm):
+        """Decode a whole utterance; blocks until the transcript is ready."""
+        session = Session(self, None)
+        session.push(pcm)
+        return session.end().result()
+
+    # ---- workers ----
+
+    def _work(self):
+        while True:
+            session = self.ready.get()
+            try:
+                self._decode(session)
+            except Exception as e:
+                with session.lock:
+                    session.chunks.clear()
+                    session.scheduled = False
+                if not session.result.done():
+                    session.result.set_exception(e)
+
+    def _decode(self, session):
+        with session.lock:
+            budget = SLICE_MS * BYTES_PER_MS
+            batch = []
+            while session.chunks and budget > 0:
+                chunk = session.chunks.popleft()
+                batch.append(chunk)
+                budget -= len(chunk)
+
+        if batch and session.recognizer is None:
+            session.recognizer = self._acquire()
+
+        started = time.perf_counter()
+        recognizer = session.recognizer
+        for chunk in batch:
+            session.audio_ms += len(chunk) // BYTES_PER_MS
+            if recognizer.AcceptWaveform(chunk):
+                text = json.loads(recognizer.Result()).get("text", "")
+                if text:
+                    session.texts.append(text)
+                session.partial = ""
+            else:
+                session.partial = json.loads(recognizer.PartialResult()).get("partial", "")
+        session.decode_seconds += time.perf_counter() - started
+
+        with session.lock:
+            if session.chunks:
+                self.ready.put(session)
+                return
+            if not session.ending:
+                session.scheduled = False
+                return
+
+        if recognizer is not None:
+            started = time.perf_counter()
+            final = json.loads(recognizer.FinalResult()).get("text", "")
+            if final:
+                session.texts.append(final)
+            session.partial = ""
+            session.recognizer = None
+            self._release(recognizer)
+            session.decode_seconds += time.perf_counter() - started
+        session.result.set_result(session.transcript())
+
+    def stats(self):
+        return {"workers": self.size, "recognizers_created": self.created,
+                "recognizers_reused": self.reused, "idle_recognizers": len(self.free),
+                "sessions": len(self.sessions), "queued_sessions": self.ready.qsize()}
+
+
+# =========================
+# Real-time Factor Benchmark
+# =========================
+# N simultaneous streams replay WAV files at microphone speed in CHUNK_MS
+# chunks. Reported per stream: RTF (decode time / audio time) and the tail
+# latency from the last chunk to the final transcript.
+
+def _stream(pool, name, pcm, chunk_ms, realtime, out):
+    session = pool.session(name)
+    size = chunk_ms * BYTES_PER_MS
+    start = time.perf_counter()
+    for i in range(0, len(pcm), size):
+        if realtime:
+            delay = start + (i // size + 1) * chunk_ms / 1000 - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        session.push(pcm[i:i + size])
+    sent = time.perf_counter()
+    text = session.end().result()
+    done = time.perf_counter()
+    pool.close(name)
+    out[name] = {
+        "audio_s": round(len(pcm) / (SAMPLE_RATE * 2), 2),
+        "rtf": round(session.decode_seconds / (len(pcm) / (SAMPLE_RATE * 2)), 4),
+        "tail_ms": round((done - sent) * 1000, 1),
+        "wall_s": round(done - start, 2),
+        "text": text,
+    }
+
+
+if __name__ == "__main__":
+    from speech_stream import load_vosk_model, read_wav
+
+    parser = argparse.ArgumentParser(description="Real-time factor of the recognizer pool")
+    parser.add_argument("wav", nargs="+", help="16 kHz mono WAV files, used round-robin")
+    parser.add_argument("--streams", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-ms", type=int, default=100)
+    parser.add_argument("--fast", action="store_true", help="Push audio as fast as possible")
+    parser.add_argument("--model", default=VOSK_MODEL_PATH)
+    args = parser.parse_args()
+
+    pool = RecognizerPool(load_vosk_model(args.model), size=args.workers)
+    audio = [read_wav(path) for path in args.wav]
+    report = []
+    for n in args.streams:
+        results = {}
+        threads = [threading.Thread(target=_stream, args=(pool, f"stream-{i}", audio[i % len(audio)],
+                                                          args.chunk_ms, not args.fast, results))
+                   for i in range(n)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - start
+        total_audio = sum(r["audio_s"] for r in results.values())
+        tails = sorted(r["tail_ms"] for r in results.values())
+        report.append({
+            "streams": n,
+            "workers": pool.size,
+            "mean_rtf": round(sum(r["rtf"] for r in results.values()) / n, 4),
+            "aggregate_rtf": round(wall / total_audio, 4) if args.fast else None,
+            "max_tail_ms": tails[-1],
+            "median_tail_ms": tails[len(tails) // 2],
+            "pool": pool.stats(),
+        })
+        print(json.dumps(report[-1]))
@@ -0,0 +1,172 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from hospital_data_generator import high_risk, low_risk
+
+# =========================
+# Priority Scheduling
+# =========================
+#
+# Generation slots (api.py has one: the model is serialized) are handed
+# out by priority instead of arrival order, using the dataset's severity
+# tiers: high_risk categories first, then medium, then low_risk
+# (digestive, appointments). A prediction only moves a message out
+# of medium when the classifier is at least PRIORITY_MIN_PROB sure of it;
+# it gives small talk like "hello" a high severity at low probability.
+#
+#   Reserved capacity  PRIORITY_RESERVED slots are only given to high
+#                      priority requests, so an emergency-like message can
+#                      start even when routine chat fills the batch.
+#   Starvation         a waiting request moves up one tier every
+#                      PRIORITY_AGING_SECONDS, so low priority still gets
+#                      served under a steady stream of urgent messages.
+#   Preemption         when a high priority request is waiting and no slot
+#                      can take it, a running low (then medium) priority
+#                      generation is marked preempted. Its token callback
+#                      sees that and stops it (GPT4All can't pause a
+#                      sequence), and the caller queues it again to start
+#                      over. A request is preempted at most once, so it
+#                      can't be starved by repeated restarts.
+#                      PRIORITY_PREEMPT=0 turns this off.
+#
+# A waiter whose stop() fires (deadline passed, client gone) leaves the queue.
+
+PRIORITIES = ("high", "medium", "low")
+PRIORITY_AGING_SECONDS = float(os.environ.get("PRIORITY_AGING_SECONDS", 10))
+PRIORITY_RESERVED = int(os.environ.get("PRIORITY_RESERVED", 1))
+PRIORITY_MIN_PROB = float(os.environ.get("PRIORITY_MIN_PROB", 0.8))
+PRIORITY_PREEMPT = os.environ.get("PRIORITY_PREEMPT", "1") == "1"
+STOP_POLL_SECONDS = 0.1
+
+_RANK = {p: i for i, p in enumerate(PRIORITIES)}
+
+
+def message_priority(triage, min_prob=PRIORITY_MIN_PROB):
+    """Priority tier for a classifier prediction (None or unsure -> medium)."""
+    if triage is None:
+        return "medium"
+
+    def confident(head, labels):
+        return triage[head] in labels and triage[head + "_prob"] >= min_prob
+
+    if confident("category", high_risk) or confident("severity", ("high",)):
+        return "high"
+    if confident("category", low_risk) or confident("intent", ("appointment",)):
+        return "low"
+    return "medium"
+
+
+class _Waiter:
+
+    def __init__(self, priority, preemptible=True):
+        self.priority = priority
+        self.preemptible = preemptible
+        self.arrived = time.monotonic()
+        self.started = None
+        self.granted = threading.Event()
+        self.aged = False
+        self.preempted = False
+
+    def rank(self, now, aging):
+        steps = int((now - self.arrived) / aging) if aging > 0 else 0
+        return max(0, _RANK[self.priority] - steps)
+
+
+class PriorityScheduler:
+
+    def __init__(self, slots=1, reserved=PRIORITY_RESERVED, aging=PRIORITY_AGING_SECONDS,
+                 preempt=PRIORITY_PREEMPT):
+        self.slots = max(1, slots)
+        # At least one slot always stays open to every priority
+        self.reserved = max(0, min(reserved, self.slots - 1))
+        self.aging = aging
+        self.preempt = preempt
+        self.busy = 0
+        self.waiting = []
+        self.running = []
+        self.lock = threading.Lock()
+        self.aged = 0
+        self.preemptions = 0
+
+    def acquire(self, priority, stop=None, preemptible=True):
+        """
+        Wait for a slot. Returns the holder, or None if stop() became true
+        before a slot was granted.
+        """
+        waiter = _Waiter(priority, preemptible)
+        with self.lock:
+            self.waiting.append(waiter)
+            self._dispatch()
+        if stop is None:
+            waiter.granted.wait()
+            return waiter
+        while not waiter.granted.wait(STOP_POLL_SECONDS):
+            if stop():
+                with self.lock:
+                    if not waiter.granted.is_set():
+                        self.waiting.remove(waiter)
+                        return None
+        return waiter
+
+    def release(self, holder):
+        with self.lock:
+            self.running.remove(holder)
+            self.busy -= 1
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, priority, stop=None, preemptible=True):
+        """
+        Hold a slot for the block. Yields the holder, whose `preempted` turns
+        true when a high priority request needs the slot, or None if stop()
+        fired while waiting.
+        """
+        holder = self.acquire(priority, stop, preemptible)
+        try:
+            yield holder
+        finally:
+            if holder is not None:
+                self.release(holder)
+
+    def _dispatch(self):
+        now = time.monotonic()
+        while self.waiting and self.busy < self.slots:
+            free = self.slots - self.busy
+            eligible = self.waiting
+            if free <= self.reserved:
+                eligible = [w for w in self.waiting if w.priority == "high"]
+                if not eligible:
+                    return
+            waiter = min(eligible, key=lambda w: (w.rank(now, self.aging), w.arrived))
+            if waiter.rank(now, self.aging) < _RANK[waiter.priority]:
+                waiter.aged = True
+                self.aged += 1
+            self.waiting.remove(waiter)
+            self.busy += 1
+            self.running.append(waiter)
+            waiter.started = now
+            waiter.granted.set()
+        if self.preempt:
+            self._preempt()
+
+    def _preempt(self):
+        # Each high priority waiter left over gets one running lower priority
+        # generation stopped for it, unless one is already stopping
+        high = sum(1 for w in self.waiting if w.priority == "high")
+        stopping = sum(1 for r in self.running if r.preempted)
+        victims = [r for r in self.running
+                   if r.preemptible and not r.preempted and r.priority != "high"]
+        # Lowest priority first, then the one that started last (least work lost)
+        victims.sort(key=lambda r: (-_RANK[r.priority], -r.started))
+        for victim in victims[:max(0, high - stopping)]:
+            victim.preempted = True
+            self.preemptions += 1
+
+    def waiting_by_priority(self):
+        with self.lock:
+            counts = {p: 0 for p in PRIORITIES}
+            for waiter in self.waiting:
+                counts[waiter.priority] += 1
+        return counts
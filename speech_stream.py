@@ -0,0 +1,300 @@
+import argparse
+import json
+import os
+import threading
+import time
+import wave
+from collections import deque
+from queue import Queue
+
+import numpy as np
+
+# =========================
+# Streaming Speech Recognition
+# =========================
+#
+# Audio arrives as 16 kHz mono int16 frames of FRAME_MS. Capture runs on its
+# own thread (the PortAudio callback for the microphone, a pacing thread for
+# WAV files in real-time mode) and pushes frames into a queue. Meanwhile the
+# recognizer decodes each frame as it arrives, so by the time the patient
+# stops talking most of the audio has already been decoded.
+#
+# An energy VAD decides when an utterance starts and ends: speech begins
+# after VAD_START_MS of voiced frames, ends after STT_SILENCE_MS of silence.
+# Frames before the start are not decoded, except a short pre-roll so the
+# first syllable isn't clipped. A turn therefore takes about speech length
+# + STT_SILENCE_MS + the final decode.
+
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+FRAME_BYTES = SAMPLE_RATE * FRAME_MS // 1000 * 2
+
+VOSK_MODEL_PATH = os.environ.get("VOSK_MODEL_PATH", "models/vosk/vosk-model-small-en-us-0.15")
+
+STT_SILENCE_MS = int(os.environ.get("STT_SILENCE_MS", 600))
+STT_MAX_SECONDS = float(os.environ.get("STT_MAX_SECONDS", 15))
+STT_START_TIMEOUT = float(os.environ.get("STT_START_TIMEOUT", 8))
+STT_PARTIAL_MS = int(os.environ.get("STT_PARTIAL_MS", 150))
+VAD_START_MS = int(os.environ.get("VAD_START_MS", 90))
+VAD_PREROLL_MS = int(os.environ.get("VAD_PREROLL_MS", 300))
+VAD_MIN_RMS = float(os.environ.get("VAD_MIN_RMS", 300))
+VAD_NOISE_RATIO = float(os.environ.get("VAD_NOISE_RATIO", 3.0))
+
+
+# =========================
+# Voice Activity Detection
+# =========================
+
+def frame_rms(frame):
+    samples = np.frombuffer(frame, dtype=np.int16).astype(np.float32)
+    if samples.size == 0:
+        return 0.0
+    return float(np.sqrt(np.mean(samples * samples)))
+
+
+class EnergyVAD:
+    """
+    Frame-level speech detector. The threshold follows the background noise
+    (tracked while nobody is talking) but never drops below min_rms.
+    update() returns "start", "end" or None for each frame.
+    """
+
+    def __init__(self, frame_ms=FRAME_MS, start_ms=VAD_START_MS, silence_ms=STT_SILENCE_MS,
+                 min_rms=VAD_MIN_RMS, noise_ratio=VAD_NOISE_RATIO):
+        self.frame_ms = frame_ms
+        self.start_ms = start_ms
+        self.silence_ms = silence_ms
+        self.min_rms = min_rms
+        self.noise_ratio = noise_ratio
+        self.reset()
+
+    def reset(self):
+        self.noise = None
+        self.in_speech = False
+        self.voiced_ms = 0
+        self.silent_ms = 0
+
+    def threshold(self):
+        if self.noise is None:
+            return self.min_rms
+        return max(self.min_rms, self.noise * self.noise_ratio)
+
+    def update(self, frame):
+        level = frame_rms(frame)
+        voiced = level > self.threshold()
+
+        if not self.in_speech:
+            if voiced:
+                self.voiced_ms += self.frame_ms
+                if self.voiced_ms >= self.start_ms:
+                    self.in_speech = True
+                    self.silent_ms = 0
+                    return "start"
+            else:
+                self.voiced_ms = 0
+                self.noise = level if self.noise is None else 0.95 * self.noise + 0.05 * level
+            return None
+
+        if voiced:
+            self.silent_ms = 0
+        else:
+            self.silent_ms += self.frame_ms
+            if self.silent_ms >= self.silence_ms:
+                self.in_speech = False
+                self.voiced_ms = 0
+                return "end"
+        return None
+
+
+# =========================
+# Frame Sources
+# =========================
+
+def microphone_frames(frame_ms=FRAME_MS, device=None):
+    """Yield frames from the default input device until closed."""
+    import sounddevice as sd
+
+    frames = Queue()
+
+    def callback(indata, count, time_info, status):
+        if status:
+            print(status)
+        frames.put(bytes(indata))
+
+    with sd.RawInputStream(samplerate=SAMPLE_RATE, blocksize=SAMPLE_RATE * frame_ms // 1000,
+                           dtype="int16", channels=1, device=device, callback=callback):
+        while True:
+            yield frames.get()
+
+
+def read_wav(path):
+    """Return the PCM bytes of a 16 kHz mono 16-bit WAV file."""
+    with wave.open(path, "rb") as w:
+        if w.getframerate() != SAMPLE_RATE or w.getnchannels() != 1 or w.getsampwidth() != 2:
+            raise ValueError(f"{path}: expected {SAMPLE_RATE} Hz mono 16-bit PCM, got "
+                             f"{w.getframerate()} Hz, {w.getnchannels()} channel(s), "
+                             f"{8 * w.getsampwidth()}-bit")
+        return w.readframes(w.getnframes())
+
+
+def pcm_frames(pcm, frame_ms=FRAME_MS, realtime=False):
+    """
+    Cut PCM bytes into frames. With realtime=True a capture thread releases
+    them at the speed a microphone would, so the pipeline can be timed.
+    """
+    size = SAMPLE_RATE * frame_ms // 1000 * 2
+    chunks = [pcm[i:i + size] for i in range(0, len(pcm), size)]
+    if not realtime:
+        yield from chunks
+        return
+
+    frames = Queue()
+
+    def capture():
+        start = time.perf_counter()
+        for i, chunk in enumerate(chunks):
+            delay = start + (i + 1) * frame_ms / 1000 - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            frames.put(chunk)
+        frames.put(None)
+
+    threading.Thread(target=capture, name="wav-capture", daemon=True).start()
+    while True:
+        chunk = frames.get()
+        if chunk is None:
+            return
+        yield chunk
+
+
+def wav_frames(path, frame_ms=FRAME_MS, realtime=False):
+    return pcm_frames(read_wav(path), frame_ms, realtime)
+
+
+# =========================
+# Recognition
+# =========================
+
+def transcribe(frames, recognizer, vad=None, on_partial=None,
+               max_seconds=STT_MAX_SECONDS, start_timeout=STT_START_TIMEOUT):
+    """
+    Decode one utterance from `frames` with a Vosk KaldiRecognizer.
+    on_partial(text) is called as the hypothesis grows. Returns a dict with
+    the text, why listening stopped, and audio/decode timings in ms.
+    """
+    vad = vad or EnergyVAD()
+    preroll = deque(maxlen=max(1, VAD_PREROLL_MS // vad.frame_ms))
+    texts = []
+    last_partial = ""
+    next_partial = 0
+    audio_ms = 0
+    speech_start = None
+    speech_end = None
+    reason = "eof"
+
+    def accept(frame):
+        nonlocal last_partial, next_partial
+        if recognizer.AcceptWaveform(frame):
+            text = json.loads(recognizer.Result()).get("text", "")
+            if text:
+                texts.append(text)
+        elif on_partial is not None and audio_ms >= next_partial:
+            partial = json.loads(recognizer.PartialResult()).get("partial", "")
+            if partial and partial != last_partial:
+                last_partial = partial
+                on_partial(" ".join(texts + [partial]))
+            next_partial = audio_ms + STT_PARTIAL_MS
+
+    for frame in frames:
+        audio_ms += len(frame) * 1000 // (SAMPLE_RATE * 2)
+        event = vad.update(frame)
+
+        if speech_start is None:
+            preroll.append(frame)
+            if event == "start":
+                speech_start = audio_ms - vad.start_ms
+                for buffered in preroll:
+                    accept(buffered)
+                preroll.clear()
+            elif audio_ms >= start_timeout * 1000:
+                reason = "no_speech"
+                break
+            continue
+
+        accept(frame)
+        if event == "end":
+            speech_end = audio_ms - vad.silence_ms
+            reason = "silence"
+            break
+        if audio_ms - speech_start >= max_seconds * 1000:
+            reason = "max_length"
+            break
+
+    if hasattr(frames, "close"):
+        frames.close()
+
+    started = time.perf_counter()
+    if speech_start is not None:
+        final = json.loads(recognizer.FinalResult()).get("text", "")
+        if final:
+            texts.append(final)
+    finalize_ms = (time.perf_counter() - started) * 1000
+
+    if speech_start is not None and speech_end is None:
+        speech_end = audio_ms
+    return {
+        "text": " ".join(texts).strip(),
+        "reason": reason,
+        "audio_ms": audio_ms,
+        "speech_ms": (speech_end - speech_start) if speech_start is not None else 0,
+        "finalize_ms": round(finalize_ms, 2),
+    }
+
+
+def load_vosk_model(path=VOSK_MODEL_PATH):
+    from vosk import Model, SetLogLevel
+
+    SetLogLevel(-1)
+    return Model(path)
+
+
+class StreamingRecognizer:
+    """
+    Listens for one utterance at a time. The recognizer is built once and
+    Reset() between utterances (see recognizer_pool.py for many sessions).
+    """
+
+    def __init__(self, vosk_model, sample_rate=SAMPLE_RATE):
+        from vosk import KaldiRecognizer
+
+        self.recognizer = KaldiRecognizer(vosk_model, sample_rate)
+
+    def listen(self, frames, on_partial=None, **kwargs):
+        try:
+            return transcribe(frames, self.recognizer, EnergyVAD(), on_partial, **kwargs)
+        finally:
+            self.recognizer.Reset()
+
+
+# =========================
+# Command Line
+# =========================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Streaming speech recognition from WAV files or the mic")
+    parser.add_argument("wav", nargs="*", help="16 kHz mono WAV files (default: microphone)")
+    parser.add_argument("--model", default=VOSK_MODEL_PATH)
+    parser.add_argument("--realtime", action="store_true", help="Feed WAV files at microphone speed")
+    args = parser.parse_args()
+
+    stt = StreamingRecognizer(load_vosk_model(args.model))
+    sources = [(path, lambda p=path: wav_frames(p, realtime=args.realtime)) for path in args.wav]
+    if not sources:
+        sources = [("microphone", microphone_frames)]
+
+    for name, frames in sources:
+        print(f"🎤 {name}")
+        start = time.perf_counter()
+        result = stt.listen(frames(), on_partial=lambda text: print(f"   … {text}"))
+        result["wall_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        print(f"   ✅ {json.dumps(result)}")
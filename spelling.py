@@ -0,0 +1,306 @@
+import argparse
+import os
+import random
+import re
+import time
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+from triage import DANGER_TERMS, SYMPTOM_TERMS
+
+# SymSpell-style spelling correction.
+#
+# Every dictionary word is indexed under all strings reachable by deleting up
+# to MAX_EDIT characters from its first PREFIX_LENGTH characters. A lookup
+# generates the deletes of the input the same way, so candidates are found
+# with a few dict hits instead of TextBlob's edit search over the whole
+# vocabulary. Candidates are ranked by edit distance, then by frequency.
+#
+# The vocabulary is TextBlob's English word counts, plus medical terms and
+# every word in the dataset (which carries the Nigerian-English phrasing).
+# Dataset and medical words are never "corrected" into English words.
+#
+# All-caps tokens (HIV, BP, ORS) and words shorter than MIN_WORD_LENGTH are
+# left alone: acronyms and short words have too many English neighbours to
+# guess from.
+
+MAX_EDIT = 2
+PREFIX_LENGTH = 7
+CACHE_SIZE = 50000
+MIN_WORD_LENGTH = 4
+
+WORD = re.compile(r"[A-Za-z]+")
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "hospital_full_merged.jsonl")
+
+MEDICAL_TERMS = [
+    "malaria", "typhoid", "fever", "headache", "migraine", "vomiting", "vomit", "nausea",
+    "nauseous", "diarrhea", "diarrhoea", "dysentery", "cholera", "fatigue", "dizzy",
+    "dizziness", "chills", "shivering", "sweating", "cough", "coughing", "catarrh",
+    "asthma", "wheeze", "wheezing", "breathless", "pneumonia", "tuberculosis", "chest",
+    "stomach", "ulcer", "hypertension", "diabetes", "insulin", "pregnant", "pregnancy",
+    "antenatal", "miscarriage", "contractions", "labour", "labor", "bleeding", "wound",
+    "swollen", "swelling", "infection", "infected", "pus", "fracture", "fractured",
+    "sprain", "dislocated", "seizure", "convulsion", "unconscious", "faint", "fainted",
+    "jaundice", "hepatitis", "measles", "anaemia", "anemia", "sickle", "rabies",
+    "tetanus", "vaccine", "injection", "antibiotics", "paracetamol", "ibuprofen",
+    "amoxicillin", "artemether", "lumefantrine", "antimalarial", "dehydration",
+    "dehydrated", "appointment", "checkup", "lab", "scan", "ultrasound", "prescription",
+    # Conditions
+    "gastritis", "gastroenteritis", "arthritis", "bronchitis", "sinusitis", "tonsillitis",
+    "appendicitis", "meningitis", "conjunctivitis", "pharyngitis", "hiv", "aids",
+    "gonorrhea", "gonorrhoea", "syphilis", "candidiasis", "thrush", "uti", "piles",
+    "haemorrhoids", "hemorrhoids", "hernia", "fibroid", "fibroids", "eczema", "ringworm",
+    "scabies", "chickenpox", "mumps", "epilepsy", "stroke", "glaucoma", "cataract",
+    "hypotension", "influenza", "flu", "sepsis", "lassa", "ebola", "mpox", "covid",
+    "inhaler", "nebulizer", "nebuliser", "ors",
+    # Drugs and common brand names
+    "panadol", "emzor", "amoxil", "augmentin", "ampiclox", "flagyl", "metronidazole",
+    "septrin", "ciprofloxacin", "cipro", "coartem", "lonart", "camosunate", "fansidar",
+    "chloroquine", "quinine", "artesunate", "piriton", "loratadine", "cetirizine",
+    "diclofenac", "tramadol", "codeine", "omeprazole", "antacid", "metformin",
+    "amlodipine", "lisinopril", "salbutamol", "ventolin", "multivitamin",
+]
+
+NIGERIAN_ENGLISH = [
+    "abeg", "abi", "dey", "na", "wahala", "sef", "oga", "una", "wetin", "pikin",
+    "belle", "sabi", "comot", "chop", "jare", "shey", "wey", "biko", "ehn", "ooo",
+    "haba", "walahi", "kai", "chai", "ehen", "nawa", "gist", "oyinbo",
+]
+
+
+# =========================
+# Edit Distance
+# =========================
+
+def distance(a, b, max_distance):
+    """Optimal-string-alignment distance, or max_distance + 1 if larger."""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if (prev2 is not None and i > 1 and j > 1
+                    and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+            row_min = min(row_min, cur[j])
+        if row_min > max_distance:
+            return max_distance + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+# =========================
+# SymSpell Index
+# =========================
+
+class SymSpell:
+
+    def __init__(self, max_edit=MAX_EDIT, prefix_length=PREFIX_LENGTH):
+        self.max_edit = max_edit
+        self.prefix_length = prefix_length
+        self.counts = {}
+        self.protected = set()
+        self.deletes = defaultdict(list)
+        self.longest = 0
+
+    def _edits(self, word, max_edit):
+        result = {word}
+        frontier = [word]
+        for _ in range(max_edit):
+            following = []
+            for w in frontier:
+                if len(w) <= 1:
+                    continue
+                for i in range(len(w)):
+                    d = w[:i] + w[i + 1:]
+                    if d not in result:
+                        result.add(d)
+                        following.append(d)
+            frontier = following
+        return result
+
+    def add(self, word, count=1, protected=False):
+        if protected:
+            self.protected.add(word)
+        if word in self.counts:
+            self.counts[word] += count
+            return
+        self.counts[word] = count
+        self.longest = max(self.longest, len(word))
+        for d in self._edits(word[:self.prefix_length], self.max_edit):
+            self.deletes[d].append(word)
+
+    def max_edit_for(self, word):
+        # Short words have too many neighbours at distance 2
+        return 1 if len(word) <= 4 else self.max_edit
+
+    def lookup(self, word):
+        """Best correction for a lowercase word (the word itself if known)."""
+        if word in self.counts or len(word) <= 2:
+            return word
+        max_edit = self.max_edit_for(word)
+        if len(word) - max_edit > self.longest:
+            return word
+
+        best, best_distance, best_count = word, max_edit + 1, 0
+        seen = set()
+        for d in self._edits(word[:self.prefix_length], max_edit):
+            for candidate in self.deletes.get(d, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                dist = distance(word, candidate, min(max_edit, best_distance))
+                count = self.counts[candidate]
+                if candidate in self.protected:
+                    # Prefer domain words on ties with general English
+                    count += 1 << 30
+                if dist < best_distance or (dist == best_distance and count > best_count):
+                    best, best_distance, best_count = candidate, dist, count
+        return best
+
+
+def _english_counts():
+    """TextBlob's bundled word frequency list, if TextBlob is installed."""
+    try:
+        import textblob
+    except ImportError:
+        return {}
+    path = os.path.join(os.path.dirname(textblob.__file__), "en", "en-spelling.txt")
+    counts = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith(";;;"):
+                continue
+            parts = line.split()
+            if len(parts) == 2:
+                counts[parts[0]] = int(parts[1])
+    return counts
+
+
+def _dataset_counts(path=DATA_PATH):
+    counts = Counter()
+    if not os.path.exists(path):
+        return counts
+    from dataset_store import load_rows
+    for row in load_rows(path):
+        counts.update(w.lower() for w in WORD.findall(row["prompt"]))
+    return counts
+
+
+def build_index(data_path=DATA_PATH):
+    index = SymSpell()
+    for word, count in _english_counts().items():
+        index.add(word, count)
+
+    domain = Counter()
+    for term in MEDICAL_TERMS + NIGERIAN_ENGLISH + DANGER_TERMS + SYMPTOM_TERMS + _extra_terms:
+        domain.update(WORD.findall(term.lower()))
+    domain.update(_dataset_counts(data_path))
+    for word, count in domain.items():
+        index.add(word, count, protected=True)
+    return index
+
+
+# =========================
+# Public API
+# =========================
+
+_index = None
+_extra_terms = []
+
+
+def get_index():
+    global _index
+    if _index is None:
+        _index = build_index()
+    return _index
+
+
+def add_terms(terms):
+    """Register extra domain vocabulary (e.g. a symptom gazetteer)."""
+    _extra_terms.extend(terms)
+    if _index is not None:
+        for term in terms:
+            for word in WORD.findall(term.lower()):
+                _index.add(word, 1, protected=True)
+        correct_word.cache_clear()
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def correct_word(word):
+    if len(word) < MIN_WORD_LENGTH or (word.isupper() and len(word) > 1):
+        return word
+    lower = word.lower()
+    fixed = get_index().lookup(lower)
+    if fixed == lower:
+        return word
+    if word[0].isupper():
+        return fixed.capitalize()
+    return fixed
+
+
+def fix_spelling(text):
+    return WORD.sub(lambda m: correct_word(m.group()), text)
+
+
+# =========================
+# Benchmark
+# =========================
+
+def _add_typo(word, rng):
+    if len(word) < 4:
+        return word
+    i = rng.randrange(len(word) - 1)
+    kind = rng.randrange(3)
+    if kind == 0:
+        return word[:i] + word[i + 1:]
+    if kind == 1:
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word[:i] + rng.choice("abcdefghijklmnopqrstuvwxyz") + word[i + 1:]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Spelling correction benchmark")
+    parser.add_argument("--messages", type=int, default=300)
+    args = parser.parse_args()
+
+    from dataset_store import load_rows
+    from textblob import TextBlob
+
+    rng = random.Random(0)
+    prompts = list(dict.fromkeys(r["prompt"] for r in load_rows(DATA_PATH)))[:args.messages]
+    noisy = [WORD.sub(lambda m: _add_typo(m.group(), rng) if rng.random() < 0.3 else m.group(), p)
+             for p in prompts]
+    words = sum(len(WORD.findall(p)) for p in noisy)
+
+    start = time.perf_counter()
+    get_index()
+    print(f"index build: {time.perf_counter() - start:.2f}s, {len(_index.counts):,} words, "
+          f"{len(_index.deletes):,} deletes")
+
+    start = time.perf_counter()
+    fixed = [fix_spelling(p) for p in noisy]
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    for p in noisy:
+        fix_spelling(p)
+    warm = time.perf_counter() - start
+
+    start = time.perf_counter()
+    blob = [str(TextBlob(p).correct()) for p in noisy]
+    textblob_time = time.perf_counter() - start
+
+    def accuracy(outputs):
+        return sum(o == p for o, p in zip(outputs, prompts)) / len(prompts)
+
+    print(f"{len(noisy)} messages, {words} words")
+    print(f"symspell cold: {words / cold:,.0f} words/s, warm cache: {words / warm:,.0f} words/s")
+    print(f"textblob:      {words / textblob_time:,.0f} words/s")
+    print(f"exact sentence recovery: symspell {accuracy(fixed):.1%}, textblob {accuracy(blob):.1%}")
+    print(f"cache: {correct_word.cache_info()}")
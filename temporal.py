@@ -0,0 +1,232 @@
+import re
+import sys
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+# Compiled extractor for symptom durations and onsets ("since yesterday",
+# "3 days ago", "for two weeks", ...).
+#
+# extract_duration() returns a dict:
+#   phrase  normalized duration, e.g. "since yesterday", "for 3 days"
+#   days    how long ago the symptom started, in days
+#   onset   datetime the symptom started
+#   source  "rule" or "dateparser"
+# or None when nothing time-related is found.
+#
+# Rule parses are cached per message as a relative spec (days ago /
+# weekday), so the onset is always computed against the current time.
+# dateparser is only imported and called when every rule misses. It resolves
+# relative phrases to an absolute datetime, so only the fact that it found
+# something is cached and a hit is parsed again on every call; messages with
+# no date at all stay fully cached.
+
+CACHE_SIZE = 20000
+
+NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11,
+    "twelve": 12, "couple of": 2, "a couple of": 2, "few": 3, "a few": 3,
+    "several": 3, "half a": 0.5, "half an": 0.5,
+}
+
+# Vague counts get a rough number of days but keep their wording in the phrase
+VAGUE_NUMBERS = {"couple of", "a couple of", "few", "a few", "several"}
+
+UNIT_DAYS = {
+    "minute": 1 / 1440, "min": 1 / 1440, "hour": 1 / 24, "hr": 1 / 24,
+    "day": 1, "night": 1, "week": 7, "month": 30, "year": 365,
+}
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+_NUMBER = r"(?P<n>\d+(?:\.\d+)?|" + "|".join(
+    re.escape(w) for w in sorted(NUMBER_WORDS, key=len, reverse=True)) + ")"
+_UNIT = r"(?P<unit>minute|min|hour|hr|day|night|week|month|year)s?"
+
+# (pattern, handler) pairs, tried in order; the first match wins
+_RULES = []
+
+
+def _rule(pattern):
+    def register(handler):
+        _RULES.append((re.compile(pattern), handler))
+        return handler
+    return register
+
+
+def _number(value):
+    if value in NUMBER_WORDS:
+        return NUMBER_WORDS[value]
+    return float(value)
+
+
+def _plural(n, unit, word=None):
+    if word in VAGUE_NUMBERS:
+        return f"{word} {unit}s"
+    if n == 1:
+        return f"a {unit}"
+    if n == 0.5:
+        return f"half a {unit}"
+    n = int(n) if float(n).is_integer() else n
+    return f"{n} {unit}s"
+
+
+@_rule(r"\bday before yesterday\b")
+def _day_before_yesterday(m):
+    return ("days", 2, "since the day before yesterday")
+
+
+@_rule(r"\b" + _NUMBER + r"\s+" + _UNIT + r"\s+(?:ago|back)\b")
+def _ago(m):
+    n = _number(m.group("n"))
+    unit = m.group("unit")
+    unit = {"min": "minute", "hr": "hour"}.get(unit, unit)
+    return ("days", n * UNIT_DAYS[unit], f"for {_plural(n, unit, m.group('n'))}")
+
+
+@_rule(r"\b(?:for|since|about|over|past|last|almost|nearly)\s+(?:the\s+)?(?:past\s+|last\s+)?"
+       + _NUMBER + r"\s+" + _UNIT + r"\b")
+def _for_units(m):
+    n = _number(m.group("n"))
+    unit = m.group("unit")
+    unit = {"min": "minute", "hr": "hour"}.get(unit, unit)
+    return ("days", n * UNIT_DAYS[unit], f"for {_plural(n, unit, m.group('n'))}")
+
+
+@_rule(r"\b(?:since\s+)?(?:last\s+night|yesternight)\b")
+def _last_night(m):
+    return ("days", 0.5, "since last night")
+
+
+@_rule(r"\byesterday\b")
+def _yesterday(m):
+    return ("days", 1, "since yesterday")
+
+
+@_rule(r"\b(?:since|from|on|last)\s+(?P<day>" + "|".join(WEEKDAYS) + r")\b")
+def _weekday(m):
+    return ("weekday", WEEKDAYS.index(m.group("day")), f"since {m.group('day').capitalize()}")
+
+
+@_rule(r"\b(?:since\s+)?last\s+(?P<unit>week|month|year)\b")
+def _last_unit(m):
+    unit = m.group("unit")
+    return ("days", UNIT_DAYS[unit], f"since last {unit}")
+
+
+@_rule(r"\b(?:this|since)\s+(?:morning|afternoon|evening)\b|\btoday\b|\btonight\b")
+def _today(m):
+    return ("days", 0, "today")
+
+
+@_rule(r"\b(?:for|since)\s+(?:many\s+|some\s+)?(?P<unit>day|week|month|year)s\b")
+def _unquantified(m):
+    unit = m.group("unit")
+    return ("days", 2 * UNIT_DAYS[unit], f"for {unit}s")
+
+
+@_rule(r"\b(?:all|whole|this)\s+(?:the\s+)?week\b")
+def _a_week(m):
+    return ("days", 7, "for a week")
+
+
+# "fever two week now": a count of weeks with no preposition
+@_rule(r"\b" + _NUMBER + r"\s+weeks?\b")
+def _bare_weeks(m):
+    n = _number(m.group("n"))
+    return ("days", n * 7, f"for {_plural(n, 'week', m.group('n'))}")
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse(text, fallback):
+    for pattern, handler in _RULES:
+        m = pattern.search(text)
+        if m:
+            return handler(m) + ("rule",)
+
+    if fallback and _dateparse(text) is not None:
+        return ("dateparser", None, None, "dateparser")
+    return None
+
+
+def _dateparse(text):
+    import dateparser
+
+    return dateparser.parse(text)
+
+
+def extract_duration(text, fallback=True, now=None):
+    """Find how long a symptom has lasted; see the module comment."""
+    text = text.lower().strip()
+    spec = _parse(text, fallback)
+    if spec is None:
+        return None
+
+    kind, value, phrase, source = spec
+    now = now or datetime.now()
+    if kind == "dateparser":
+        # Parsed against the current time, not the cached one
+        value = _dateparse(text)
+        if value is None:
+            return None
+        kind, phrase = "absolute", f"since {value.strftime('%B %d, %Y')}"
+
+    if kind == "days":
+        days = value
+        onset = now - timedelta(days=value)
+    elif kind == "weekday":
+        days = (now.weekday() - value) % 7 or 7
+        onset = (now - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+    else:
+        onset = value
+        days = max(0.0, (now - onset).total_seconds() / 86400)
+
+    return {"phrase": phrase, "days": days, "onset": onset, "source": source}
+
+
+# =========================
+# Benchmark
+# =========================
+
+if __name__ == "__main__":
+    import dateparser
+
+    samples = [
+        "I have had fever since yesterday", "the headache started 3 days ago",
+        "I have been coughing for two weeks", "my leg has been swollen since last week",
+        "I vomited this morning", "pain since Monday", "I feel weak for weeks now",
+        "it started about 5 hours ago", "since the day before yesterday", "March 3rd",
+        "I have a headache", "my baby is not moving",
+    ]
+    messages = samples * int(sys.argv[1] if len(sys.argv) > 1 else 50)
+
+    for s in samples:
+        print(f"{s!r:45} -> {extract_duration(s)}")
+
+    _parse.cache_clear()
+    start = time.perf_counter()
+    for s in samples:
+        extract_duration(s)
+    cold = (time.perf_counter() - start) / len(samples)
+
+    start = time.perf_counter()
+    for s in messages:
+        extract_duration(s)
+    warm = (time.perf_counter() - start) / len(messages)
+
+    start = time.perf_counter()
+    for s in samples:
+        _parse.__wrapped__(s.lower(), False)
+    rules_only = (time.perf_counter() - start) / len(samples)
+
+    start = time.perf_counter()
+    for s in samples:
+        dateparser.parse(s)
+    dp = (time.perf_counter() - start) / len(samples)
+
+    print(f"\nrules only:      {rules_only * 1e6:9.1f} µs/message")
+    print(f"with fallback:   {cold * 1e6:9.1f} µs/message (cold cache)")
+    print(f"cached:          {warm * 1e6:9.1f} µs/message")
+    print(f"dateparser only: {dp * 1e6:9.1f} µs/message")
+    print(f"cache: {_parse.cache_info()}")
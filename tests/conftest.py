@@ -0,0 +1,18 @@
+import os
+import sys
+import tempfile
+
+# The modules are flat files at the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# api.py is configured from the environment at import time: use the fake
+# model and keep startup work (classifier training, TTS) out of the tests
+os.environ.setdefault("MODEL_BACKEND", "fake")
+os.environ.setdefault("TRIAGE_CLASSIFIER", "0")
+os.environ.setdefault("TTS_PRERENDER", "0")
+os.environ.setdefault("RATE_LIMIT", "0")
+os.environ.setdefault("TRUSTED_PROXIES", "1")
+os.environ.setdefault("PROFILE_TOKEN", "test-token")
+os.environ.setdefault("PROFILE_DIR", tempfile.mkdtemp(prefix="profiles-"))
+os.environ.setdefault("PROFILE_SAMPLE_INTERVAL_MS", "1")
+os.environ.setdefault("FAKE_TOKEN_MS", "5")
@@ -0,0 +1,29 @@
+import pytest
+
+api = pytest.importorskip("api")
+from ratelimit import RateLimiter
+
+
+@pytest.fixture
+def limited(monkeypatch):
+    monkeypatch.setattr(api, "RATE_LIMIT", True)
+    limiter = RateLimiter()
+    limiter.rules["ip"] = (60, 2)
+    monkeypatch.setattr(api, "rate_limiter", limiter)
+    return api.app.test_client()
+
+
+def chat(client, forwarded):
+    return client.post("/chat", json={"message": "I have a cough"},
+                       headers={"X-Forwarded-For": forwarded}).status_code
+
+
+def test_ip_bucket_uses_the_hop_the_proxy_added(limited):
+    # The client controls everything left of the proxy's entry
+    codes = [chat(limited, f"10.9.9.{i}, 203.0.113.7") for i in range(3)]
+    assert codes == [200, 200, 429]
+
+
+def test_clients_behind_the_proxy_get_their_own_buckets(limited):
+    codes = [chat(limited, f"203.0.113.{i}") for i in range(10, 14)]
+    assert codes == [200] * 4
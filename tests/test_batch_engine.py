@@ -0,0 +1,39 @@
+import pytest
+
+from batch_engine import BatchEngine
+from deadlines import Cancelled
+from model_backend import FakeModel
+
+
+def test_cancelled_before_prefill_never_reaches_the_model():
+    model = FakeModel()
+    engine = BatchEngine(model, max_batch=4)
+    request = engine.submit("I have a fever", stop=lambda: "deadline")
+    with pytest.raises(Cancelled) as e:
+        request.wait()
+    assert e.value.reason == "deadline"
+    assert request.admitted is None
+    assert model.calls == 0
+
+
+def test_cancelled_after_prefill_stops_decoding():
+    model = FakeModel(token_ms=1, reply_tokens=100)
+    engine = BatchEngine(model, max_batch=4)
+    pieces = []
+    request = engine.submit("I have a fever", on_piece=pieces.append,
+                            stop=lambda: "disconnect" if len(pieces) >= 3 else None)
+    with pytest.raises(Cancelled) as e:
+        request.wait()
+    assert e.value.reason == "disconnect"
+    assert request.admitted is not None
+    assert len(pieces) == 3
+
+
+def test_batched_requests_finish_with_their_own_replies():
+    model = FakeModel(reply_tokens=10)
+    engine = BatchEngine(model, max_batch=4)
+    prompts = [f"patient {i} has a cough" for i in range(6)]
+    requests = [engine.submit(p) for p in prompts]
+    for prompt, request in zip(prompts, requests):
+        assert request.wait() == "".join(model.reply_tokens_for(prompt, 200))
+    assert engine.mean_batch_size() > 1
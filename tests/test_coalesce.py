@@ -0,0 +1,124 @@
+import threading
+import time
+
+from coalesce import RESTART, SingleFlight
+from deadlines import Cancelled, Deadline
+
+
+def test_followers_share_the_leaders_generation():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def generate(flight):
+        calls.append(flight)
+        release.wait()
+        return "reply"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flights.do("prompt", generate)))
+               for _ in range(5)]
+    for t in threads:
+        t.start()
+    time.sleep(0.05)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert results == ["reply"] * 5
+    assert dict((s["role"], n) for s, n in flights.stats()) == {"leader": 1, "follower": 4}
+    # The key is released once the flight ends: not a response cache
+    assert flights.in_flight() == 0
+
+
+def test_late_stream_follower_replays_earlier_pieces():
+    flights = SingleFlight()
+    pushed = threading.Event()
+    release = threading.Event()
+
+    def generate(flight):
+        flight.push("a")
+        flight.push("b")
+        pushed.set()
+        release.wait()
+        flight.push("c")
+        return "abc"
+
+    leader = flights.stream("prompt", generate)
+    pushed.wait()
+    follower = flights.stream("prompt", generate)
+    release.set()
+    assert list(follower) == ["a", "b", "c"]
+    assert list(leader) == ["a", "b", "c"]
+
+
+def test_restart_voids_streamed_pieces():
+    flights = SingleFlight()
+    read = threading.Event()
+
+    def generate(flight):
+        flight.push("a")
+        read.wait()
+        flight.restart()
+        flight.push("b")
+        return "b"
+
+    pieces = flights.stream("prompt", generate)
+    assert next(pieces) == "a"
+    read.set()
+    assert list(pieces) == [RESTART, "b"]
+
+
+def test_leader_timeout_leaves_followers_their_result():
+    flights = SingleFlight()
+
+    def generate(flight):
+        time.sleep(0.3)
+        return "reply"
+
+    errors = []
+
+    def leader():
+        try:
+            flights.do("prompt", generate, Deadline(0.05))
+        except Cancelled as e:
+            errors.append(e.reason)
+    t = threading.Thread(target=leader)
+    t.start()
+    time.sleep(0.01)
+    assert flights.do("prompt", generate, Deadline(5)) == "reply"
+    t.join()
+    assert errors == ["deadline"]
+
+
+def test_generation_stops_once_everyone_gave_up():
+    flights = SingleFlight()
+    steps = []
+
+    def generate(flight):
+        # Like run_model: poll stop_reason() per token
+        while len(steps) < 100:
+            reason = flight.stop_reason()
+            if reason is not None:
+                raise Cancelled(reason)
+            steps.append(1)
+            time.sleep(0.01)
+        return "reply"
+
+    errors = []
+
+    def request(deadline):
+        try:
+            flights.do("prompt", generate, deadline)
+        except Cancelled as e:
+            errors.append(e.reason)
+    threads = [threading.Thread(target=request, args=(Deadline(s),)) for s in (0.05, 0.1)]
+    for t in threads:
+        t.start()
+        time.sleep(0.01)
+    for t in threads:
+        t.join()
+    time.sleep(0.05)
+    assert errors == ["deadline", "deadline"]
+    assert len(steps) < 30
@@ -0,0 +1,39 @@
+import time
+
+import deadlines
+from deadlines import Deadline, GenerationCost, request_timeout
+
+
+def test_deadline_passes():
+    deadline = Deadline(0.05)
+    assert deadline.check() is None
+    time.sleep(0.06)
+    assert deadline.check() == "deadline"
+    assert deadline.remaining() == 0.0
+
+
+def test_disconnect_is_polled_and_sticks():
+    hung_up = []
+    deadline = Deadline(60, disconnected=lambda: bool(hung_up))
+    assert deadline.check() is None
+    hung_up.append(True)
+    deadline._next_poll = 0.0
+    assert deadline.check() == "disconnect"
+    deadline.cancel("deadline")
+    assert deadline.check() == "disconnect"
+
+
+def test_request_timeout_defaults_and_cap():
+    assert request_timeout(None) == deadlines.CHAT_TIMEOUT
+    assert request_timeout("abc") == deadlines.CHAT_TIMEOUT
+    assert request_timeout("-1") == deadlines.CHAT_TIMEOUT
+    assert request_timeout("2.5") == 2.5
+    assert request_timeout(10 ** 6) == deadlines.CHAT_MAX_TIMEOUT
+
+
+def test_generation_cost_prices_what_was_not_generated():
+    cost = GenerationCost()
+    assert cost.saved(5, 1.0) == (0.0, 0.0)
+    cost.observe(100, 10.0)
+    assert cost.saved(40, 4.0) == (60.0, 6.0)
+    assert cost.saved(150, 20.0) == (0.0, 0.0)
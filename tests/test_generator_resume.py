@@ -0,0 +1,38 @@
+import hospital_data_generator as gen
+
+
+def job_entry(job, end):
+    round_num, category, base_text = job
+    return {"round": round_num, "category": category, "base_text": base_text,
+            "file": gen.batch_filename(round_num), "end": end, "rows": 1}
+
+
+def setup_run(tmp_path, monkeypatch, ends):
+    monkeypatch.chdir(tmp_path)
+    jobs = [(1, "malaria_fever", "a"), (1, "malaria_fever", "b"), (2, "malaria_fever", "a")]
+    gen.write_manifest([job_entry(job, end) for job, end in zip(jobs, ends)])
+    return jobs
+
+
+def test_missing_batch_file_requeues_its_jobs(tmp_path, monkeypatch):
+    jobs = setup_run(tmp_path, monkeypatch, [10, 20, 10])
+    (tmp_path / gen.batch_filename(2)).write_text("x" * 9 + "\n")
+
+    remaining = gen.prepare_run(jobs, fresh=False)
+
+    assert remaining == jobs[:2]
+    # Not padded out to the recorded offset with NUL bytes
+    assert (tmp_path / gen.batch_filename(1)).read_bytes() == b""
+    assert [e["round"] for e in gen.load_manifest()] == [2]
+
+
+def test_short_batch_file_keeps_jobs_it_still_holds(tmp_path, monkeypatch):
+    jobs = setup_run(tmp_path, monkeypatch, [10, 20, 10])
+    (tmp_path / gen.batch_filename(1)).write_text("x" * 9 + "\n" + "y" * 5)
+    (tmp_path / gen.batch_filename(2)).write_text("x" * 9 + "\n")
+
+    remaining = gen.prepare_run(jobs, fresh=False)
+
+    assert remaining == [jobs[1]]
+    assert (tmp_path / gen.batch_filename(1)).read_text() == "x" * 9 + "\n"
+    assert [(e["round"], e["base_text"]) for e in gen.load_manifest()] == [(1, "a"), (2, "a")]
@@ -0,0 +1,26 @@
+import os
+
+import pytest
+
+api = pytest.importorskip("api")
+import profiling
+
+
+def profile_chat(mode, message):
+    client = api.app.test_client()
+    r = client.post("/chat", json={"user_id": f"profile-{mode}", "message": message},
+                    headers={"X-Profile": profiling.PROFILE_TOKEN, "X-Profile-Mode": mode})
+    assert r.status_code == 200
+    return os.path.join(profiling.PROFILE_DIR, r.headers["X-Profile-Id"])
+
+
+def test_cprofile_includes_generation_on_flight_thread():
+    base = profile_chat("cprofile", "I have a headache (cprofile)")
+    with open(base + ".txt", encoding="utf-8") as f:
+        assert "run_model" in f.read()
+
+
+def test_sampling_includes_generation_on_flight_thread():
+    base = profile_chat("sampling", "I have a headache (sampling)")
+    with open(base + ".stacks.txt", encoding="utf-8") as f:
+        assert "run_model" in f.read()
@@ -0,0 +1,52 @@
+import pytest
+
+import ratelimit
+from ratelimit import MemoryBuckets, RateLimiter
+
+# Refills so slowly that no token comes back during a test
+SLOW = 0.001
+
+
+def check_all_or_none(buckets):
+    user, ip = ("user:a", SLOW, 1), ("ip:1", SLOW, 2)
+    assert buckets.take([user, ip]) is None
+    # Refused by the user bucket: the IP bucket keeps its last token
+    index, wait = buckets.take([user, ip])
+    assert index == 0 and wait > 0
+    assert buckets.take([ip]) is None
+    assert buckets.take([ip])[0] == 0
+
+
+def test_memory_refused_take_is_free():
+    check_all_or_none(MemoryBuckets())
+
+
+def test_redis_refused_take_is_free(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr("redis.Redis.from_url",
+                        lambda url, **kwargs: fakeredis.FakeRedis(server=server))
+    check_all_or_none(ratelimit.RedisBuckets("redis://test"))
+
+
+def test_limiter_names_the_empty_bucket():
+    limiter = RateLimiter(redis_url="")
+    limiter.rules = {"user": (SLOW, 1), "ip": (SLOW, 5)}
+    assert limiter.check(user="a", ip="1") is None
+    bucket, wait = limiter.check(user="a", ip="1")
+    assert bucket == "user" and wait > 0
+    # A missing key skips its bucket
+    assert limiter.check(user="b", ip=None) is None
+
+
+def test_limiter_falls_back_to_memory_when_redis_fails():
+    class Broken:
+        def take(self, limits):
+            raise ConnectionError("down")
+
+    limiter = RateLimiter(redis_url="")
+    limiter.rules = {"user": (SLOW, 1), "ip": (SLOW, 5)}
+    limiter.redis = Broken()
+    assert limiter.check(user="a") is None
+    assert limiter.check(user="a")[0] == "user"
@@ -0,0 +1,111 @@
+import threading
+import time
+
+from scheduler import PriorityScheduler
+
+
+def test_high_waiter_preempts_running_low_once():
+    scheduler = PriorityScheduler(slots=1)
+    low = scheduler.acquire("low")
+    granted = []
+    waiter = threading.Thread(target=lambda: granted.append(scheduler.acquire("high")))
+    waiter.start()
+    time.sleep(0.05)
+
+    assert low.preempted
+    scheduler.release(low)
+    waiter.join()
+    high = granted[0]
+
+    # The restarted request can't be preempted again
+    retry = threading.Thread(target=lambda: granted.append(scheduler.acquire("low", preemptible=False)))
+    retry.start()
+    time.sleep(0.05)
+    scheduler.release(high)
+    retry.join()
+    more = threading.Thread(target=lambda: granted.append(scheduler.acquire("high")))
+    more.start()
+    time.sleep(0.05)
+    assert not granted[1].preempted
+    scheduler.release(granted[1])
+    more.join()
+    scheduler.release(granted[2])
+    assert scheduler.preemptions == 1
+
+
+def test_no_preemption_when_disabled_or_for_high():
+    scheduler = PriorityScheduler(slots=1, preempt=False)
+    low = scheduler.acquire("low")
+    waiter = threading.Thread(target=lambda: scheduler.release(scheduler.acquire("high")))
+    waiter.start()
+    time.sleep(0.05)
+    assert not low.preempted
+    scheduler.release(low)
+    waiter.join()
+
+    scheduler = PriorityScheduler(slots=1)
+    high = scheduler.acquire("high")
+    waiter = threading.Thread(target=lambda: scheduler.release(scheduler.acquire("high")))
+    waiter.start()
+    time.sleep(0.05)
+    assert not high.preempted
+    scheduler.release(high)
+    waiter.join()
+
+
+def queue_behind(scheduler, holder, priorities, pauses=None):
+    """
+    Queue one waiter per priority behind `holder` (pausing pauses[i] after
+    each, default 20 ms), release it and return the grant order.
+    """
+    order = []
+
+    def wait(priority):
+        slot = scheduler.acquire(priority)
+        order.append(priority)
+        scheduler.release(slot)
+    threads = [threading.Thread(target=wait, args=(p,)) for p in priorities]
+    for t, pause in zip(threads, pauses or [0.02] * len(threads)):
+        t.start()
+        time.sleep(pause)
+    scheduler.release(holder)
+    for t in threads:
+        t.join()
+    return order
+
+
+def test_slots_go_by_priority_then_arrival():
+    scheduler = PriorityScheduler(slots=1, aging=60, preempt=False)
+    holder = scheduler.acquire("medium")
+    order = queue_behind(scheduler, holder, ["low", "medium", "high", "medium"])
+    assert order == ["high", "medium", "medium", "low"]
+    assert scheduler.aged == 0
+
+
+def test_long_wait_ages_low_priority_ahead():
+    scheduler = PriorityScheduler(slots=1, aging=0.05, preempt=False)
+    holder = scheduler.acquire("medium")
+    # Low waits two aging periods (top tier) before medium arrives
+    order = queue_behind(scheduler, holder, ["low", "medium"], pauses=[0.12, 0.01])
+    assert order == ["low", "medium"]
+    assert scheduler.aged == 1
+
+
+def test_reserved_slot_only_takes_high():
+    scheduler = PriorityScheduler(slots=2, reserved=1, preempt=False)
+    holder = scheduler.acquire("low")
+    # Not granted on arrival, so it gives up at the first stop() poll
+    assert scheduler.acquire("low", stop=lambda: True) is None
+    high = scheduler.acquire("high")
+    assert high is not None
+    scheduler.release(high)
+    scheduler.release(holder)
+
+
+def test_stop_while_waiting_leaves_the_queue():
+    scheduler = PriorityScheduler(slots=1, preempt=False)
+    holder = scheduler.acquire("high")
+    start = time.monotonic()
+    assert scheduler.acquire("low", stop=lambda: time.monotonic() - start > 0.15) is None
+    assert scheduler.waiting_by_priority()["low"] == 0
+    scheduler.release(holder)
@@ -0,0 +1,25 @@
+import pytest
+
+from spelling import correct_word, fix_spelling
+
+
+@pytest.mark.parametrize("word", [
+    "HIV", "BP", "ORS", "cof",
+    "gastritis", "inhaler", "panadol", "Panadol", "amoxil", "flagyl", "coartem", "Septrin",
+])
+def test_leaves_acronyms_short_words_and_domain_terms_alone(word):
+    assert correct_word(word) == word
+
+
+@pytest.mark.parametrize("word, fixed", [
+    ("malria", "malaria"),
+    ("Malria", "Malaria"),
+    ("hedache", "headache"),
+    ("amoxicilin", "amoxicillin"),
+])
+def test_corrects_misspellings(word, fixed):
+    assert correct_word(word) == fixed
+
+
+def test_fix_spelling_keeps_acronyms_in_context():
+    assert fix_spelling("I tested HIV positive and have malria") == "I tested HIV positive and have malaria"
@@ -0,0 +1,27 @@
+from datetime import datetime
+
+import pytest
+
+from temporal import extract_duration
+
+NOW = datetime(2026, 3, 11, 12, 0)
+
+
+@pytest.mark.parametrize("text, phrase, days", [
+    ("I get fever two week now", "for 2 weeks", 14),
+    ("sick 3 week", "for 3 weeks", 21),
+    ("my body has been hot all week", "for a week", 7),
+    ("cough for a few days", "for a few days", 3),
+    ("it started several hours ago", "for several hours", 3 / 24),
+    ("headache for 3 days", "for 3 days", 3),
+    ("fever since yesterday", "since yesterday", 1),
+])
+def test_rule_durations(text, phrase, days):
+    duration = extract_duration(text, fallback=False, now=NOW)
+    assert duration["phrase"] == phrase
+    assert duration["days"] == pytest.approx(days)
+    assert duration["source"] == "rule"
+
+
+def test_no_duration():
+    assert extract_duration("I have a headache", fallback=False) is None
@@ -0,0 +1,59 @@
+import time
+
+from voice_pipeline import Speaker
+
+
+class FakeEngine:
+
+    def __init__(self):
+        self.events = []
+
+    def say(self, text):
+        self.events.append(("say", text))
+
+    def save_to_file(self, text, path):
+        time.sleep(0.02)
+        with open(path, "wb") as f:
+            f.write(b"RIFF")
+        self.events.append(("render", text))
+
+    def runAndWait(self):
+        pass
+
+
+class FakeCache:
+
+    def __init__(self):
+        self.fixed = {}
+
+    def render(self, text, synthesize):
+        # Nothing cached: the Speaker falls back to engine.say()
+        return None
+
+    def prerender(self, texts, synthesize):
+        for text in texts:
+            self.fixed[text] = synthesize(text)
+        return len(texts)
+
+
+def test_live_speech_does_not_wait_for_prerender():
+    engine = FakeEngine()
+    cache = FakeCache()
+    speaker = Speaker(lambda: engine, cache=cache)
+    texts = [f"fixed response {i}" for i in range(20)]
+    speaker.prerender(texts)
+    time.sleep(0.01)
+    speaker.say("hello")
+    speaker.wait()
+
+    # At most the one text being rendered when say() arrived
+    spoken = engine.events.index(("say", "hello"))
+    assert spoken <= 2
+    assert len(cache.fixed) < len(texts)
+
+    for _ in range(200):
+        if len(cache.fixed) == len(texts):
+            break
+        time.sleep(0.01)
+    assert sorted(cache.fixed) == sorted(texts)
+    speaker.close()
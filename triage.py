@@ -0,0 +1,147 @@
+import re
+import sys
+import time
+
+import numpy as np
+
+from temporal import extract_duration
+
+# =========================
+# Keyword Lists
+# =========================
+# Shared by the per-message helpers in api.py and the batch scanner below.
+
+DANGER_TERMS = ["bleeding", "pregnant", "chest pain", "faint",
+                "unconscious", "breathing", "seizure", "heart attack"]
+
+SYMPTOM_TERMS = ["fever", "headache", "pain", "cough", "cold",
+                 "tired", "fatigue", "vomiting", "diarrhea",
+                 "bleeding", "swelling", "nausea", "pregnant"]
+
+RECOVERY_PHRASES = ["i am fine", "i'm fine", "i am okay", "i'm okay",
+                    "i feel better", "i am well", "i'm well"]
+
+EMERGENCY_REPLY = "⚠️ This may be serious. Please visit the hospital immediately."
+
+
+# =========================
+# Batch Scanner
+# =========================
+# Identical messages (after lowercasing) are scanned once. The unique ones are
+# joined into one string and every keyword family is found in a single pass
+# of one compiled regex. The lookahead makes matches zero-width, so
+# overlapping terms are all reported exactly like the `term in text` checks.
+# Match positions are mapped back to messages with one np.searchsorted call.
+# Durations come from the cached temporal extractor.
+
+SEPARATOR = "\n"
+
+FAMILIES = {
+    "danger": DANGER_TERMS,
+    "symptoms": SYMPTOM_TERMS,
+    "recovery": RECOVERY_PHRASES,
+}
+
+_ALL_TERMS = sorted({t for terms in FAMILIES.values() for t in terms}, key=len, reverse=True)
+_PATTERN = re.compile("(?=(" + "|".join(re.escape(t) for t in _ALL_TERMS) + "))")
+
+# The regex only reports the longest term starting at a position, so a
+# match also credits every shorter term that is a prefix of it
+_IMPLIED = {t: [s for s in _ALL_TERMS if t.startswith(s)] for t in _ALL_TERMS}
+
+_DANGER = set(DANGER_TERMS)
+_RECOVERY = set(RECOVERY_PHRASES)
+
+
+def _scan(texts):
+    """Return the set of keywords found in each text."""
+    lengths = np.fromiter((len(t) + 1 for t in texts), dtype=np.int64, count=len(texts))
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    joined = SEPARATOR.join(texts)
+
+    positions, found = [], []
+    for m in _PATTERN.finditer(joined):
+        positions.append(m.start())
+        found.append(m.group(1))
+
+    owners = np.searchsorted(starts, positions, side="right") - 1
+    hits = [set() for _ in texts]
+    for owner, term in zip(owners.tolist(), found):
+        hits[owner].update(_IMPLIED[term])
+    return hits
+
+
+def _result(text, hits):
+    result = {
+        "emergency": not _DANGER.isdisjoint(hits),
+        "recovered": not _RECOVERY.isdisjoint(hits),
+        "symptoms": [],
+        "duration": None
+    }
+    # Recovery clears the memory instead of adding to it
+    if not result["recovered"]:
+        result["symptoms"] = [s for s in SYMPTOM_TERMS if s in hits]
+        duration = extract_duration(text, fallback=False)
+        if duration:
+            result["duration"] = duration["phrase"]
+    return result
+
+
+def triage_batch(messages, classifier=None):
+    """
+    Triage many messages in one pass: emergency flag, symptoms, duration
+    and recovery, without touching session memory or calling the LLM.
+    If a triage classifier is given, its predictions are merged in too.
+    """
+    if not messages:
+        return []
+
+    unique = {}
+    slots = [unique.setdefault(m.lower().replace(SEPARATOR, " "), len(unique)) for m in messages]
+    texts = list(unique)
+
+    scanned = [_result(t, h) for t, h in zip(texts, _scan(texts))]
+    if classifier is not None:
+        for result, prediction in zip(scanned, classifier.predict_batch(texts)):
+            result["triage"] = prediction
+
+    return [dict(scanned[slot]) for slot in slots]
+
+
+# =========================
+# Benchmark
+# =========================
+
+def _triage_one(text):
+    text_lower = text.lower()
+    return {
+        "emergency": any(d in text_lower for d in DANGER_TERMS),
+        "recovered": any(p in text_lower for p in RECOVERY_PHRASES),
+        "symptoms": [s for s in SYMPTOM_TERMS if s in text_lower]
+    }
+
+
+if __name__ == "__main__":
+    from dataset_store import load_rows
+
+    path = sys.argv[1] if len(sys.argv) > 1 else "hospital_full_merged.jsonl"
+    messages = [r["prompt"] for r in load_rows(path)]
+
+    start = time.perf_counter()
+    for m in messages:
+        _triage_one(m)
+    loop = time.perf_counter() - start
+
+    start = time.perf_counter()
+    triage_batch(messages)
+    batch = time.perf_counter() - start
+
+    unique = list(dict.fromkeys(messages))
+    start = time.perf_counter()
+    triage_batch(unique)
+    batch_unique = time.perf_counter() - start
+
+    print(f"{len(messages)} messages ({len(unique)} unique)")
+    print(f"per-message loop:      {len(messages) / loop:,.0f} messages/s")
+    print(f"batch scan:            {len(messages) / batch:,.0f} messages/s")
+    print(f"batch scan, no repeats: {len(unique) / batch_unique:,.0f} messages/s")
@@ -0,0 +1,236 @@
+import argparse
+import json
+import os
+import time
+import zlib
+
+import numpy as np
+
+from dataset_store import load_rows
+from dedup import normalize
+
+# Lightweight CPU triage model trained on the bundled dataset.
+#
+# Text is turned into hashed features (word unigrams, word bigrams and
+# character trigrams) and scored by one linear softmax layer per label
+# (category, severity, intent). The three heads share a single weight matrix,
+# so a prediction is one gather of ~50 rows plus a sum: tens of microseconds.
+#
+# The trained model is saved to TRIAGE_MODEL_PATH (default models/, which
+# is git-ignored) and trained from the dataset on first start if missing.
+
+MODEL_PATH = os.environ.get("TRIAGE_MODEL_PATH") or os.path.join(
+    os.path.dirname(__file__), "models", "triage_classifier.npz")
+DATA_PATH = os.path.join(os.path.dirname(__file__), "hospital_full_merged.jsonl")
+
+N_FEATURES = 1 << 16
+HEADS = ("category", "severity", "intent")
+
+
+# =========================
+# Features
+# =========================
+
+def features(text):
+    """Return (indices, values) of the L2-normalized hashed feature vector."""
+    words = normalize(text).split()
+    grams = words + [a + " " + b for a, b in zip(words, words[1:])]
+    for w in words:
+        padded = f"#{w}#"
+        grams.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+
+    idx = np.unique(np.fromiter(
+        (zlib.crc32(g.encode("utf-8")) % N_FEATURES for g in grams),
+        dtype=np.int64, count=len(grams)
+    ))
+    if idx.size == 0:
+        return idx, np.zeros(0, dtype=np.float32)
+    return idx, np.full(idx.size, 1.0 / np.sqrt(idx.size), dtype=np.float32)
+
+
+def _batch_features(texts):
+    """Concatenate the features of many texts for np.add.reduceat."""
+    indices, values, starts = [], [], []
+    pos = 0
+    for text in texts:
+        idx, val = features(text)
+        if idx.size == 0:
+            # Keep every row non-empty so reduceat stays aligned
+            idx, val = np.zeros(1, dtype=np.int64), np.zeros(1, dtype=np.float32)
+        starts.append(pos)
+        pos += idx.size
+        indices.append(idx)
+        values.append(val)
+    return np.concatenate(indices), np.concatenate(values), np.asarray(starts)
+
+
+# =========================
+# Model
+# =========================
+
+class TriageClassifier:
+
+    def __init__(self, labels, weights=None, bias=None, templates=None):
+        self.labels = labels
+        self.sizes = [len(labels[h]) for h in HEADS]
+        self.splits = np.cumsum(self.sizes)[:-1]
+        total = sum(self.sizes)
+        self.W = weights if weights is not None else np.zeros((N_FEATURES, total), dtype=np.float32)
+        self.b = bias if bias is not None else np.zeros(total, dtype=np.float32)
+        # Most common response per category, used for the template path
+        self.templates = templates or {}
+
+    def _scores(self, texts):
+        idx, val, starts = _batch_features(texts)
+        return np.add.reduceat(self.W[idx] * val[:, None], starts, axis=0) + self.b
+
+    def _decode(self, scores):
+        results = []
+        heads = np.split(scores, self.splits, axis=1)
+        probs = []
+        for s in heads:
+            e = np.exp(s - s.max(axis=1, keepdims=True))
+            probs.append(e / e.sum(axis=1, keepdims=True))
+        for row in range(scores.shape[0]):
+            result = {}
+            for head, p in zip(HEADS, probs):
+                k = int(p[row].argmax())
+                result[head] = self.labels[head][k]
+                result[head + "_prob"] = float(p[row, k])
+            results.append(result)
+        return results
+
+    def predict(self, text):
+        return self.predict_batch([text])[0]
+
+    def predict_batch(self, texts):
+        if not texts:
+            return []
+        return self._decode(self._scores(texts))
+
+    def fit(self, texts, targets, sample_weight=None, epochs=20, lr=2.0, l2=1e-6, batch_size=64, seed=0):
+        """
+        Minibatch SGD on the summed softmax cross-entropy of all heads.
+        targets maps each head to an int array of class ids.
+        """
+        n = len(texts)
+        rng = np.random.RandomState(seed)
+        sample_weight = np.ones(n, dtype=np.float32) if sample_weight is None else np.asarray(sample_weight, dtype=np.float32)
+        sample_weight = sample_weight / sample_weight.mean()
+        offsets = np.concatenate([[0], np.cumsum(self.sizes)[:-1]])
+        feats = [features(t) for t in texts]
+
+        for epoch in range(epochs):
+            order = rng.permutation(n)
+            for start in range(0, n, batch_size):
+                rows = order[start:start + batch_size]
+                idx = np.concatenate([feats[r][0] for r in rows])
+                val = np.concatenate([feats[r][1] for r in rows])
+                row_of = np.repeat(np.arange(len(rows)), [feats[r][0].size for r in rows])
+
+                scores = np.zeros((len(rows), self.W.shape[1]), dtype=np.float32)
+                np.add.at(scores, row_of, self.W[idx] * val[:, None])
+                scores += self.b
+
+                grad = np.zeros_like(scores)
+                for head, offset, size in zip(HEADS, offsets, self.sizes):
+                    s = scores[:, offset:offset + size]
+                    e = np.exp(s - s.max(axis=1, keepdims=True))
+                    p = e / e.sum(axis=1, keepdims=True)
+                    p[np.arange(len(rows)), targets[head][rows]] -= 1.0
+                    grad[:, offset:offset + size] = p
+                grad *= sample_weight[rows, None] / len(rows)
+
+                np.add.at(self.W, idx, -lr * (val[:, None] * grad[row_of]))
+                self.b -= lr * grad.sum(axis=0)
+                if l2:
+                    self.W[idx] *= (1.0 - lr * l2)
+            lr *= 0.7
+        return self
+
+    def save(self, path=MODEL_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.savez_compressed(
+            path, W=self.W, b=self.b,
+            meta=np.frombuffer(json.dumps({"labels": self.labels, "templates": self.templates,
+                                           "n_features": N_FEATURES}).encode("utf-8"), dtype=np.uint8)
+        )
+
+    @classmethod
+    def load(cls, path=MODEL_PATH):
+        data = np.load(path)
+        meta = json.loads(data["meta"].tobytes())
+        if meta["n_features"] != N_FEATURES:
+            raise ValueError("triage model was trained with a different feature size")
+        return cls(meta["labels"], data["W"], data["b"], meta["templates"])
+
+
+# =========================
+# Training
+# =========================
+
+def train(rows, **kwargs):
+    rows = list(rows)
+    labels = {h: sorted({r[h] for r in rows}) for h in HEADS}
+    targets = {h: np.asarray([labels[h].index(r[h]) for r in rows]) for h in HEADS}
+    weights = [r.get("weight", 1) for r in rows]
+
+    responses = {}
+    for r, w in zip(rows, weights):
+        counts = responses.setdefault(r["category"], {})
+        counts[r["response"]] = counts.get(r["response"], 0) + w
+    templates = {c: max(counts, key=counts.get) for c, counts in responses.items()}
+
+    model = TriageClassifier(labels, templates=templates)
+    return model.fit([r["prompt"] for r in rows], targets, weights, **kwargs)
+
+
+def load_or_train(model_path=MODEL_PATH, data_path=DATA_PATH):
+    """Load the saved classifier, training and saving it first if needed."""
+    if os.path.exists(model_path):
+        return TriageClassifier.load(model_path)
+    print(f"🧠 Training triage classifier from {data_path}...")
+    model = train(load_rows(data_path))
+    model.save(model_path)
+    return model
+
+
+def split_by_prompt(rows, holdout=0.2):
+    """Train/test split on unique prompts so repeated rows can't leak."""
+    train_rows, test_rows = [], []
+    for r in rows:
+        bucket = zlib.crc32(normalize(r["prompt"]).encode("utf-8")) % 100
+        (test_rows if bucket < holdout * 100 else train_rows).append(r)
+    return train_rows, test_rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the triage classifier")
+    parser.add_argument("data", nargs="?", default=DATA_PATH, help="JSONL or .hds dataset")
+    parser.add_argument("-o", "--output", default=MODEL_PATH)
+    parser.add_argument("--eval", action="store_true", help="report held-out accuracy and latency")
+    args = parser.parse_args()
+
+    rows = list(load_rows(args.data))
+
+    if args.eval:
+        train_rows, test_rows = split_by_prompt(rows)
+        model = train(train_rows)
+        predictions = model.predict_batch([r["prompt"] for r in test_rows])
+        for head in HEADS:
+            acc = np.mean([p[head] == r[head] for p, r in zip(predictions, test_rows)])
+            print(f"{head:<10} accuracy {acc:.3f} on {len(test_rows)} held-out rows")
+
+        texts = [r["prompt"] for r in test_rows]
+        start = time.perf_counter()
+        for t in texts:
+            model.predict(t)
+        single = (time.perf_counter() - start) / len(texts)
+        start = time.perf_counter()
+        model.predict_batch(texts)
+        batch = (time.perf_counter() - start) / len(texts)
+        print(f"latency: {single * 1e6:.0f} µs/message single, {batch * 1e6:.0f} µs/message batched")
+
+    model = train(rows)
+    model.save(args.output)
+    print(f"✅ Saved triage classifier to {args.output}")
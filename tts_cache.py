@@ -0,0 +1,212 @@
+import argparse
+import hashlib
+import os
+import re
+import threading
+import time
+
+# =========================
+# TTS Audio Cache
+# =========================
+#
+# Synthesized WAV files are stored under a hash of (TTS settings, text), so
+# a reply that has been spoken before is played back from disk instead of
+# going through the TTS engine again.
+#
+#   fixed/  pre-rendered fixed responses (emergency message, safe responses,
+#           greetings, dataset responses); never evicted
+#   lru/    generated replies, evicted oldest-used first once the
+#           directory grows past TTS_CACHE_MB
+#
+# Pre-render the fixed set at build time with `python tts_cache.py`; the
+# voice chat and /voice also render any missing ones at startup.
+
+TTS_CACHE_DIR = os.environ.get("TTS_CACHE_DIR", os.path.join(os.path.dirname(__file__), "models", "tts_cache"))
+TTS_CACHE_MB = float(os.environ.get("TTS_CACHE_MB", 256))
+TTS_RATE = int(os.environ.get("TTS_RATE", 150))
+TTS_VOICE = os.environ.get("TTS_VOICE", "")
+
+GREETINGS = [
+    "Hello! I'm your hospital assistant. How are you feeling today?",
+    "Take care! Get well soon.",
+    "Sorry, I could not process that. Please try again.",
+    "I encountered an error. Please try again.",
+]
+
+
+def new_engine():
+    import pyttsx3
+
+    engine = pyttsx3.init()
+    engine.setProperty("rate", TTS_RATE)
+    if TTS_VOICE:
+        engine.setProperty("voice", TTS_VOICE)
+    return engine
+
+
+def render_wav(engine, text):
+    """Synthesize `text` to WAV bytes with a pyttsx3 engine (on its own thread)."""
+    import tempfile
+
+    fd, path = tempfile.mkstemp(suffix=".wav")
+    os.close(fd)
+    try:
+        engine.save_to_file(text, path)
+        engine.runAndWait()
+        with open(path, "rb") as f:
+            return f.read()
+    finally:
+        os.remove(path)
+
+
+def normalize(text):
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def fixed_responses():
+    """Every reply the apps can give without the LLM."""
+    from triage import EMERGENCY_REPLY
+    from hospital_data_generator import safe_responses
+    from dataset_store import load_rows
+
+    texts = [EMERGENCY_REPLY, "This may be serious. Please visit the hospital immediately."]
+    texts += GREETINGS + list(safe_responses.values())
+    data = os.path.join(os.path.dirname(__file__), "hospital_full_merged.jsonl")
+    if os.path.exists(data):
+        texts += [row["response"] for row in load_rows(data)]
+    return list(dict.fromkeys(normalize(t) for t in texts))
+
+
+class TTSCache:
+
+    def __init__(self, root=TTS_CACHE_DIR, max_mb=TTS_CACHE_MB, rate=TTS_RATE, voice=TTS_VOICE):
+        self.root = root
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.settings = f"{rate}|{voice}"
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        for area in ("fixed", "lru"):
+            os.makedirs(os.path.join(root, area), exist_ok=True)
+        lru = os.path.join(root, "lru")
+        self.lru_bytes = sum(os.path.getsize(os.path.join(lru, n)) for n in os.listdir(lru))
+
+    def key(self, text):
+        return hashlib.sha256(f"{self.settings}|{normalize(text)}".encode("utf-8")).hexdigest()
+
+    def _path(self, area, key):
+        return os.path.join(self.root, area, key + ".wav")
+
+    def get(self, text):
+        """Cached WAV bytes for `text`, or None."""
+        key = self.key(text)
+        for area in ("fixed", "lru"):
+            path = self._path(area, key)
+            try:
+                with open(path, "rb") as f:
+                    wav = f.read()
+            except FileNotFoundError:
+                continue
+            if area == "lru":
+                # mtime doubles as the last-used time for eviction
+                os.utime(path)
+            self.hits += 1
+            return wav
+        self.misses += 1
+        return None
+
+    def put(self, text, wav, fixed=False):
+        area = "fixed" if fixed else "lru"
+        path = self._path(area, self.key(text))
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(wav)
+        os.replace(tmp, path)
+        if not fixed:
+            with self.lock:
+                self.lru_bytes += len(wav)
+                if self.lru_bytes > self.max_bytes:
+                    self._evict()
+
+    def _evict(self):
+        lru = os.path.join(self.root, "lru")
+        entries = []
+        for name in os.listdir(lru):
+            path = os.path.join(lru, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        # Trim to 90% so eviction doesn't run on every insert
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+        self.lru_bytes = total
+
+    def render(self, text, synthesize, fixed=False):
+        """WAV for `text`, from the cache or rendered with synthesize(text) and stored."""
+        wav = self.get(text)
+        if wav is None:
+            wav = synthesize(text)
+            if wav:
+                self.put(text, wav, fixed=fixed)
+        return wav
+
+    def prerender(self, texts, synthesize):
+        """Render any of `texts` missing from fixed/; returns how many were added."""
+        added = 0
+        for text in texts:
+            if not os.path.exists(self._path("fixed", self.key(text))):
+                wav = synthesize(text)
+                if wav:
+                    self.put(text, wav, fixed=True)
+                    added += 1
+        return added
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses,
+                "fixed": len(os.listdir(os.path.join(self.root, "fixed"))),
+                "lru_files": len(os.listdir(os.path.join(self.root, "lru"))),
+                "lru_mb": round(self.lru_bytes / (1024 * 1024), 2)}
+
+
+def play_wav(wav):
+    """Play WAV bytes on the default output device and wait for the end."""
+    import io
+    import wave
+
+    import numpy as np
+    import sounddevice as sd
+
+    with wave.open(io.BytesIO(wav), "rb") as w:
+        rate, channels, width = w.getframerate(), w.getnchannels(), w.getsampwidth()
+        frames = w.readframes(w.getnframes())
+    dtype = {1: np.uint8, 2: np.int16, 4: np.int32}[width]
+    samples = np.frombuffer(frames, dtype=dtype).reshape(-1, channels)
+    sd.play(samples, rate)
+    sd.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-render fixed responses into the TTS cache")
+    parser.add_argument("--dir", default=TTS_CACHE_DIR)
+    args = parser.parse_args()
+
+    from voice_service import Synthesizer
+
+    cache = TTSCache(args.dir)
+    texts = fixed_responses()
+    synth = Synthesizer()
+    start = time.perf_counter()
+    added = cache.prerender(texts, synth.render)
+    print(f"🔊 {added} of {len(texts)} fixed responses rendered in {time.perf_counter() - start:.1f}s")
+    print(cache.stats())
@@ -0,0 +1,192 @@
+import re
+import threading
+import time
+from collections import deque
+from queue import Queue
+
+from tts_cache import new_engine, play_wav, render_wav
+
+# =========================
+# Pipelined Voice Replies
+# =========================
+#
+# Instead of generate-everything-then-speak, the reply is streamed token by
+# token, cut into sentences, and each sentence is queued to a TTS thread
+# while the model keeps generating. The patient hears the first sentence
+# after roughly one sentence's worth of generation.
+#
+# pyttsx3 engines belong to the thread that created them, so the Speaker
+# thread creates and owns the only engine; everything else talks to it
+# through its queue. Given a TTSCache, the Speaker plays cached WAVs and
+# caches what it renders, so repeated replies skip synthesis.
+#
+# Pre-rendering the fixed responses shares that engine, so it is background
+# work: one text at a time, only while nothing is queued to be spoken. A
+# reply waits for at most the one text being rendered, not the whole list.
+
+MIN_SENTENCE_CHARS = 12
+MAX_SENTENCE_CHARS = 220
+
+_ABBREVIATIONS = {"dr.", "mr.", "mrs.", "ms.", "e.g.", "i.e.", "etc.", "st.", "no."}
+_BOUNDARY = re.compile(r"[.!?]+[\"')\]]*\s+|\n+")
+_SOFT_BOUNDARY = re.compile(r"[,;:]\s+")
+
+
+class SentenceSplitter:
+    """Accumulates streamed text and hands back complete sentences."""
+
+    def __init__(self, min_chars=MIN_SENTENCE_CHARS, max_chars=MAX_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self.buffer = ""
+
+    def feed(self, text):
+        self.buffer += text
+        sentences = []
+        start = 0
+        for m in _BOUNDARY.finditer(self.buffer):
+            candidate = self.buffer[start:m.end()].strip()
+            last_word = candidate.rsplit(" ", 1)[-1].lower()
+            if len(candidate) < self.min_chars or last_word in _ABBREVIATIONS:
+                continue
+            sentences.append(candidate)
+            start = m.end()
+        self.buffer = self.buffer[start:]
+
+        # Very long run-on sentences are cut at the last comma instead
+        if len(self.buffer) > self.max_chars:
+            soft = list(_SOFT_BOUNDARY.finditer(self.buffer))
+            if soft:
+                cut = soft[-1].end()
+                sentences.append(self.buffer[:cut].strip())
+                self.buffer = self.buffer[cut:]
+        return sentences
+
+    def flush(self):
+        rest = self.buffer.strip()
+        self.buffer = ""
+        return [rest] if rest else []
+
+
+class Speaker(threading.Thread):
+    """
+    TTS worker thread. say() queues text and returns immediately; wait()
+    blocks until everything queued so far has been spoken.
+    """
+
+    def __init__(self, engine_factory=new_engine, cache=None):
+        super().__init__(name="tts", daemon=True)
+        self.engine_factory = engine_factory
+        self.cache = cache
+        self.queue = Queue()
+        self.background = deque()
+        self.first_audio = None
+        self.ready = threading.Event()
+        self.error = None
+        self.start()
+        self.ready.wait()
+        if self.error is not None:
+            raise self.error
+
+    def run(self):
+        try:
+            engine = self.engine_factory()
+        except Exception as e:
+            self.error = e
+            return
+        finally:
+            self.ready.set()
+        while True:
+            if self.background and self.queue.empty():
+                self._prerender_next(engine)
+                continue
+            text = self.queue.get()
+            try:
+                if text is None:
+                    return
+                if callable(text):
+                    text(engine)
+                    continue
+                if self.cache is not None:
+                    wav = self.cache.render(text, lambda t: render_wav(engine, t))
+                    if wav:
+                        if self.first_audio is None:
+                            self.first_audio = time.perf_counter()
+                        play_wav(wav)
+                        continue
+                if self.first_audio is None:
+                    self.first_audio = time.perf_counter()
+                engine.say(text)
+                engine.runAndWait()
+            except Exception as e:
+                print("TTS error:", e)
+            finally:
+                self.queue.task_done()
+
+    def say(self, text):
+        self.queue.put(text)
+
+    def wait(self):
+        self.queue.join()
+
+    def prerender(self, texts):
+        """Render fixed texts into the cache's fixed area while the speaker is idle."""
+        if self.cache is not None:
+            texts = list(texts)
+            self.queue.put(lambda engine: self.background.extend(texts))
+
+    def _prerender_next(self, engine):
+        text = self.background.popleft()
+        try:
+            self.cache.prerender([text], lambda t: render_wav(engine, t))
+        except Exception as e:
+            print("TTS pre-render error:", e)
+
+    def reset_timing(self):
+        self.first_audio = None
+
+    def close(self):
+        self.queue.put(None)
+        self.join()
+
+
+def speak_streaming(model, prompt, speaker, on_token=None, **generate_args):
+    """
+    Generate a reply with streaming=True, speaking each sentence as soon as
+    it is complete. Returns (reply, timings in ms since the call).
+    """
+    start = time.perf_counter()
+    speaker.reset_timing()
+    splitter = SentenceSplitter()
+    pieces = []
+    first_token = first_sentence = None
+
+    for token in model.generate(prompt, streaming=True, **generate_args):
+        if first_token is None:
+            first_token = time.perf_counter()
+        pieces.append(token)
+        if on_token is not None:
+            on_token(token)
+        for sentence in splitter.feed(token):
+            if first_sentence is None:
+                first_sentence = time.perf_counter()
+            speaker.say(sentence)
+    generated = time.perf_counter()
+
+    for sentence in splitter.flush():
+        if first_sentence is None:
+            first_sentence = time.perf_counter()
+        speaker.say(sentence)
+    speaker.wait()
+    end = time.perf_counter()
+
+    def ms(t):
+        return round((t - start) * 1000, 1) if t is not None else None
+
+    return "".join(pieces), {
+        "first_token_ms": ms(first_token),
+        "first_sentence_ms": ms(first_sentence),
+        "first_audio_ms": ms(speaker.first_audio),
+        "generation_ms": ms(generated),
+        "total_ms": ms(end),
+    }
@@ -0,0 +1,207 @@
+import io
+import os
+import threading
+import wave
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from queue import Queue
+
+import numpy as np
+
+from recognizer_pool import RecognizerPool
+from speech_stream import SAMPLE_RATE, VOSK_MODEL_PATH
+from tts_cache import TTSCache, fixed_responses, new_engine, render_wav
+
+# =========================
+# Voice Service (for the /voice endpoints)
+# =========================
+#
+# Speech recognition runs on a RecognizerPool of VOICE_WORKERS threads
+# (default: one per CPU). Vosk decodes in native code without holding the
+# GIL, so the pool decodes several streams in parallel and bounds how many
+# run at once. Each streamed session has its own audio queue.
+#
+# The Vosk model is loaded once, on first use, and shared by every
+# recognizer. Replies are synthesized to WAV by one TTS thread that owns the
+# pyttsx3 engine, through the TTS cache (tts_cache.py) so fixed and repeated
+# replies are served from disk. Without pyttsx3, or if its engine can't start
+# or a render takes longer than TTS_TIMEOUT, the endpoints return text only.
+
+VOICE_WORKERS = int(os.environ.get("VOICE_WORKERS") or os.cpu_count() or 1)
+VOICE_SESSION_TTL = float(os.environ.get("VOICE_SESSION_TTL", 300))
+TTS_TIMEOUT = float(os.environ.get("TTS_TIMEOUT", 30))
+
+
+class VoiceUnavailable(Exception):
+    """Speech recognition can't run here (no Vosk package or model)."""
+
+
+# =========================
+# Audio Decoding
+# =========================
+
+def decode_audio(data, content_type=""):
+    """
+    Return 16 kHz mono int16 PCM. WAV input (any rate, mono or stereo, 16-bit)
+    is converted; anything else is taken as raw 16 kHz mono PCM.
+    """
+    if data[:4] == b"RIFF" or "wav" in content_type:
+        with wave.open(io.BytesIO(data), "rb") as w:
+            if w.getsampwidth() != 2:
+                raise ValueError("WAV audio must be 16-bit PCM")
+            rate, channels = w.getframerate(), w.getnchannels()
+            samples = np.frombuffer(w.readframes(w.getnframes()), dtype=np.int16)
+        if channels > 1:
+            samples = samples.reshape(-1, channels).mean(axis=1)
+        if rate != SAMPLE_RATE and len(samples):
+            positions = np.arange(0, len(samples), rate / SAMPLE_RATE)
+            samples = np.interp(positions, np.arange(len(samples)), samples)
+        return samples.astype(np.int16).tobytes()
+
+    if len(data) % 2:
+        raise ValueError("raw PCM must be 16-bit samples")
+    return data
+
+
+# =========================
+# Recognition
+# =========================
+
+_vosk_model = None
+_recognizers = None
+_vosk_lock = threading.Lock()
+
+
+def get_recognizer_pool():
+    """The shared RecognizerPool, created with the Vosk model on first use."""
+    global _vosk_model, _recognizers
+    if _recognizers is None:
+        with _vosk_lock:
+            if _recognizers is None:
+                if not os.path.exists(VOSK_MODEL_PATH):
+                    raise VoiceUnavailable(f"Vosk model not found at {VOSK_MODEL_PATH}")
+                try:
+                    from speech_stream import load_vosk_model
+                    _vosk_model = load_vosk_model(VOSK_MODEL_PATH)
+                except ImportError as e:
+                    raise VoiceUnavailable(f"vosk is not installed: {e}")
+                _recognizers = RecognizerPool(_vosk_model, size=VOICE_WORKERS)
+    return _recognizers
+
+
+def recognize(pcm):
+    """Transcribe a whole utterance on the recognizer pool."""
+    return get_recognizer_pool().transcribe(pcm)
+
+
+def stream_chunk(session_id, pcm):
+    """
+    Queue one chunk of a streamed utterance and return the transcript decoded
+    so far (it may trail the audio by the chunks still queued).
+    """
+    pool = get_recognizer_pool()
+    pool.expire(VOICE_SESSION_TTL)
+    session = pool.session(session_id)
+    session.push(pcm)
+    return session.transcript()
+
+
+def stream_end(session_id):
+    """Finish a streamed utterance; returns the transcript (None if unknown)."""
+    session = get_recognizer_pool().close(session_id)
+    if session is None:
+        return None
+    return session.end().result()
+
+
+# =========================
+# Speech Synthesis
+# =========================
+
+class Synthesizer(threading.Thread):
+    """Renders text to WAV bytes on the thread that owns the TTS engine."""
+
+    def __init__(self):
+        super().__init__(name="tts-synth", daemon=True)
+        self.queue = Queue()
+        self.error = None
+        self.start()
+
+    def run(self):
+        try:
+            engine = new_engine()
+        except Exception as e:
+            print(f"⚠️  TTS engine failed to start: {e}")
+            self.error = e
+            engine = None
+        while True:
+            text, future = self.queue.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            if engine is None:
+                # No engine: fail queued and later requests instead of leaving them waiting
+                future.set_exception(self.error)
+                continue
+            try:
+                future.set_result(render_wav(engine, text))
+            except Exception as e:
+                future.set_exception(e)
+
+    def render(self, text, timeout=TTS_TIMEOUT):
+        if self.error is not None:
+            raise self.error
+        future = Future()
+        self.queue.put((text, future))
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise TimeoutError(f"TTS took longer than {timeout:g}s")
+
+
+_synthesizer = None
+_tts_cache = None
+_synth_lock = threading.Lock()
+
+
+def _get_synthesizer():
+    global _synthesizer, _tts_cache
+    try:
+        import pyttsx3  # noqa: F401
+    except ImportError:
+        return None
+    with _synth_lock:
+        if _synthesizer is None:
+            _tts_cache = TTSCache()
+            _synthesizer = Synthesizer()
+    return _synthesizer
+
+
+def synthesize(text):
+    """WAV bytes for `text`, or None if no TTS engine is available."""
+    synthesizer = _get_synthesizer()
+    if synthesizer is None:
+        return None
+    try:
+        return _tts_cache.render(text, synthesizer.render)
+    except Exception as e:
+        print(f"TTS error: {e}")
+        return None
+
+
+def prerender_fixed():
+    """Render the fixed responses missing from the TTS cache, in the background."""
+    synthesizer = _get_synthesizer()
+    if synthesizer is None:
+        return None
+
+    def run():
+        try:
+            added = _tts_cache.prerender(fixed_responses(), synthesizer.render)
+            if added:
+                print(f"🔊 Pre-rendered {added} fixed responses")
+        except Exception as e:
+            print(f"TTS pre-render error: {e}")
+
+    thread = threading.Thread(target=run, name="tts-prerender", daemon=True)
+    thread.start()
+    return thread